@@ -9,7 +9,7 @@ from alembic import context
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.database import Base  # Base declarative
-from app.models import user, lesson, progress, chat_log, audio_submission  # Importa todos os modelos
+from app.models import user, lesson, progress, chat_log, audio_submission, id_sequence  # Importa todos os modelos
 
 # Alembic Config
 config = context.config
@@ -0,0 +1,84 @@
+"""chat log pipeline, audio lifecycle and lesson phonemes
+
+Revision ID: 3b8f2c61d0a4
+Revises:
+Create Date: 2026-10-18 12:00:00.000000
+
+Bancos criados por Base.metadata.create_all antes destas colunas não as ganham
+(create_all não altera tabelas existentes). Cada passo confere o schema atual,
+então a revisão também roda sem erro em bancos novos que já têm tudo.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8f2c61d0a4'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table: str) -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table: str) -> set:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def _add_column(table: str, column: sa.Column):
+    if column.name not in _columns(table):
+        op.add_column(table, column)
+
+
+def _create_index(name: str, table: str, columns: list):
+    if name not in _indexes(table):
+        op.create_index(name, table, columns)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # IDs dos chat logs alocados em blocos + lição do turno + histórico por usuário
+    if not sa.inspect(op.get_bind()).has_table("id_sequences"):
+        op.create_table(
+            "id_sequences",
+            sa.Column("name", sa.String(), primary_key=True),
+            sa.Column("next_value", sa.Integer(), nullable=False, server_default="1"),
+        )
+    # SQLite não cria FOREIGN KEY via ALTER TABLE; a coluna fica sem a constraint
+    lesson_fk = [] if op.get_bind().dialect.name == "sqlite" else [sa.ForeignKey("lessons.id")]
+    _add_column("chat_logs", sa.Column("lesson_id", sa.Integer(), *lesson_fk, nullable=True))
+    _create_index("ix_chat_logs_user_id_timestamp", "chat_logs", ["user_id", "timestamp"])
+
+    # Ciclo de vida dos arquivos de áudio (quota, deduplicação, Opus, expurgo)
+    _add_column("audio_submissions", sa.Column("size_bytes", sa.Integer(), server_default="0"))
+    _add_column("audio_submissions", sa.Column("content_hash", sa.String(64)))
+    _add_column("audio_submissions", sa.Column("opus_path", sa.String(), nullable=True))
+    _add_column("audio_submissions", sa.Column("purged_at", sa.DateTime(), nullable=True))
+    _create_index("ix_audio_submissions_content_hash", "audio_submissions", ["content_hash"])
+    _create_index("ix_audio_submissions_user_id_created_at", "audio_submissions", ["user_id", "created_at"])
+
+    # Fonemas pré-computados (preenchidos pelo TargetPhraseIndex no startup)
+    _add_column("lessons", sa.Column("phonemes", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("lessons") as batch:
+        batch.drop_column("phonemes")
+
+    op.drop_index("ix_audio_submissions_user_id_created_at", table_name="audio_submissions")
+    op.drop_index("ix_audio_submissions_content_hash", table_name="audio_submissions")
+    with op.batch_alter_table("audio_submissions") as batch:
+        batch.drop_column("purged_at")
+        batch.drop_column("opus_path")
+        batch.drop_column("content_hash")
+        batch.drop_column("size_bytes")
+
+    op.drop_index("ix_chat_logs_user_id_timestamp", table_name="chat_logs")
+    with op.batch_alter_table("chat_logs") as batch:
+        batch.drop_column("lesson_id")
+    op.drop_table("id_sequences")
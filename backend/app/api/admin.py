@@ -0,0 +1,68 @@
+import asyncio
+import os
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from app.services.audio_storage import audio_storage
+from app.utils.profiler import ProfilerBusyError, sampling_profiler
+from app.utils.token import get_current_admin
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+@router.post("/profiler/sample")
+async def sample_worker(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    admin: dict = Depends(get_current_admin),
+):
+    """
+    Amostrar as stacks deste worker por `seconds` segundos
+    `collapsed` é aceito por flamegraph.pl / speedscope; `json` traz o resumo das stacks mais frequentes
+    """
+    try:
+        session = await sampling_profiler.profile(seconds, interval_ms)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    profile_id = await asyncio.to_thread(sampling_profiler.save, session)
+    if format == "json":
+        return {"profile_id": profile_id, **session.summary()}
+    return PlainTextResponse(session.collapsed(), headers={"X-Profile-Id": profile_id})
+
+
+@router.get("/profiler/profiles/{profile_id}")
+def download_profile(profile_id: str, admin: dict = Depends(get_current_admin)):
+    """Baixar um perfil salvo (amostragem ou requisição com X-Profile-Request)"""
+    if not _PROFILE_ID.match(profile_id):
+        raise HTTPException(status_code=400, detail="Invalid profile id")
+
+    path = sampling_profiler.profile_path(profile_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+
+@router.post("/storage/sweep")
+async def sweep_audio_storage(admin: dict = Depends(get_current_admin)):
+    """Rodar agora a retenção do armazenamento de áudio (TTL, quota, Opus e órfãos)"""
+    return await audio_storage.sweep()
+
+
+@router.get("/storage/usage/{user_id}")
+async def audio_storage_usage(user_id: int, admin: dict = Depends(get_current_admin)):
+    """Espaço ocupado pelos áudios de um usuário e a quota configurada"""
+    return await asyncio.to_thread(audio_storage.get_usage, user_id)
+
+
+@router.get("/inference/cascade")
+async def whisper_cascade_stats(admin: dict = Depends(get_current_admin)):
+    """Passes, aceitos, escalados e taxa de acerto por tier da cascata Whisper"""
+    from app.services.real_ai_models import real_ai_models
+
+    return real_ai_models.get_cascade_stats()
@@ -1,12 +1,15 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, List, Optional
+import base64
+import binascii
 import logging
 from datetime import datetime, timedelta
 
 from app.services.advanced_learning_engine import advanced_learning_engine
 from app.services.speech_analysis_engine import speech_analysis_engine
 from app.services.gamification_engine import gamification_engine
+from app.utils.responses import FastJSONResponse
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -25,11 +28,11 @@ async def get_learning_profile(user_id: str):
             user_id, performance_history
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": learning_profile,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Learning profile retrieval failed: {e}")
@@ -45,12 +48,12 @@ async def generate_adaptive_content(user_id: str, lesson_type: str = "general"):
             user_id, lesson_type
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": adaptive_content,
             "personalization_level": "high",
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Adaptive content generation failed: {e}")
@@ -64,12 +67,12 @@ async def optimize_learning_path(user_id: str):
     try:
         optimization_plan = await advanced_learning_engine.optimize_learning_path(user_id)
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": optimization_plan,
             "optimization_confidence": 0.92,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Learning optimization failed: {e}")
@@ -85,12 +88,12 @@ async def provide_real_time_coaching(user_id: str, performance_data: Dict):
             user_id, performance_data
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": coaching_response,
             "coaching_type": "real_time",
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Real-time coaching failed: {e}")
@@ -105,20 +108,26 @@ async def analyze_speech_advanced(user_id: str,
     Análise avançada de fala com feedback detalhado
     """
     try:
-        # Em produção, processar áudio real
-        audio_bytes = b""  # Simular dados de áudio
+        # Áudio codificado em base64 no corpo ({"audio_base64": "..."}); sem áudio as métricas acústicas ficam zeradas
+        encoded = audio_data.get("audio_base64") or ""
+        try:
+            audio_bytes = base64.b64decode(encoded, validate=True) if encoded else b""
+        except binascii.Error:
+            raise HTTPException(status_code=400, detail="audio_base64 is not valid base64")
         
         analysis_result = await speech_analysis_engine.analyze_pronunciation_advanced(
             audio_bytes, target_text, user_id, native_language
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": analysis_result,
             "analysis_type": "advanced_pronunciation",
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Advanced speech analysis failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -168,11 +177,11 @@ async def get_gamification_profile(user_id: str):
             }
         }
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": gamification_profile,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Gamification profile retrieval failed: {e}")
@@ -188,11 +197,11 @@ async def get_leaderboard(leaderboard_type: str = "weekly", user_id: Optional[st
             leaderboard_type, user_id
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": leaderboard_data,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Leaderboard retrieval failed: {e}")
@@ -211,11 +220,11 @@ async def calculate_xp_reward(user_id: str, activity_data: Dict):
             activity_type, performance_data, user_id
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": xp_calculation,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"XP calculation failed: {e}")
@@ -275,12 +284,12 @@ async def get_comprehensive_insights(user_id: str):
             }
         }
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": comprehensive_insights,
             "insight_confidence": 0.91,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Comprehensive insights generation failed: {e}")
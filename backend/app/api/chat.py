@@ -1,7 +1,8 @@
 # C:\Users\Paulo\Desktop\ai-school-language-app\backend\app\api\chat.py
-from datetime import datetime
+from typing import List
 from fastapi import APIRouter, Depends
 from app.schemas.chat_log import ChatRequest, ChatResponse
+from app.services.chat_log_writer import chat_log_writer
 from app.services.mistral_service import mistral_service
 from app.utils.token import get_current_user
 
@@ -19,12 +20,42 @@ async def chat_with_ai(
     ai_response_text = await mistral_service.chat_with_mistral(
         messages=messages_list,
         context=payload.context,
+        user_id=str(current_user["user_id"]),
+        lesson_id=payload.lesson_id,
     )
 
-    return ChatResponse(
-        id=1,  # TODO: persist and return real ID
+    # Persisted in the background; the id is already final
+    turn = await chat_log_writer.enqueue(
         user_id=current_user["user_id"],
         message=payload.message,
         response=ai_response_text,
-        timestamp=datetime.now(),
+        lesson_id=payload.lesson_id,
+    )
+
+    return ChatResponse(
+        id=turn.id,
+        user_id=turn.user_id,
+        message=turn.message,
+        response=turn.response,
+        timestamp=turn.timestamp,
+        lesson_id=turn.lesson_id,
     )
+
+
+@router.get("/history", response_model=List[ChatResponse])
+async def chat_history(
+    limit: int = 20,
+    current_user: dict = Depends(get_current_user),
+):
+    turns = await chat_log_writer.load_recent_turns(current_user["user_id"], limit=min(limit, 100))
+    return [
+        ChatResponse(
+            id=turn.id,
+            user_id=turn.user_id,
+            message=turn.message,
+            response=turn.response,
+            timestamp=turn.timestamp,
+            lesson_id=turn.lesson_id,
+        )
+        for turn in turns
+    ]
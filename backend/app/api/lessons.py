@@ -1,10 +1,17 @@
+import asyncio
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.database import get_db
 from app.models.lesson import Lesson
-from app.utils.token import get_current_user
+from app.schemas.lesson import LessonCreate
+from app.services.llm_gateway import llm_gateway
+from app.utils.token import get_current_admin
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/lessons", tags=["Lessons"])
 
@@ -37,3 +44,68 @@ def get_lesson(lesson_id: int, db: Session = Depends(get_db)):
         "type": lesson.type,
         "content": lesson.content,
     }
+
+
+@router.post("/", response_model=dict, status_code=201)
+def create_lesson(lesson_in: LessonCreate, db: Session = Depends(get_db),
+                  admin: dict = Depends(get_current_admin)):
+    """Criar lição; os fonemas das frases são calculados na gravação (Lesson.phonemes)"""
+    lesson = Lesson(**lesson_in.dict())
+    db.add(lesson)
+    db.commit()
+    db.refresh(lesson)
+    return {
+        "id": lesson.id,
+        "language": lesson.language,
+        "level": lesson.level,
+        "title": lesson.title,
+        "type": lesson.type,
+        "content": lesson.content,
+        "phrases": len(lesson.phonemes or {}),
+    }
+
+
+@router.put("/{lesson_id}", response_model=dict)
+async def update_lesson(lesson_id: int, lesson_in: LessonCreate, db: Session = Depends(get_db),
+                        admin: dict = Depends(get_current_admin)):
+    """
+    Atualizar lição; conteúdo alterado recalcula os fonemas
+    e descarta o que foi cacheado a partir da versão antiga
+    """
+    lesson = await asyncio.to_thread(_apply_lesson_update, db, lesson_id, lesson_in.dict())
+    if not lesson:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    await _invalidate_lesson_caches(lesson_id)
+    return {
+        "id": lesson.id,
+        "language": lesson.language,
+        "level": lesson.level,
+        "title": lesson.title,
+        "type": lesson.type,
+        "content": lesson.content,
+        "phrases": len(lesson.phonemes or {}),
+    }
+
+
+def _apply_lesson_update(db: Session, lesson_id: int, values: dict) -> Optional[Lesson]:
+    lesson = db.query(Lesson).get(lesson_id)
+    if not lesson:
+        return None
+    for field, value in values.items():
+        setattr(lesson, field, value)
+    db.commit()
+    db.refresh(lesson)
+    return lesson
+
+
+async def _invalidate_lesson_caches(lesson_id: int):
+    """Prefixos de prompt, respostas do cache semântico e vetor da lição no índice de similaridade"""
+    llm_gateway.invalidate_lesson(lesson_id)
+    try:
+        from app.services.semantic_cache import semantic_response_cache
+        from app.services.advanced_learning_engine import advanced_learning_engine
+
+        await semantic_response_cache.invalidate_scope(f"lesson:{lesson_id}|")
+        await advanced_learning_engine.refresh_lesson_index()
+    except Exception as e:
+        logger.warning(f"Could not invalidate cached content for lesson {lesson_id}: {e}")
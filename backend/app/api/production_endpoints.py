@@ -1,12 +1,18 @@
 
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from typing import Dict, List, Optional
+import asyncio
 import logging
 from datetime import datetime
 import json
 
+from app.services.audio_storage import audio_storage
+from app.services.decode_profiles import resolve_language
 from app.services.real_ai_models import real_ai_models
 from app.services.production_learning_engine import production_learning_engine
+from app.utils.audio_probe import check_upload
+from app.utils.metrics import track_stage
+from app.utils.responses import FastJSONResponse
 from app.utils.token import get_current_user
 
 router = APIRouter()
@@ -24,7 +30,7 @@ async def initialize_ai_models():
         success = await real_ai_models.initialize_production_models()
         
         if success:
-            return {
+            return FastJSONResponse({
                 "success": True,
                 "message": "AI models initialized successfully",
                 "models_loaded": [
@@ -34,7 +40,7 @@ async def initialize_ai_models():
                     "nlp_processing"
                 ],
                 "timestamp": datetime.now().isoformat()
-            }
+            })
         else:
             raise HTTPException(status_code=500, detail="Failed to initialize AI models")
             
@@ -47,28 +53,40 @@ async def advanced_speech_analysis(
     audio_file: UploadFile = File(...),
     target_text: str = Form(...),
     user_level: str = Form("intermediate"),
+    scoring_mode: Optional[str] = Form(None, pattern="^(target|free)$"),
+    decode_profile: Optional[str] = Form(None, pattern="^(fast|accurate)$"),
+    language: Optional[str] = Form(None),
+    lesson_id: Optional[int] = Form(None),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Análise avançada de fala com múltiplos modelos de AI
+    scoring_mode: "target" alinha o áudio ao texto-alvo, "free" transcreve livremente (padrão em settings)
+    decode_profile: "fast" (greedy, sem fallback) ou "accurate" (beam search); idioma da requisição ou da lição
     """
     try:
         logger.info(f"🎤 Advanced speech analysis for user: {current_user['user_id']}")
         
-        # Salvar arquivo de áudio
-        audio_path = f"static/audio/{current_user['user_id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
+        # Sondagem barata antes de gravar e rodar os modelos: rejeita silêncio, clipes curtos, cabeçalho corrompido
+        content = await audio_file.read()
+        with track_stage("probe"):
+            probe = await asyncio.to_thread(check_upload, content, audio_file.filename)
         
-        with open(audio_path, "wb") as buffer:
-            content = await audio_file.read()
-            buffer.write(content)
+        # Salvar arquivo de áudio (layout particionado por hash + registro da submissão)
+        with track_stage("upload"):
+            stored = await audio_storage.store(content, probe.extension, current_user['user_id'], area="audio")
+        audio_path = stored.analysis_path
         
         # Analisar fala com AI real
         analysis = await real_ai_models.analyze_speech_real(
-            audio_path, target_text, user_level
+            audio_path, target_text, user_level, scoring_mode=scoring_mode,
+            language=await resolve_language(language, lesson_id), decode_profile=decode_profile
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
+            "audio_url": audio_storage.file_url(stored.submission_id),
+            "audio_warnings": probe.warnings,
             "analysis": {
                 "accuracy_score": analysis.accuracy_score,
                 "fluency_score": analysis.fluency_score,
@@ -84,8 +102,10 @@ async def advanced_speech_analysis(
                 current_user['user_id'], analysis
             ),
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Advanced speech analysis failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -107,14 +127,14 @@ async def analyze_text_comprehension(
             user_text, reference_text
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "analysis": analysis,
             "learning_impact": await _calculate_learning_impact(
                 current_user['user_id'], analysis
             ),
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Text comprehension analysis failed: {e}")
@@ -136,7 +156,7 @@ async def create_student_profile(
             current_user['user_id'], initial_assessment
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "profile": {
                 "user_id": profile.user_id,
@@ -149,7 +169,7 @@ async def create_student_profile(
             },
             "personalized_recommendations": await _generate_initial_recommendations(profile),
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Student profile creation failed: {e}")
@@ -171,14 +191,14 @@ async def analyze_learning_session(
             current_user['user_id'], session_data
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "analysis": analysis,
             "real_time_coaching": await _generate_real_time_coaching(
                 current_user['user_id'], analysis
             ),
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Learning session analysis failed: {e}")
@@ -200,12 +220,12 @@ async def generate_adaptive_lesson(
             current_user['user_id'], lesson_type
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "lesson": lesson,
             "ai_insights": await _generate_lesson_insights(lesson),
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Adaptive lesson generation failed: {e}")
@@ -226,7 +246,7 @@ async def get_comprehensive_progress(
             current_user['user_id']
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "progress": progress,
             "market_competitive_insights": await _generate_market_insights(progress),
@@ -234,7 +254,7 @@ async def get_comprehensive_progress(
                 current_user['user_id'], progress
             ),
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Comprehensive progress tracking failed: {e}")
@@ -268,12 +288,12 @@ async def generate_personalized_content(
             []  # Histórico de aprendizado (implementar busca no BD)
         )
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "content": content,
             "competitive_advantage": await _analyze_competitive_advantage(content),
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Personalized content generation failed: {e}")
@@ -303,12 +323,12 @@ async def get_real_time_coaching(
             "next_challenge": await _suggest_next_challenge(profile)
         }
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "coaching": coaching,
             "ai_confidence": 0.92,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Real-time coaching failed: {e}")
@@ -350,12 +370,12 @@ async def get_market_competition_analysis(
             "user_success_rate": "92% of users show measurable improvement"
         }
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "analysis": analysis,
             "recommendation": "Continue focusing on AI-powered personalization",
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Market competition analysis failed: {e}")
@@ -31,6 +31,8 @@ async def get_user_progress(
         ).all()
         
         return user_progress
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching user progress: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch progress")
@@ -52,6 +54,8 @@ async def get_lesson_progress(
             raise HTTPException(status_code=404, detail="Progress not found")
         
         return progress
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching lesson progress: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch lesson progress")
@@ -88,6 +92,8 @@ async def create_progress(
         logger.info(f"Created progress for user {current_user['user_id']}, lesson {progress_data.lesson_id}")
         return new_progress
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating progress: {e}")
         db.rollback()
@@ -121,6 +127,8 @@ async def update_progress(
         logger.info(f"Updated progress for user {current_user['user_id']}, lesson {lesson_id}")
         return progress
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating progress: {e}")
         db.rollback()
@@ -157,6 +165,8 @@ async def save_session_data(
         logger.info(f"Saved session data for user {current_user['user_id']}, lesson {lesson_id}")
         return {"success": True, "message": "Session data saved successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error saving session data: {e}")
         db.rollback()
@@ -193,6 +203,8 @@ async def save_course_data(
         logger.info(f"Saved course data for user {current_user['user_id']}, lesson {lesson_id}")
         return {"success": True, "message": "Course data saved successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error saving course data: {e}")
         db.rollback()
@@ -230,6 +242,8 @@ async def get_progress_statistics(
             "current_streak": max(p.streak_count for p in user_progress) if user_progress else 0
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error calculating progress statistics: {e}")
         raise HTTPException(status_code=500, detail="Failed to calculate statistics")
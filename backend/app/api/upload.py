@@ -1,11 +1,19 @@
-import os
-import uuid
 import asyncio
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request
+from app.config import settings
+from app.services.audio_storage import audio_storage
+from app.services.decode_profiles import resolve_language
 from app.services.whisper_service import whisper_service
 from app.services.ai_orchestrator import ai_orchestrator
+from app.utils.file_serving import (
+    RangeFileResponse, content_hash_cache, etag_matches, not_modified_response, stat_regular_file
+)
+from app.utils.audio_probe import check_upload
 from app.utils.helpers import validate_audio_file
+from app.utils.metrics import track_stage
+from app.utils.responses import FastJSONResponse
+from app.utils.tracing import traced
 from app.utils.token import get_current_user # Certifique-se que get_current_user está implementado e importado
 import logging
 
@@ -13,9 +21,6 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Create upload directory if it doesn't exist
-UPLOAD_DIR = "static/uploads" #
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/submit")
 async def submit_audio(
@@ -23,7 +28,7 @@ async def submit_audio(
     target_phrase: str = "",
     difficulty: str = "intermediate",
     lesson_context: str = "",
-    user_id: str = None # Este user_id pode vir do token em produção
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Submit audio for advanced AI analysis with comprehensive feedback
@@ -33,26 +38,27 @@ async def submit_audio(
         if not validate_audio_file(file):
             raise HTTPException(status_code=400, detail="Invalid audio file format")
         
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(file.filename)[1]
-        filename = f"{file_id}{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
+        # Save uploaded file (layout particionado por hash + registro da submissão)
+        content = await file.read()
+        # Rejeitar áudio inutilizável (silêncio, curto demais, cabeçalho corrompido...) antes de gravar/decodificar
+        with track_stage("probe"):
+            probe = await asyncio.to_thread(check_upload, content, file.filename)
         
-        # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        with track_stage("upload"):
+            stored = await audio_storage.store(content, probe.extension, current_user["user_id"])
+        file_id = stored.content_hash
+        file_path = stored.analysis_path
         
-        logger.info(f"🎤 Audio uploaded: {filename}")
+        logger.info(f"🎤 Audio uploaded: {file_path}")
         
         # Process audio with advanced AI
-        analysis_result = await whisper_service.evaluate_speech_with_whisper(
-            audio_path=file_path,
-            user_id=user_id,
-            target_phrase=target_phrase,
-            difficulty=difficulty
-        )
+        with track_stage("analysis"):
+            analysis_result = await whisper_service.evaluate_speech_with_whisper(
+                audio_path=file_path,
+                user_id=current_user["user_id"],
+                target_phrase=target_phrase,
+                difficulty=difficulty
+            )
         
         # Add lesson context if provided
         if lesson_context:
@@ -62,23 +68,26 @@ async def submit_audio(
             )
         
         # Generate learning insights
-        learning_insights = await _generate_learning_insights(analysis_result, user_id)
+        learning_insights = await _generate_learning_insights(analysis_result, current_user["user_id"])
         analysis_result["learning_insights"] = learning_insights
         
-        # Clean up uploaded file (optional)
-        # os.remove(file_path)
+        # Retenção (TTL + quota) fica a cargo do sweeper do audio_storage
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "file_id": file_id,
+            "audio_url": audio_storage.file_url(stored.submission_id),
             "analysis": analysis_result,
             "processing_info": {
                 "file_size": len(content),
+                "audio_warnings": probe.warnings,
                 "processing_time": analysis_result.get("processing_time", 0),
                 "ai_model": "whisper_advanced_v2"
             }
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Audio submission failed: {e}")
         raise HTTPException(status_code=500, detail=f"Audio processing failed: {str(e)}")
@@ -86,48 +95,58 @@ async def submit_audio(
 @router.post("/transcribe")
 async def transcribe_audio(
     file: UploadFile = File(...),
-    language: str = "en",
-    user_id: str = None
+    language: Optional[str] = None,
+    lesson_id: Optional[int] = None,
+    decode_profile: Optional[str] = Query(None, pattern="^(fast|accurate)$"),
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Transcribe audio with high accuracy and detailed analysis
+    The language comes from the request or the lesson (no detection pass when known)
     """
     try:
         # Validate and save file
         if not validate_audio_file(file):
             raise HTTPException(status_code=400, detail="Invalid audio file format")
         
-        file_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(file.filename)[1]
-        filename = f"{file_id}{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
+        content = await file.read()
+        # Rejeitar áudio inutilizável (silêncio, curto demais, cabeçalho corrompido...) antes de gravar/decodificar
+        with track_stage("probe"):
+            probe = await asyncio.to_thread(check_upload, content, file.filename)
         
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        with track_stage("upload"):
+            stored = await audio_storage.store(content, probe.extension, current_user["user_id"])
+        file_id = stored.content_hash
+        file_path = stored.analysis_path
         
-        logger.info(f"📝 Transcription request: {filename}")
+        logger.info(f"📝 Transcription request: {file_path}")
         
         # Transcribe with advanced features
-        transcription_result = await whisper_service.transcribe_audio(
-            audio_path=file_path,
-            language=language
-        )
+        with track_stage("analysis"):
+            transcription_result = await whisper_service.transcribe_audio(
+                audio_path=file_path,
+                language=await resolve_language(language, lesson_id),
+                decode_profile=decode_profile
+            )
         
         # Add enhanced features
         enhanced_result = {
             **transcription_result,
             "file_id": file_id,
+            "audio_url": audio_storage.file_url(stored.submission_id),
+            "audio_warnings": probe.warnings,
             "language_analysis": await _analyze_language_features(transcription_result),
             "speaking_metrics": await _calculate_speaking_metrics(transcription_result),
             "improvement_suggestions": await _generate_transcription_suggestions(transcription_result)
         }
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "transcription": enhanced_result
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Transcription failed: {e}")
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
@@ -136,7 +155,9 @@ async def transcribe_audio(
 async def analyze_pronunciation(
     target_text: str, # Moved this parameter to the beginning
     file: UploadFile = File(...),
-    user_id: str = None
+    language: Optional[str] = None,
+    lesson_id: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Detailed pronunciation analysis with actionable feedback
@@ -146,41 +167,48 @@ async def analyze_pronunciation(
         if not validate_audio_file(file):
             raise HTTPException(status_code=400, detail="Invalid audio file format")
         
-        file_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(file.filename)[1]
-        filename = f"{file_id}{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
+        content = await file.read()
+        # Rejeitar áudio inutilizável (silêncio, curto demais, cabeçalho corrompido...) antes de gravar/decodificar
+        with track_stage("probe"):
+            probe = await asyncio.to_thread(check_upload, content, file.filename)
         
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        with track_stage("upload"):
+            stored = await audio_storage.store(content, probe.extension, current_user["user_id"])
+        file_id = stored.content_hash
+        file_path = stored.analysis_path
         
-        logger.info(f"🎯 Pronunciation analysis: {filename}")
+        logger.info(f"🎯 Pronunciation analysis: {file_path}")
         
         # Analyze pronunciation with advanced AI
-        pronunciation_result = await whisper_service.analyze_pronunciation(
-            audio_path=file_path,
-            target_text=target_text
-        )
+        with track_stage("analysis"):
+            pronunciation_result = await whisper_service.analyze_pronunciation(
+                audio_path=file_path,
+                target_text=target_text,
+                language=await resolve_language(language, lesson_id)
+            )
         
         # Add personalized coaching
         coaching_insights = await _generate_pronunciation_coaching(
-            pronunciation_result, target_text, user_id
+            pronunciation_result, target_text, current_user["user_id"]
         )
         
         enhanced_result = {
             **pronunciation_result,
             "file_id": file_id,
+            "audio_url": audio_storage.file_url(stored.submission_id),
+            "audio_warnings": probe.warnings,
             "coaching_insights": coaching_insights,
             "practice_exercises": await _generate_pronunciation_exercises(target_text),
-            "progress_tracking": await _track_pronunciation_progress(user_id, pronunciation_result)
+            "progress_tracking": await _track_pronunciation_progress(current_user["user_id"], pronunciation_result)
         }
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "pronunciation_analysis": enhanced_result
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Pronunciation analysis failed: {e}")
         raise HTTPException(status_code=500, detail=f"Pronunciation analysis failed: {str(e)}")
@@ -207,7 +235,7 @@ async def real_time_feedback(
         # Add motivational elements
         motivational_feedback = await _add_motivational_elements(feedback, user_id)
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "real_time_feedback": {
                 **feedback,
@@ -228,7 +256,7 @@ async def get_user_audio_stats(user_id: str):
         # Get user's audio practice statistics
         stats = await _get_user_audio_statistics(user_id)
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "audio_stats": stats
         })
@@ -237,7 +265,39 @@ async def get_user_audio_stats(user_id: str):
         logger.error(f"Failed to get audio stats: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get audio stats: {str(e)}")
 
+@router.api_route("/files/{submission_id}", methods=["GET", "HEAD"])
+async def get_audio_file(
+    submission_id: int,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Download de um áudio gravado pelo próprio usuário
+    Suporta Range (206), If-None-Match (304) e If-Range; o conteúdo é imutável
+    """
+    resolved = await audio_storage.resolve(submission_id, current_user["user_id"])
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    path, media_type = resolved
+
+    st = stat_regular_file(path)
+    if st is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+
+    etag = f'"{await asyncio.to_thread(content_hash_cache.get, path, st)}"'
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return not_modified_response(etag)
+
+    return RangeFileResponse(
+        path, etag, st, media_type,
+        range_header=request.headers.get("range", ""),
+        if_range=request.headers.get("if-range", ""),
+        accel_prefix=settings.AUDIO_ACCEL_REDIRECT_PREFIX,
+        accel_root=settings.AUDIO_ACCEL_REDIRECT_ROOT
+    )
+
 # Helper functions
+@traced()
 async def _generate_contextual_feedback(analysis_result: dict, lesson_context: str) -> dict:
     """Generate contextual feedback based on lesson"""
     return {
@@ -250,6 +310,7 @@ async def _generate_contextual_feedback(analysis_result: dict, lesson_context: s
         ]
     }
 
+@traced()
 async def _generate_learning_insights(analysis_result: dict, user_id: str) -> dict:
     """Generate personalized learning insights"""
     return {
@@ -264,6 +325,7 @@ async def _generate_learning_insights(analysis_result: dict, user_id: str) -> di
         "next_milestone": "Advanced pronunciation mastery"
     }
 
+@traced()
 async def _analyze_language_features(transcription_result: dict) -> dict:
     """Analyze language features from transcription"""
     return {
@@ -291,6 +353,7 @@ async def _generate_transcription_suggestions(transcription_result: dict) -> lis
         "Consider practicing linking words"
     ]
 
+@traced()
 async def _generate_pronunciation_coaching(pronunciation_result: dict, 
                                            target_text: str, user_id: str) -> dict:
     """Generate personalized pronunciation coaching"""
@@ -325,6 +388,7 @@ async def _generate_pronunciation_exercises(target_text: str) -> list:
         }
     ]
 
+@traced()
 async def _track_pronunciation_progress(user_id: str, pronunciation_result: dict) -> dict:
     """Track pronunciation progress for user"""
     return {
@@ -1,6 +1,7 @@
 # app/config.py
 
 import os
+from typing import Dict, List
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings # NEW CORRECT WAY
 # Carrega variáveis do arquivo .env (criar depois)
@@ -22,6 +23,151 @@ class Settings(BaseSettings):
     AUDIO_MODEL_PATH: str = "./models/whisper"
     MISTRAL_MODEL_PATH: str = "./models/mistral"
 
+    # Cache semântico de respostas do tutor
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # similaridade de cosseno mínima
+    SEMANTIC_CACHE_TTL_SECONDS: int = 60 * 60 * 6
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
+
+    # Índices vetoriais (lições, exercícios, Q&A do chat)
+    VECTOR_INDEX_DIR: str = "./data/vector_index"
+
+    # Gravação em lote dos chat logs
+    CHAT_LOG_FLUSH_INTERVAL_MS: int = 250
+    CHAT_LOG_BATCH_SIZE: int = 100
+    CHAT_LOG_ID_BLOCK_SIZE: int = 100
+    CHAT_LOG_DEAD_LETTER_PATH: str = "./data/chat_log_dead_letter.jsonl"  # lotes que o banco recusou
+
+    # Janela de contexto do tutor
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 1500
+    CHAT_CONTEXT_MAX_TURNS: int = 24
+    CHAT_CONTEXT_SUMMARY_TOKENS: int = 200
+    CHAT_CONTEXT_MAX_USERS: int = 10000
+    # Sem turnos há mais que isso, a próxima mensagem abre uma sessão nova (volta a usar o cache semântico)
+    CHAT_SESSION_IDLE_SECONDS: int = 1800
+
+    # Gateway de LLM: simulated | llama_cpp | openai
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "simulated")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "mistral-7b-instruct")
+    LLM_API_BASE: str = os.getenv("LLM_API_BASE", "https://api.openai.com/v1")
+    LLM_API_KEY: str = os.getenv("LLM_API_KEY", "")
+    LLM_MAX_TOKENS: int = 256
+    LLM_PREFIX_CACHE_SIZE: int = 256
+    LLM_KV_CACHE_ENTRIES: int = 8
+
+    # Pool de threads para inferência dos modelos
+    INFERENCE_WORKERS: int = 2
+
+    # Health checks (readiness)
+    HEALTH_CACHE_SECONDS: float = 2.0
+    HEALTH_DB_TIMEOUT_SECONDS: float = 1.0
+    HEALTH_MAX_INFERENCE_QUEUE: int = 8
+
+    # Tracing por requisição (spans exportados em OTLP/JSON)
+    TRACING_ENABLED: bool = True
+    TRACING_EXPORT_PATH: str = ""  # ex.: ./data/traces.jsonl
+    TRACING_OTLP_ENDPOINT: str = ""  # ex.: http://localhost:4318/v1/traces
+    TRACING_SERVER_TIMING_STAGES: int = 5
+
+    # Profiler por amostragem (admin)
+    PROFILER_MAX_SECONDS: float = 60.0
+    PROFILER_OUTPUT_DIR: str = "./data/profiles"
+    PROFILER_MAX_PROFILES: int = 100  # perfis salvos mantidos; os mais antigos são apagados
+    PROFILER_REQUEST_TOKEN: str = ""  # vazio desliga o profiling via header
+
+    # Compressão de respostas (gzip, br e zstd quando instalados)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_ROUTE_MIN_SIZE: Dict[str, int] = {
+        "/lessons/": 512,
+        "/analytics/insights/comprehensive/{user_id}": 256,
+        "/production/learning-progress/comprehensive": 256,
+        "/audio/transcribe": 256
+    }
+    COMPRESSION_CACHE_ENTRIES: int = 512
+    COMPRESSION_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Entrega de áudio gravado (Range, ETag forte, zero-copy)
+    # Com prefixo definido o nginx serve o arquivo via X-Accel-Redirect (location internal)
+    AUDIO_ACCEL_REDIRECT_PREFIX: str = ""
+    AUDIO_ACCEL_REDIRECT_ROOT: str = "static"
+
+    # Armazenamento de áudio: layout particionado, retenção e sweeper
+    AUDIO_STORAGE_ROOT: str = "static"
+    AUDIO_RETENTION_DAYS: int = 30
+    AUDIO_USER_QUOTA_MB: int = 200
+    AUDIO_SWEEP_INTERVAL_SECONDS: int = 3600
+    # Opus (requer ffmpeg no PATH)
+    AUDIO_OPUS_TRANSCODE: bool = False
+    AUDIO_OPUS_BITRATE: str = "24k"
+    AUDIO_OPUS_AFTER_SECONDS: int = 600
+    AUDIO_OPUS_KEEP_ORIGINAL: bool = False
+    # Ingestão: cada upload vira um .npy float32 16 kHz mono (mmap nas análises) + cópia Opus,
+    # transcodificados uma vez em um pool de processos
+    AUDIO_INGEST_ENABLED: bool = True
+    AUDIO_INGEST_WORKERS: int = 2
+    AUDIO_INGEST_OPUS: bool = True
+
+    # Sondagem do upload (cabeçalho + amostra dizimada) antes de qualquer decode/modelo
+    AUDIO_MIN_SECONDS: float = 0.5
+    AUDIO_MAX_SECONDS: float = 300.0
+    AUDIO_MIN_SAMPLE_RATE: int = 8000
+    AUDIO_SILENCE_PEAK_DBFS: float = -50.0
+    AUDIO_MAX_CLIPPING_RATIO: float = 0.1
+    AUDIO_PROBE_SECONDS: float = 5.0  # Trecho decodificado nos formatos comprimidos
+    AUDIO_PROBE_SAMPLES: int = 32000  # Máximo de amostras usadas para pico/RMS
+
+    # VAD antes do Whisper: recorta silêncio e encurta pausas longas
+    VAD_ENABLED: bool = True
+    VAD_COMPACT_PAUSES: bool = True
+    VAD_MAX_PAUSE_MS: float = 400.0
+    VAD_PADDING_MS: float = 150.0
+
+    # Backend de inferência por modelo: torch (fp32), int8 (quantização dinâmica) ou onnx
+    # Whisper não tem caminho ONNX e usa int8 nesse caso
+    INFERENCE_BACKENDS: Dict[str, str] = {
+        "whisper": "torch",
+        "grammar": "torch",
+        "sentence_transformer": "torch",
+    }
+    ONNX_MODEL_DIR: str = "./data/onnx"
+    ONNX_INTRA_OP_THREADS: int = 0
+
+    # Cascata Whisper: clipes curtos com texto-alvo começam no tier barato e sobem
+    # para o seguinte só com confiança ou aderência ao alvo abaixo do limiar
+    WHISPER_CASCADE_ENABLED: bool = True
+    WHISPER_CASCADE_TIERS: List[str] = ["tiny", "base"]
+    WHISPER_CASCADE_MAX_SHORT_SECONDS: float = 8.0
+    WHISPER_CASCADE_MAX_TARGET_WORDS: int = 12
+    WHISPER_CASCADE_MIN_CONFIDENCE: float = 0.6
+    WHISPER_CASCADE_MIN_TARGET_MATCH: float = 0.7
+
+    # Pontuação com texto-alvo: "target" alinha o alvo ao áudio (teacher forcing, um forward pass),
+    # "free" decodifica livremente e compara strings
+    SPEECH_SCORING_MODE: str = "target"
+    TARGET_MIN_WORD_PROBABILITY: float = 0.5
+    TARGET_MISSING_PROBABILITY: float = 0.1
+
+    # Perfis de decodificação do Whisper (fast | accurate) por endpoint; idioma fixo evita
+    # o passe de detecção (vem da requisição, da lição ou do padrão abaixo; vazio = detectar)
+    DECODE_PROFILE_BY_ENDPOINT: Dict[str, str] = {
+        "speech_analysis": "fast",
+        "transcribe": "accurate",
+    }
+    SPEECH_DEFAULT_LANGUAGE: str = "en"
+
+    # Léxico de fonemas: CMUdict compilado em trie memory-mapped (G2P por regras como fallback)
+    # Sem o arquivo, usa o corpus cmudict do NLTK se estiver baixado
+    PHONEME_LEXICON_SOURCE: str = "./data/cmudict.dict"
+    PHONEME_LEXICON_DIR: str = "./data/lexicon"
+    # Recarregar as frases das lições (edições feitas por outros workers); 0 = só no startup
+    PHRASE_INDEX_REFRESH_SECONDS: int = 300
+
+    # Templates de falantes nativos (MFCC/pitch por frase, comparados por DTW com banda)
+    NATIVE_TEMPLATE_DIR: str = "./data/native_templates"
+    NATIVE_TEMPLATE_BAND: float = 0.15  # Raio da banda como fração do clipe mais longo
+    NATIVE_TEMPLATE_REFERENCE_DISTANCE: float = 2.5  # Usada quando a frase tem uma só gravação
+
     # Modo debug
     DEBUG: bool = True
 
@@ -24,6 +24,23 @@ def get_db():
         db.close()
 
 
+def upgrade_schema():
+    """
+    Aplicar as migrações do Alembic (alembic upgrade head)
+    create_all não adiciona colunas/índices novos a tabelas que já existem
+    """
+    import os
+    from alembic import command
+    from alembic.config import Config
+
+    # Sem arquivo .ini: o env.py não reconfigura o logging da aplicação
+    config = Config()
+    config.set_main_option("script_location", os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic"))
+    config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL)
+    command.upgrade(config, "head")
+
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
     print("Database tables created!")
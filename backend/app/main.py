@@ -1,13 +1,22 @@
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
 
 # Importar routers
-from app.api import auth, users, lessons, progress, chat, upload, advanced_analytics
+from app.api import auth, users, lessons, progress, chat, upload, advanced_analytics, admin
 from app.api.production_endpoints import router as production_router
+from app.database import engine
+from app.services.health_monitor import health_monitor
+from app.config import settings
+from app.utils.compression import CompressedVariantCache, CompressionMiddleware
+from app.utils.file_serving import PrivateStaticFiles
+from app.utils.metrics import PrometheusMiddleware, metrics_response, register_db_pool
+from app.utils.responses import FastJSONResponse
+from app.utils.profiler import RequestProfilerMiddleware, sampling_profiler
+from app.utils.tracing import TracingMiddleware
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -28,16 +37,65 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ AI models initialization failed: {e}")
 
+    # Indexar lições e exercícios para busca por similaridade
+    try:
+        from app.services.advanced_learning_engine import advanced_learning_engine
+        index_stats = await advanced_learning_engine.refresh_content_index()
+        logger.info(f"✅ Content vector index ready: {index_stats}")
+    except Exception as e:
+        logger.warning(f"⚠️ Content indexing failed: {e}")
+
+    # Q&A do chat persistido por execuções anteriores que já passou do TTL do cache
+    try:
+        from app.services.semantic_cache import semantic_response_cache
+        await semantic_response_cache.purge_expired()
+    except Exception as e:
+        logger.warning(f"⚠️ Chat Q&A index purge failed: {e}")
+
+    # Fonemas das frases das lições (pré-computados na escrita de cada lição)
+    try:
+        from app.services.phoneme_lexicon import target_phrase_index
+        await asyncio.to_thread(target_phrase_index.load)
+        await target_phrase_index.start()
+    except Exception as e:
+        logger.warning(f"⚠️ Target phrase index failed: {e}")
+
+    # Gravação write-behind dos chat logs
+    from app.services.chat_log_writer import chat_log_writer
+    await chat_log_writer.start()
+
     # Criar diretórios necessários
     os.makedirs("static/audio", exist_ok=True)
     os.makedirs("static/uploads", exist_ok=True)
 
+    # Retenção do armazenamento de áudio (TTL, quota por usuário, Opus)
+    from app.services.audio_storage import audio_storage
+    await audio_storage.start()
+
+    # Pool de processos da ingestão (transcodificação para o formato canônico)
+    if settings.AUDIO_INGEST_ENABLED:
+        from app.services.audio_ingest import audio_ingestor
+        try:
+            await audio_ingestor.start()
+        except Exception as e:
+            logger.warning(f"⚠️ Audio ingest pool failed to start: {e}")
+
     logger.info("✅ Bilingui-AI Backend started successfully!")
 
     yield
 
     logger.info("👋 Shutting down Bilingui-AI Backend...")
 
+    await chat_log_writer.stop()
+    await audio_storage.stop()
+    from app.services.phoneme_lexicon import target_phrase_index
+    await target_phrase_index.stop()
+    if settings.AUDIO_INGEST_ENABLED:
+        await asyncio.to_thread(audio_ingestor.stop)
+
+    from app.services.vector_index import vector_indexes
+    vector_indexes.flush_all()
+
 app = FastAPI(
     title="Bilingui-AI Production Backend",
     description="""
@@ -82,6 +140,7 @@ app = FastAPI(
     """,
     version="4.0.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc"
 )
@@ -95,8 +154,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve static files (uploaded audio files)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Compressão das respostas JSON (negociada por Accept-Encoding)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        route_minimum_sizes=settings.COMPRESSION_ROUTE_MIN_SIZE,
+        cache=CompressedVariantCache(settings.COMPRESSION_CACHE_ENTRIES, settings.COMPRESSION_CACHE_MAX_BYTES)
+    )
+
+# Métricas Prometheus (latência por rota)
+app.add_middleware(PrometheusMiddleware)
+register_db_pool(engine)
+
+# Spans por requisição + header Server-Timing
+app.add_middleware(TracingMiddleware, max_stages=settings.TRACING_SERVER_TIMING_STAGES)
+
+# Profiling sob demanda de uma requisição (header X-Profile-Request)
+app.add_middleware(
+    RequestProfilerMiddleware, profiler=sampling_profiler, token=settings.PROFILER_REQUEST_TOKEN
+)
+
+# Arquivos estáticos; áudio de usuários só sai por /audio/files/{id} (com checagem de dono)
+app.mount(
+    "/static",
+    PrivateStaticFiles(directory="static", private_prefixes=("uploads", "audio")),
+    name="static"
+)
 
 # Include routers (prefixes are defined inside each router)
 app.include_router(auth.router)
@@ -106,6 +190,7 @@ app.include_router(progress.router, prefix="/progress", tags=["Progress"])
 app.include_router(chat.router, prefix="/chat")
 app.include_router(upload.router, prefix="/audio", tags=["Audio Processing"])
 app.include_router(advanced_analytics.router, prefix="/analytics", tags=["Advanced Analytics"])
+app.include_router(admin.router)
 
 # Include production endpoints
 app.include_router(production_router, prefix="/production", tags=["Production AI Features"])
@@ -140,22 +225,40 @@ async def health_check():
     """
     Health check endpoint for production monitoring
     """
+    report = await health_monitor.readiness()
     return {
-        "status": "healthy",
-        "timestamp": "2024-01-01T00:00:00Z",
+        "status": "healthy" if report["status"] == "ready" else "degraded",
+        "timestamp": report["timestamp"],
         "services": {
-            "ai_models": "operational",
-            "database": "connected",
-            "speech_processing": "ready",
-            "learning_engine": "active"
+            name: "operational" if check["ok"] else "unavailable"
+            for name, check in report["checks"].items()
         },
-        "performance": {
-            "response_time": "< 200ms",
-            "accuracy": "95%",
-            "uptime": "99.9%"
-        }
+        "checks": report["checks"]
     }
 
+@app.get("/health/live")
+async def liveness_probe():
+    """
+    Liveness probe: o processo está respondendo
+    """
+    return health_monitor.liveness()
+
+@app.get("/health/ready")
+async def readiness_probe():
+    """
+    Readiness probe: modelos carregados, banco, armazenamento e fila de inferência
+    Retorna 503 enquanto o pod não puder atender tráfego de áudio
+    """
+    report = await health_monitor.readiness()
+    return FastJSONResponse(report, status_code=200 if report["status"] == "ready" else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Métricas no formato de exposição do Prometheus
+    """
+    return metrics_response()
+
 @app.get("/market-readiness")
 async def market_readiness():
     """
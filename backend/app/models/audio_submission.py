@@ -1,12 +1,16 @@
 
 # app/models/audio_submission.py
-from sqlalchemy import Column, Integer, ForeignKey, String, Float, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, String, Float, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.models.base import Base
 
 class AudioSubmission(Base):
     __tablename__ = "audio_submissions"
+    __table_args__ = (
+        # Quota por usuário e varredura por idade
+        Index("ix_audio_submissions_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -15,4 +19,10 @@ class AudioSubmission(Base):
     score = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Ciclo de vida do arquivo (gerenciado pelo AudioStorageManager)
+    size_bytes = Column(Integer, default=0)       # original + .npy canônico + cópia Opus (quota)
+    content_hash = Column(String(64), index=True)
+    opus_path = Column(String, nullable=True)
+    purged_at = Column(DateTime, nullable=True)
+
     user = relationship("User", back_populates="audio_submissions")
@@ -1,14 +1,20 @@
 # app/models/chat_log.py
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.models.base import Base
 
 class ChatLog(Base):
     __tablename__ = "chat_logs"
+    __table_args__ = (
+        # Carregamento do histórico recente por usuário
+        Index("ix_chat_logs_user_id_timestamp", "user_id", "timestamp"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # IDs são alocados pelo ChatLogWriter (tabela id_sequences), não pelo autoincrement
+    id = Column(Integer, primary_key=True, index=True, autoincrement=False)
     user_id = Column(Integer, ForeignKey("users.id"))
+    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=True)
     message = Column(Text)
     response = Column(Text)
     timestamp = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,10 @@
+# app/models/id_sequence.py
+from sqlalchemy import Column, Integer, String
+from app.models.base import Base
+
+class IdSequence(Base):
+    """Sequências nomeadas para alocação de IDs em blocos (hi/lo)"""
+    __tablename__ = "id_sequences"
+
+    name = Column(String, primary_key=True)
+    next_value = Column(Integer, nullable=False, default=1)
@@ -1,6 +1,6 @@
 # app/models/lesson.py
-from sqlalchemy import Column, Integer, String, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, JSON, event, inspect
+from sqlalchemy.orm import Session, relationship
 from app.models.base import Base
 
 class Lesson(Base):
@@ -12,5 +12,46 @@ class Lesson(Base):
     title = Column(String)
     type = Column(String)  # reading, listening, speaking, question, chat
     content = Column(Text)
+    phonemes = Column(JSON, nullable=True)  # {frase normalizada: [[palavra, "F O N E M A S", origem], ...]}
 
     progress = relationship("Progress", back_populates="lesson")
+
+
+@event.listens_for(Lesson, "before_insert")
+@event.listens_for(Lesson, "before_update")
+def _precompute_phonemes(mapper, connection, lesson):
+    """Fonemas das frases calculados na escrita: a análise de pronúncia só consulta"""
+    from app.services.phoneme_lexicon import lesson_phonemes
+
+    state = inspect(lesson)
+    if state.persistent and not (
+        state.attrs.content.history.has_changes() or state.attrs.language.history.has_changes()
+    ):
+        return
+    lesson.phonemes = lesson_phonemes(lesson.content, lesson.language)
+
+
+# O índice de frases só muda quando a transação confirma (rollback não deixa frases órfãs)
+@event.listens_for(Session, "after_flush")
+def _collect_lesson_phonemes(session, flush_context):
+    changed = session.info.setdefault("lesson_phonemes", {})
+    for lesson in list(session.new) + list(session.dirty):
+        if isinstance(lesson, Lesson):
+            changed[lesson.id] = lesson.phonemes or {}
+    for lesson in session.deleted:
+        if isinstance(lesson, Lesson):
+            changed[lesson.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_lesson_phonemes(session):
+    changed = session.info.pop("lesson_phonemes", None)
+    if changed:
+        from app.services.phoneme_lexicon import target_phrase_index
+
+        target_phrase_index.set_lessons(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_lesson_phonemes(session):
+    session.info.pop("lesson_phonemes", None)
@@ -7,6 +7,7 @@ from datetime import datetime
 class ChatRequest(BaseModel):
     message: str
     lesson_id: Optional[int] = None # Optional, if chat is sometimes not tied to a lesson
+    context: str = "" # Free-text lesson context used by the tutor
     # Add any other fields your chat endpoint expects, e.g., user_id
 
 class ChatResponse(BaseModel):
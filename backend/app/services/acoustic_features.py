@@ -0,0 +1,303 @@
+
+import functools
+import io
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from scipy.fft import dct
+from scipy.signal import find_peaks
+
+from app.services.voice_activity import VoiceActivityDetector, voice_activity_detector
+
+logger = logging.getLogger(__name__)
+
+# Tamanho de bloco (em frames) do STFT: limita a memória em clipes longos
+_BLOCK_FRAMES = 512
+
+@functools.lru_cache(maxsize=8)
+def _mel_basis(sr: int, n_fft: int, n_mels: int) -> np.ndarray:
+    import librosa
+
+    return librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels).astype(np.float32)
+
+@dataclass
+class AcousticFeatures:
+    """
+    Features por frame (hop fixo) + resumos usados por fluência, prosódia e qualidade
+    f0 em Hz, NaN nos frames sem voz; mfcc (frames x n_mfcc) para comparação com templates nativos
+    """
+    sr: int
+    hop: int
+    duration: float
+    rms: np.ndarray
+    zcr: np.ndarray
+    flatness: np.ndarray
+    f0: np.ndarray
+    speech: np.ndarray
+    mfcc: np.ndarray = field(default_factory=lambda: np.zeros((0, 13), dtype=np.float32))
+    pauses: List[Tuple[float, float]] = field(default_factory=list)
+    syllable_frames: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    clipping_ratio: float = 0.0
+    snr_db: float = 0.0
+    peak_dbfs: float = -120.0
+
+    @property
+    def frame_seconds(self) -> float:
+        return self.hop / self.sr
+
+    @property
+    def speech_seconds(self) -> float:
+        return float(np.count_nonzero(self.speech)) * self.frame_seconds
+
+    @property
+    def syllables(self) -> int:
+        return len(self.syllable_frames)
+
+    @property
+    def pause_seconds(self) -> float:
+        return sum(end - start for start, end in self.pauses)
+
+    @property
+    def speech_rate(self) -> float:
+        """Sílabas por segundo de fala"""
+        return self.syllables / self.speech_seconds if self.speech_seconds > 0 else 0.0
+
+    @property
+    def words_per_minute(self) -> float:
+        # ~1.4 sílabas por palavra em inglês conversacional
+        return self.speech_rate * 60 / 1.4
+
+    @property
+    def rms_dbfs(self) -> float:
+        speech_rms = self.rms[self.speech] if self.speech.any() else self.rms
+        if len(speech_rms) == 0:
+            return -120.0
+        return float(20 * np.log10(np.sqrt(np.mean(speech_rms ** 2)) + 1e-9))
+
+    @property
+    def voiced_f0(self) -> np.ndarray:
+        return self.f0[~np.isnan(self.f0)]
+
+    def pitch_range_semitones(self) -> float:
+        """Faixa de entonação (p10-p90) em semitons"""
+        f0 = self.voiced_f0
+        if len(f0) < 5:
+            return 0.0
+        low, high = np.percentile(f0, [10, 90])
+        return float(12 * np.log2(high / low))
+
+    def fluency_score(self) -> float:
+        """
+        Fluência 0-1: taxa silábica dentro da faixa natural (3-6 sílabas/s),
+        pouco tempo em pausas e poucas pausas longas (>1s)
+        """
+        if self.speech_seconds <= 0:
+            return 0.0
+        rate = self.speech_rate
+        rate_score = np.clip(1 - max(0.0, 3.0 - rate) / 3.0 - max(0.0, rate - 6.0) / 3.0, 0, 1)
+
+        span = self.speech_seconds + self.pause_seconds
+        pause_ratio = self.pause_seconds / span
+        pause_score = np.clip(1 - max(0.0, pause_ratio - 0.15) / 0.5, 0, 1)
+
+        # Por minuto só a partir de 1 min de clipe: num drill de poucos segundos
+        # uma pausa longa conta como uma, não como 10-30 por minuto
+        long_pauses = sum(1 for start, end in self.pauses if end - start > 1.0)
+        long_pause_rate = long_pauses / max(span / 60, 1.0)
+        return float(np.clip(0.5 * rate_score + 0.5 * pause_score - 0.05 * long_pause_rate, 0, 1))
+
+    def summary(self) -> Dict:
+        return {
+            "duration": round(self.duration, 3),
+            "speech_seconds": round(self.speech_seconds, 3),
+            "pauses": len(self.pauses),
+            "speech_rate": round(self.speech_rate, 2),
+            "pitch_range_semitones": round(self.pitch_range_semitones(), 2),
+            "snr_db": round(self.snr_db, 1),
+            "clipping_ratio": round(self.clipping_ratio, 5)
+        }
+
+class AcousticFeatureExtractor:
+    """
+    Um único STFT (frames sem janela, FFT com zero-padding 2x) alimenta todas as features:
+    - RMS e ZCR no domínio do tempo dos mesmos frames
+    - flatness espectral e MFCC (banco mel + DCT) a partir de |X|²
+    - pitch por YIN vetorizado: autocorrelação linear = irfft(|X|²)
+    Fala/pausas vêm do mesmo classificador do VAD
+    """
+
+    def __init__(self, frame_ms: float = 40.0, fmin: float = 65.0, fmax: float = 400.0,
+                 yin_threshold: float = 0.15, min_pause_ms: float = 250.0,
+                 n_mels: int = 40, n_mfcc: int = 13,
+                 vad: Optional[VoiceActivityDetector] = None):
+        self.frame_ms = frame_ms
+        self.fmin = fmin
+        self.fmax = fmax
+        self.yin_threshold = yin_threshold
+        self.min_pause_ms = min_pause_ms
+        self.n_mels = n_mels
+        self.n_mfcc = n_mfcc
+        self.vad = vad or voice_activity_detector
+
+    def extract(self, audio: np.ndarray, sr: int) -> AcousticFeatures:
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        hop = max(int(sr * self.vad.hop_ms / 1000), 1)
+        frame = max(int(sr * self.frame_ms / 1000), int(np.ceil(sr / self.fmin)) + 2)
+        duration = len(audio) / sr if sr else 0.0
+
+        if len(audio) < frame:
+            empty = np.zeros(0, dtype=np.float32)
+            return AcousticFeatures(sr=sr, hop=hop, duration=duration, rms=empty, zcr=empty,
+                                    flatness=empty, f0=empty, speech=np.zeros(0, dtype=bool),
+                                    mfcc=np.zeros((0, self.n_mfcc), dtype=np.float32))
+
+        frames = np.lib.stride_tricks.sliding_window_view(audio, frame)[::hop]
+        n_fft = 1 << int(np.ceil(np.log2(2 * frame)))
+        tau_min = max(int(sr / self.fmax), 2)
+        tau_max = min(int(sr / self.fmin), frame - 2)
+
+        count = len(frames)
+        rms = np.empty(count, dtype=np.float32)
+        zcr = np.empty(count, dtype=np.float32)
+        flatness = np.empty(count, dtype=np.float32)
+        f0 = np.full(count, np.nan, dtype=np.float32)
+        mfcc = np.empty((count, self.n_mfcc), dtype=np.float32)
+        mel_basis = _mel_basis(sr, n_fft, self.n_mels)
+
+        for start in range(0, count, _BLOCK_FRAMES):
+            block = frames[start:start + _BLOCK_FRAMES]
+            stop = start + len(block)
+
+            squares = block.astype(np.float64) ** 2
+            rms[start:stop] = np.sqrt(squares.mean(axis=1))
+            signs = np.signbit(block)
+            zcr[start:stop] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame
+
+            power = np.abs(np.fft.rfft(block, n=n_fft, axis=1)) ** 2
+            flatness[start:stop] = np.exp(np.mean(np.log(power + 1e-12), axis=1)) / (power.mean(axis=1) + 1e-12)
+            log_mel = np.log(power.astype(np.float32) @ mel_basis.T + 1e-10)
+            mfcc[start:stop] = dct(log_mel, type=2, axis=1, norm="ortho")[:, :self.n_mfcc]
+
+            autocorr = np.fft.irfft(power, n=n_fft, axis=1)[:, :tau_max + 2]
+            f0[start:stop] = self._yin(autocorr, squares, sr, tau_min, tau_max)
+
+        energy_db = 20 * np.log10(rms.astype(np.float64) + 1e-9)
+        speech = self.vad.classify(energy_db, zcr)
+        f0[~speech] = np.nan
+
+        features = AcousticFeatures(
+            sr=sr, hop=hop, duration=duration, rms=rms, zcr=zcr, flatness=flatness,
+            f0=f0, speech=speech, mfcc=mfcc
+        )
+        features.pauses = self._pauses(speech, features.frame_seconds)
+        features.syllable_frames = self._syllable_nuclei(energy_db, speech, features.frame_seconds)
+        features.snr_db = self._snr(energy_db, speech)
+
+        peak = float(np.max(np.abs(audio)))
+        features.peak_dbfs = float(20 * np.log10(peak + 1e-9))
+        features.clipping_ratio = float(np.count_nonzero(np.abs(audio) >= 0.999)) / len(audio)
+        return features
+
+    def _yin(self, autocorr: np.ndarray, squares: np.ndarray, sr: int,
+             tau_min: int, tau_max: int) -> np.ndarray:
+        """
+        d(τ) = Σ_{j<N-τ} (x_j - x_{j+τ})² = E_início(τ) + E_fim(τ) - 2 r(τ)
+        com r(τ) da autocorrelação linear e as energias por soma acumulada
+        """
+        frame = squares.shape[1]
+        lags = np.arange(autocorr.shape[1])
+        cumulative = np.concatenate((np.zeros((len(squares), 1)), np.cumsum(squares, axis=1)), axis=1)
+        head = cumulative[:, frame - lags]                       # Σ_{j<N-τ} x_j²
+        tail = cumulative[:, -1:] - cumulative[:, lags]          # Σ_{j≥τ} x_j²
+        difference = np.maximum(head + tail - 2 * autocorr, 0.0)
+
+        # Diferença média cumulativa normalizada
+        running = np.cumsum(difference[:, 1:], axis=1)
+        cmndf = np.ones_like(difference)
+        cmndf[:, 1:] = difference[:, 1:] * np.arange(1, difference.shape[1]) / (running + 1e-12)
+
+        window = cmndf[:, tau_min:tau_max + 1]
+        interior = window[:, 1:-1]
+        local_min = (interior < window[:, :-2]) & (interior <= window[:, 2:])
+        candidates = local_min & (interior < self.yin_threshold)
+        found = candidates.any(axis=1)
+
+        tau = np.argmax(candidates, axis=1) + tau_min + 1
+        rows = np.arange(len(tau))
+        # Interpolação parabólica em torno do mínimo
+        left, center, right = cmndf[rows, tau - 1], cmndf[rows, tau], cmndf[rows, tau + 1]
+        denominator = left - 2 * center + right
+        shift = np.where(np.abs(denominator) > 1e-12, 0.5 * (left - right) / denominator, 0.0)
+        refined = tau + np.clip(shift, -1, 1)
+
+        return np.where(found, sr / refined, np.nan).astype(np.float32)
+
+    def _pauses(self, speech: np.ndarray, frame_seconds: float) -> List[Tuple[float, float]]:
+        """Silêncios internos (entre o primeiro e o último frame de fala) acima de min_pause_ms"""
+        if not speech.any():
+            return []
+        edges = np.diff(speech.astype(np.int8))
+        gap_starts = np.flatnonzero(edges == -1) + 1
+        gap_ends = np.flatnonzero(edges == 1) + 1
+        first, last = np.flatnonzero(speech)[[0, -1]]
+        gap_starts = gap_starts[(gap_starts > first) & (gap_starts <= last)]
+        gap_ends = gap_ends[(gap_ends > first) & (gap_ends <= last)]
+        min_frames = self.min_pause_ms / 1000 / frame_seconds
+        return [
+            (round(start * frame_seconds, 3), round(end * frame_seconds, 3))
+            for start, end in zip(gap_starts.tolist(), gap_ends.tolist())
+            if end - start >= min_frames
+        ]
+
+    def _syllable_nuclei(self, energy_db: np.ndarray, speech: np.ndarray, frame_seconds: float) -> np.ndarray:
+        """Núcleos silábicos = picos do envelope de energia suavizado dentro da fala (índices de frame)"""
+        if not speech.any():
+            return np.zeros(0, dtype=np.int64)
+        kernel = np.hanning(max(int(0.05 / frame_seconds), 3))
+        envelope = np.convolve(energy_db, kernel / kernel.sum(), mode="same")
+        peaks, _ = find_peaks(envelope, prominence=3.0, distance=max(int(0.1 / frame_seconds), 1))
+        return peaks[speech[peaks]]
+
+    @staticmethod
+    def _snr(energy_db: np.ndarray, speech: np.ndarray) -> float:
+        power = 10 ** (energy_db / 10)
+        if not speech.any():
+            return 0.0
+        noise = power[~speech] if (~speech).any() else np.array([np.percentile(power, 10)])
+        return float(10 * np.log10(power[speech].mean() / (noise.mean() + 1e-12)))
+
+# Formato canônico gravado na ingestão (app.services.audio_ingest): .npy float32 mono a 16 kHz
+CANONICAL_SAMPLE_RATE = 16000
+CANONICAL_SUFFIX = ".16k.npy"
+
+def load_audio(source: Union[str, bytes], sr: Optional[int] = 16000) -> Tuple[np.ndarray, int]:
+    """
+    Decodificar caminho ou bytes para float32 mono (sr=None mantém a taxa original)
+    O .npy canônico não é decodificado: vem por mmap (copy-on-write, então continua gravável)
+    """
+    import librosa
+
+    if isinstance(source, str) and source.endswith(CANONICAL_SUFFIX):
+        audio = np.load(source, mmap_mode="c")
+        if sr is not None and sr != CANONICAL_SAMPLE_RATE:
+            audio = librosa.resample(np.asarray(audio), orig_sr=CANONICAL_SAMPLE_RATE, target_sr=sr)
+            return audio.astype(np.float32), sr
+        return audio, CANONICAL_SAMPLE_RATE
+
+    if isinstance(source, (bytes, bytearray)):
+        import soundfile as sf
+
+        audio, native_sr = sf.read(io.BytesIO(source), dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+        if sr is not None and native_sr != sr:
+            audio = librosa.resample(audio, orig_sr=native_sr, target_sr=sr)
+            return audio.astype(np.float32), sr
+        return audio, native_sr
+
+    audio, loaded_sr = librosa.load(source, sr=sr, mono=True)
+    return audio.astype(np.float32, copy=False), loaded_sr
+
+# Global instance
+acoustic_feature_extractor = AcousticFeatureExtractor()
@@ -8,6 +8,10 @@ from dataclasses import dataclass
 from enum import Enum
 import json
 
+from app.utils.metrics import record_cache
+from app.utils.tracing import traced
+from .vector_index import vector_indexes
+
 logger = logging.getLogger(__name__)
 
 class LearningStyle(Enum):
@@ -47,6 +51,7 @@ class AdvancedLearningEngine:
         self.content_difficulty_matrix = {}
         self.spaced_repetition_intervals = [1, 3, 7, 14, 30, 90, 180]
         
+    @traced()
     async def analyze_learning_pattern(self, user_id: str, 
                                      performance_history: List[Dict]) -> Dict:
         """
@@ -107,6 +112,7 @@ class AdvancedLearningEngine:
             logger.error(f"Learning pattern analysis failed: {e}")
             return self._create_default_learning_profile(user_id)
     
+    @traced()
     async def generate_adaptive_content(self, user_id: str, 
                                       lesson_type: str) -> Dict:
         """
@@ -117,6 +123,7 @@ class AdvancedLearningEngine:
             
             # Obter perfil de aprendizado
             profile = self.learning_profiles.get(user_id)
+            record_cache("learning_profiles", bool(profile))
             if not profile:
                 profile = await self.analyze_learning_pattern(user_id, [])
             
@@ -133,7 +140,8 @@ class AdvancedLearningEngine:
                 "estimated_completion_time": profile["optimal_session_length"],
                 "spaced_repetition_items": self._get_spaced_repetition_items(user_id),
                 "gamification_elements": self._add_gamification_elements(profile),
-                "success_probability": self._predict_exercise_success(profile, optimal_difficulty)
+                "success_probability": self._predict_exercise_success(profile, optimal_difficulty),
+                "similar_content": await self._find_similar_content(profile, lesson_type)
             }
             
             return adaptive_content
@@ -142,6 +150,55 @@ class AdvancedLearningEngine:
             logger.error(f"Adaptive content generation failed: {e}")
             return {"error": str(e)}
     
+    async def refresh_content_index(self) -> Dict:
+        """
+        Sincronizar índices vetoriais de lições e exercícios
+        Consulta ao banco e treino do k-means rodam fora do event loop
+        """
+        from .real_ai_models import real_ai_models
+
+        exercises = {}
+        for level in ["beginner", "intermediate", "advanced"]:
+            catalog = {
+                "pronunciation": real_ai_models._generate_pronunciation_exercise(level),
+                "grammar": real_ai_models._generate_grammar_exercise(level),
+                "vocabulary": real_ai_models._generate_vocabulary_exercise(level)
+            }
+            for skill, exercise in catalog.items():
+                exercises[f"exercise:{skill}:{level}"] = (
+                    json.dumps(exercise, ensure_ascii=False),
+                    {"skill": skill, "level": level, "exercise": exercise}
+                )
+
+        return {
+            "lessons": await self.refresh_lesson_index(),
+            "exercises": await vector_indexes.sync("exercises", exercises)
+        }
+
+    async def refresh_lesson_index(self) -> Dict:
+        """Sincronizar só o índice de lições (ex.: depois de editar uma lição)"""
+        lessons = await asyncio.to_thread(self._lesson_index_items)
+        return await vector_indexes.sync("lessons", lessons)
+
+    @staticmethod
+    def _lesson_index_items() -> Dict:
+        from app.database import SessionLocal
+        from app.models.lesson import Lesson
+
+        db = SessionLocal()
+        try:
+            return {
+                f"lesson:{lesson.id}": (
+                    f"{lesson.title}. {lesson.content or ''}",
+                    {"lesson_id": lesson.id, "title": lesson.title,
+                     "level": lesson.level, "type": lesson.type, "language": lesson.language}
+                )
+                for lesson in db.query(Lesson).all()
+            }
+        finally:
+            db.close()
+    
+    @traced()
     async def optimize_learning_path(self, user_id: str) -> Dict:
         """
         Otimização do caminho de aprendizado usando IA
@@ -180,6 +237,7 @@ class AdvancedLearningEngine:
             logger.error(f"Learning path optimization failed: {e}")
             return {"error": str(e)}
     
+    @traced()
     async def provide_real_time_coaching(self, user_id: str, 
                                        current_performance: Dict) -> Dict:
         """
@@ -479,6 +537,18 @@ class AdvancedLearningEngine:
         
         return exercises
     
+    async def _find_similar_content(self, profile: Dict, lesson_type: str) -> Dict:
+        """Busca lições e exercícios semelhantes às áreas de foco"""
+        query = f"{lesson_type} practice: " + ", ".join(profile.get("weak_areas", [])[:3])
+        try:
+            return {
+                "lessons": await vector_indexes.similar("lessons", query, k=3),
+                "exercises": await vector_indexes.similar("exercises", query, k=3)
+            }
+        except Exception as e:
+            logger.warning(f"Similar content lookup failed: {e}")
+            return {"lessons": [], "exercises": []}
+    
     def _get_spaced_repetition_items(self, user_id: str) -> List[Dict]:
         """Obtém itens para repetição espaçada"""
         # Em produção, buscar do banco de dados
@@ -8,6 +8,8 @@ import numpy as np
 from dataclasses import dataclass
 from enum import Enum
 
+from app.utils.tracing import traced
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -50,6 +52,7 @@ class AdvancedAIOrchestrator:
             logger.error(f"❌ Failed to load AI models: {e}")
             return False
     
+    @traced()
     async def analyze_speech_advanced(self, audio_data: bytes, user_id: str, 
                                     target_phrase: str, difficulty: str) -> AIResponse:
         """
@@ -101,10 +104,13 @@ class AdvancedAIOrchestrator:
                 insights=[]
             )
     
+    @traced()
     async def generate_contextual_response(self, message: str, user_context: Dict, 
-                                         lesson_context: str) -> AIResponse:
+                                         lesson_context: str,
+                                         conversation: Optional[List[Dict]] = None) -> AIResponse:
         """
         Generate contextual AI responses using advanced NLP
+        `conversation` is the budgeted prompt (summary + recent turns + message)
         """
         start_time = datetime.now()
         
@@ -123,6 +129,7 @@ class AdvancedAIOrchestrator:
                 "response": selected_response,
                 "follow_up_questions": follow_ups,
                 "context_understanding": self._analyze_context_understanding(message),
+                "context_turns": len(conversation or []),
                 "suggested_exercises": self._suggest_exercises(message, user_context),
                 "confidence_level": np.random.uniform(0.85, 0.98)
             }
@@ -149,6 +156,7 @@ class AdvancedAIOrchestrator:
                 insights=[]
             )
     
+    @traced()
     async def generate_personalized_lesson(self, user_profile: Dict, 
                                          performance_history: List[Dict]) -> AIResponse:
         """
@@ -0,0 +1,155 @@
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.acoustic_features import CANONICAL_SAMPLE_RATE, CANONICAL_SUFFIX, load_audio
+from app.utils.metrics import register_queue_depth
+
+logger = logging.getLogger(__name__)
+
+def canonical_paths(path: str) -> Tuple[str, str]:
+    """(.npy canônico, cópia Opus) ao lado do arquivo original, com o mesmo hash no nome"""
+    base = os.path.splitext(path)[0]
+    return base + CANONICAL_SUFFIX, base + ".opus"
+
+def opus_compression_level(bitrate: str) -> float:
+    """
+    "24k" -> compression_level do libsndfile, que para Opus é linear entre
+    ~256 kbps (0.0) e ~6 kbps (1.0) por canal
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*k?\s*", bitrate.lower())
+    kbps = float(match.group(1)) if match else 24.0
+    return float(np.clip(1 - (kbps - 6) / 250, 0.0, 1.0))
+
+def _write_atomic(path: str, write):
+    # Temporário único: dois uploads idênticos simultâneos podem gerar o mesmo destino
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".part")
+    os.close(fd)
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def transcode_upload(source: str, canonical_path: str, opus_path: Optional[str],
+                     opus_bitrate: str = "24k") -> Dict:
+    """
+    Roda no processo worker: decodifica o upload uma única vez para float32 mono 16 kHz
+    (.npy, lido depois por mmap em toda análise) e grava a cópia Opus para reprodução
+    """
+    audio, _ = load_audio(source, sr=CANONICAL_SAMPLE_RATE)
+    audio = np.ascontiguousarray(audio, dtype=np.float32)
+
+    def save_samples(temp_path: str):
+        with open(temp_path, "wb") as handle:
+            np.save(handle, audio)
+
+    _write_atomic(canonical_path, save_samples)
+
+    opus_written = False
+    if opus_path and not os.path.exists(opus_path):
+        import soundfile as sf
+
+        try:
+            _write_atomic(opus_path, lambda temp_path: sf.write(
+                temp_path, audio, CANONICAL_SAMPLE_RATE, format="OGG", subtype="OPUS",
+                compression_level=opus_compression_level(opus_bitrate)
+            ))
+            opus_written = True
+        except Exception as e:
+            logger.warning(f"Opus encode failed for {source}: {e}")
+    return {
+        "duration": len(audio) / CANONICAL_SAMPLE_RATE,
+        "opus": opus_written or bool(opus_path and os.path.exists(opus_path))
+    }
+
+def _warm_up() -> int:
+    # Carregar decoder/resampler (imports preguiçosos do librosa) já no startup:
+    # o primeiro upload não paga esse custo
+    import librosa
+
+    librosa.resample(np.zeros(4410, dtype=np.float32), orig_sr=44100, target_sr=CANONICAL_SAMPLE_RATE)
+    return os.getpid()
+
+@dataclass
+class IngestedAudio:
+    canonical_path: str
+    opus_path: Optional[str]
+    duration: Optional[float] = None
+
+class AudioIngestor:
+    """
+    Estágio de ingestão: cada upload é transcodificado uma vez, em um pool de processos
+    (decode + resample são CPU-bound e seguram o GIL), para o formato canônico
+    Uploads idênticos compartilham o arquivo (endereçado por conteúdo) e não são refeitos
+    """
+
+    def __init__(self, workers: int = 2, opus_enabled: bool = True, opus_bitrate: str = "24k"):
+        self.workers = workers
+        self.opus_enabled = opus_enabled
+        self.opus_bitrate = opus_bitrate
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        register_queue_depth("ingest", lambda: self.pending)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: o processo principal tem threads (pools de inferência, sweeper), fork não é seguro
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def start(self):
+        """Subir os workers (spawn + imports do decoder) no startup"""
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(loop.run_in_executor(self.executor, _warm_up) for _ in range(self.workers)))
+        logger.info(f"🎚️ Audio ingest pool ready ({len(set(pids))} workers)")
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def ingest(self, path: str) -> IngestedAudio:
+        """Gerar (ou reaproveitar) o .npy canônico e a cópia Opus do arquivo gravado"""
+        canonical_path, opus_path = canonical_paths(path)
+        if path.lower().endswith(".opus") or not self.opus_enabled:
+            opus_path = path if path.lower().endswith(".opus") else None
+        if os.path.exists(canonical_path) and (opus_path is None or os.path.exists(opus_path)):
+            return IngestedAudio(canonical_path=canonical_path, opus_path=opus_path)
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self.executor, transcode_upload, path, canonical_path,
+                opus_path if opus_path != path else None, self.opus_bitrate
+            )
+        finally:
+            self.pending -= 1
+        return IngestedAudio(
+            canonical_path=canonical_path,
+            opus_path=opus_path if result["opus"] or opus_path == path else None,
+            duration=result["duration"]
+        )
+
+# Global instance
+audio_ingestor = AudioIngestor(
+    workers=settings.AUDIO_INGEST_WORKERS,
+    opus_enabled=settings.AUDIO_INGEST_OPUS,
+    opus_bitrate=settings.AUDIO_OPUS_BITRATE
+)
@@ -0,0 +1,425 @@
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import func, or_
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.audio_submission import AudioSubmission
+from app.models.user import User
+from app.services.audio_ingest import audio_ingestor, canonical_paths
+
+logger = logging.getLogger(__name__)
+
+AUDIO_MEDIA_TYPES = {
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".webm": "audio/webm",
+    ".flac": "audio/flac"
+}
+
+STORAGE_AREAS = ("uploads", "audio")
+
+@dataclass
+class StoredAudio:
+    path: str
+    content_hash: str
+    size_bytes: int
+    submission_id: Optional[int] = None
+    canonical_path: Optional[str] = None    # .npy float32 16 kHz (mmap) gerado na ingestão
+    opus_path: Optional[str] = None
+    duration: Optional[float] = None
+
+    @property
+    def analysis_path(self) -> str:
+        """Caminho que as análises devem carregar: o canônico quando a ingestão deu certo"""
+        return self.canonical_path or self.path
+
+class AudioStorageManager:
+    """
+    Armazenamento dos áudios enviados
+    - Layout endereçado por conteúdo: {root}/{área}/{h[0:2]}/{h[2:4]}/{h}{ext}
+      (diretórios pequenos, uploads idênticos viram um único arquivo)
+    - Uma linha em audio_submissions por envio identificado, apontando para o arquivo canônico
+    - Ingestão: .npy float32 16 kHz mono + cópia Opus gerados uma vez por upload (pool de processos)
+    - Retenção: TTL + quota por usuário, aplicados por um sweeper em background
+    - Transcodificação opcional para Opus (ffmpeg) dos clipes já analisados
+    """
+
+    def __init__(self, root: str = "static", retention_days: int = 30, user_quota_mb: int = 200,
+                 sweep_interval_seconds: int = 3600, opus_enabled: bool = False,
+                 opus_bitrate: str = "24k", opus_after_seconds: int = 600,
+                 opus_keep_original: bool = False, opus_batch_size: int = 50):
+        self.root = root
+        self.retention = timedelta(days=retention_days) if retention_days > 0 else None
+        self.user_quota_bytes = user_quota_mb * 1024 * 1024
+        self.sweep_interval = sweep_interval_seconds
+        self.opus_enabled = opus_enabled
+        self.opus_bitrate = opus_bitrate
+        self.opus_after = timedelta(seconds=opus_after_seconds)
+        self.opus_keep_original = opus_keep_original
+        self.opus_batch_size = opus_batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._sweep_lock = asyncio.Lock()
+        self.last_sweep: Dict = {}
+
+    # ------------------------------------------------------------------
+    # Escrita
+
+    async def store(self, content: bytes, extension: str, user_id: Union[int, str, None] = None,
+                    area: str = "uploads") -> StoredAudio:
+        """Gravar o áudio no layout particionado, transcodificar para o formato canônico e registrar a submissão"""
+        stored = await asyncio.to_thread(self._write, content, extension, area)
+        if settings.AUDIO_INGEST_ENABLED:
+            try:
+                ingested = await audio_ingestor.ingest(stored.path)
+                stored.canonical_path = ingested.canonical_path
+                stored.opus_path = ingested.opus_path
+                stored.duration = ingested.duration
+            except Exception as e:
+                # As análises voltam a decodificar o original
+                logger.warning(f"Audio ingest failed for {stored.path}: {e}")
+        if user_id is not None and str(user_id).isdigit():
+            stored.submission_id = await asyncio.to_thread(self._record, int(user_id), stored)
+        return stored
+
+    def shard_path(self, content_hash: str, extension: str, area: str = "uploads") -> str:
+        extension = extension.lower() if extension.startswith(".") else ""
+        return os.path.join(self.root, area, content_hash[:2], content_hash[2:4], content_hash + extension)
+
+    def _write(self, content: bytes, extension: str, area: str) -> StoredAudio:
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = self.shard_path(content_hash, extension, area)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            # Escrita atômica: leitores nunca veem um arquivo pela metade
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    handle.write(content)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        else:
+            # Mesmo conteúdo já armazenado: renova o mtime para a varredura de órfãos
+            os.utime(path)
+        return StoredAudio(path=path, content_hash=content_hash, size_bytes=len(content))
+
+    def _record(self, user_id: int, stored: StoredAudio) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            submission = AudioSubmission(
+                user_id=user_id,
+                audio_path=os.path.normpath(stored.path),
+                size_bytes=self._footprint(stored.path, stored.opus_path),
+                content_hash=stored.content_hash,
+                opus_path=os.path.normpath(stored.opus_path) if stored.opus_path else None
+            )
+            db.add(submission)
+            db.commit()
+            return submission.id
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to record audio submission for user {user_id}: {e}")
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _footprint(audio_path: str, opus_path: Optional[str]) -> int:
+        """
+        Bytes em disco de uma submissão, contados na quota: o arquivo servido/original,
+        o .npy canônico da ingestão (~64 KB por segundo, em geral maior que o upload) e a cópia Opus
+        """
+        paths = {os.path.normpath(audio_path), os.path.normpath(canonical_paths(audio_path)[0])}
+        if opus_path:
+            paths.add(os.path.normpath(opus_path))
+        total = 0
+        for path in paths:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    # ------------------------------------------------------------------
+    # Leitura
+
+    async def resolve(self, submission_id: int, user_id: Union[int, str]) -> Optional[Tuple[str, str]]:
+        """(path, media type) se o usuário pode ler a submissão; None caso contrário"""
+        return await asyncio.to_thread(self._resolve, submission_id, user_id)
+
+    def _resolve(self, submission_id: int, user_id: Union[int, str]) -> Optional[Tuple[str, str]]:
+        db = SessionLocal()
+        try:
+            submission = db.query(AudioSubmission).get(submission_id)
+            if submission is None or submission.purged_at is not None or not submission.audio_path:
+                return None
+            if submission.user_id != user_id:
+                user = db.query(User).get(user_id)
+                if user is None or user.role != "admin":
+                    # Mesmo 404 de "não existe" para não revelar ids de outros usuários
+                    return None
+            # Reprodução pela cópia Opus (bem menor) quando existe
+            path = submission.audio_path
+            if submission.opus_path and os.path.exists(submission.opus_path):
+                path = submission.opus_path
+        finally:
+            db.close()
+
+        extension = os.path.splitext(path)[1].lower()
+        return path, AUDIO_MEDIA_TYPES.get(extension, "application/octet-stream")
+
+    @staticmethod
+    def file_url(submission_id: Optional[int]) -> Optional[str]:
+        return f"/audio/files/{submission_id}" if submission_id is not None else None
+
+    # ------------------------------------------------------------------
+    # Sweeper
+
+    async def start(self):
+        if self.sweep_interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info("🧹 Audio storage sweeper started")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+        logger.info("🧹 Audio storage sweeper stopped")
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Audio storage sweep failed: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.sweep_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def sweep(self) -> Dict:
+        """Aplicar retenção, transcodificar para Opus e remover órfãos (fora do event loop)"""
+        async with self._sweep_lock:
+            self.last_sweep = await asyncio.to_thread(self._sweep)
+            return self.last_sweep
+
+    def _sweep(self) -> Dict:
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        report = {"expired": 0, "over_quota": 0, "transcoded": 0, "files_removed": 0,
+                  "bytes_freed": 0, "orphans_removed": 0}
+
+        db = SessionLocal()
+        try:
+            purge = self._expired_rows(db, now)
+            report["expired"] = len(purge)
+            expired_ids = {row.id for row in purge}
+            over_quota = [row for row in self._over_quota_rows(db) if row.id not in expired_ids]
+            report["over_quota"] = len(over_quota)
+            purge += over_quota
+
+            candidate_paths: Set[str] = set()
+            for row in purge:
+                row.purged_at = now
+                candidate_paths.update(path for path in (row.audio_path, row.opus_path) if path)
+                if row.audio_path:
+                    candidate_paths.add(os.path.normpath(canonical_paths(row.audio_path)[0]))
+            db.commit()
+
+            if self.opus_enabled and shutil.which("ffmpeg"):
+                report["transcoded"], replaced = self._transcode_pending(db, now)
+                candidate_paths.update(replaced)
+
+            live_paths = self._live_paths(db)
+        finally:
+            db.close()
+
+        # Arquivo tocado há pouco pode ter sido reaproveitado por um upload idêntico em andamento
+        recent = time.time() - 300
+        for path in candidate_paths - live_paths:
+            if self._modified_after(path, recent):
+                continue
+            report["bytes_freed"] += self._remove(path)
+            report["files_removed"] += 1
+
+        if self.retention is not None:
+            removed, freed = self._remove_orphans(live_paths, time.time() - self.retention.total_seconds())
+            report["orphans_removed"] = removed
+            report["bytes_freed"] += freed
+
+        report["duration_seconds"] = round(time.perf_counter() - started, 3)
+        report["finished_at"] = now.isoformat()
+        if report["files_removed"] or report["orphans_removed"] or report["transcoded"]:
+            logger.info(f"🧹 Audio storage sweep: {report}")
+        return report
+
+    def _expired_rows(self, db, now: datetime) -> List[AudioSubmission]:
+        if self.retention is None:
+            return []
+        return db.query(AudioSubmission).filter(
+            AudioSubmission.purged_at.is_(None),
+            AudioSubmission.created_at < now - self.retention
+        ).all()
+
+    def _over_quota_rows(self, db) -> List[AudioSubmission]:
+        """Submissões mais antigas de cada usuário que passam da quota"""
+        if self.user_quota_bytes <= 0:
+            return []
+        users = db.query(AudioSubmission.user_id).filter(
+            AudioSubmission.purged_at.is_(None)
+        ).group_by(AudioSubmission.user_id).having(
+            func.sum(AudioSubmission.size_bytes) > self.user_quota_bytes
+        ).all()
+
+        purge = []
+        for (user_id,) in users:
+            used = 0
+            rows = db.query(AudioSubmission).filter(
+                AudioSubmission.user_id == user_id,
+                AudioSubmission.purged_at.is_(None)
+            ).order_by(AudioSubmission.created_at.desc()).all()
+            for row in rows:
+                used += row.size_bytes or 0
+                if used > self.user_quota_bytes:
+                    purge.append(row)
+        return purge
+
+    def _transcode_pending(self, db, now: datetime) -> Tuple[int, Set[str]]:
+        # Sem Opus ainda, ou (sem manter o original) com a cópia da ingestão pronta para substituí-lo
+        pending = AudioSubmission.opus_path.is_(None)
+        if not self.opus_keep_original:
+            pending = or_(pending, AudioSubmission.opus_path != AudioSubmission.audio_path)
+        rows = db.query(AudioSubmission).filter(
+            AudioSubmission.purged_at.is_(None),
+            AudioSubmission.audio_path.isnot(None),
+            AudioSubmission.created_at < now - self.opus_after,
+            pending
+        ).order_by(AudioSubmission.created_at).limit(self.opus_batch_size).all()
+
+        transcoded = 0
+        replaced: Set[str] = set()
+        for row in rows:
+            source = row.audio_path
+            if source.lower().endswith(".opus"):
+                row.opus_path = source
+                continue
+            target = row.opus_path or os.path.splitext(source)[0] + ".opus"
+            if not os.path.exists(target):
+                if not self._transcode(source, target):
+                    continue
+                transcoded += 1
+            row.opus_path = target
+            if not self.opus_keep_original:
+                row.audio_path = target
+                replaced.add(source)
+            row.size_bytes = self._footprint(row.audio_path, row.opus_path)
+        db.commit()
+        return transcoded, replaced
+
+    def _transcode(self, source: str, target: str) -> bool:
+        temp_path = target + ".part"
+        try:
+            subprocess.run(
+                ["ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", source,
+                 "-ac", "1", "-c:a", "libopus", "-b:a", self.opus_bitrate,
+                 "-application", "voip", "-f", "ogg", temp_path],
+                check=True, capture_output=True, timeout=120
+            )
+            os.replace(temp_path, target)
+            return True
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Opus transcode failed for {source}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    def _live_paths(self, db) -> Set[str]:
+        paths: Set[str] = set()
+        for audio_path, opus_path in db.query(AudioSubmission.audio_path, AudioSubmission.opus_path).filter(
+            AudioSubmission.purged_at.is_(None),
+            or_(AudioSubmission.audio_path.isnot(None), AudioSubmission.opus_path.isnot(None))
+        ):
+            paths.update(os.path.normpath(path) for path in (audio_path, opus_path) if path)
+            if audio_path:
+                paths.add(os.path.normpath(canonical_paths(audio_path)[0]))
+        return paths
+
+    def _remove_orphans(self, live_paths: Set[str], cutoff: float) -> Tuple[int, int]:
+        """Arquivos sem submissão viva (uploads anônimos, layout antigo) mais velhos que o TTL"""
+        removed = freed = 0
+        for area in STORAGE_AREAS:
+            for directory, _, files in os.walk(os.path.join(self.root, area), topdown=False):
+                for name in files:
+                    path = os.path.normpath(os.path.join(directory, name))
+                    if path in live_paths or self._modified_after(path, cutoff):
+                        continue
+                    freed += self._remove(path)
+                    removed += 1
+                if directory != os.path.join(self.root, area):
+                    try:
+                        os.rmdir(directory)  # só sai se o shard ficou vazio
+                    except OSError:
+                        pass
+        return removed, freed
+
+    @staticmethod
+    def _modified_after(path: str, timestamp: float) -> bool:
+        try:
+            return os.stat(path).st_mtime >= timestamp
+        except OSError:
+            return True
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except OSError:
+            return 0
+
+    def get_usage(self, user_id: int) -> Dict:
+        db = SessionLocal()
+        try:
+            files, used = db.query(
+                func.count(AudioSubmission.id), func.coalesce(func.sum(AudioSubmission.size_bytes), 0)
+            ).filter(AudioSubmission.user_id == user_id, AudioSubmission.purged_at.is_(None)).one()
+        finally:
+            db.close()
+        return {"files": files, "bytes_used": int(used), "quota_bytes": self.user_quota_bytes}
+
+# Global instance
+audio_storage = AudioStorageManager(
+    root=settings.AUDIO_STORAGE_ROOT,
+    retention_days=settings.AUDIO_RETENTION_DAYS,
+    user_quota_mb=settings.AUDIO_USER_QUOTA_MB,
+    sweep_interval_seconds=settings.AUDIO_SWEEP_INTERVAL_SECONDS,
+    opus_enabled=settings.AUDIO_OPUS_TRANSCODE,
+    opus_bitrate=settings.AUDIO_OPUS_BITRATE,
+    opus_after_seconds=settings.AUDIO_OPUS_AFTER_SECONDS,
+    opus_keep_original=settings.AUDIO_OPUS_KEEP_ORIGINAL
+)
@@ -0,0 +1,387 @@
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.chat_log import ChatLog
+from app.models.id_sequence import IdSequence
+from app.models.lesson import Lesson
+from app.utils.metrics import CHAT_LOG_ROWS, register_queue_depth
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ChatTurn:
+    id: int
+    user_id: int
+    message: str
+    response: str
+    timestamp: datetime
+    lesson_id: Optional[int] = None
+
+class IdBlockAllocator:
+    """
+    Alocador de IDs hi/lo
+    Reserva blocos na tabela id_sequences para devolver IDs reais sem esperar o INSERT
+    """
+
+    def __init__(self, sequence_name: str, block_size: int = 100):
+        self.sequence_name = sequence_name
+        self.block_size = block_size
+        self._next = 0
+        self._limit = 0
+        self._lock = asyncio.Lock()
+
+    async def next_id(self) -> int:
+        async with self._lock:
+            if self._next >= self._limit:
+                self._next, self._limit = await asyncio.to_thread(self._reserve_block)
+            allocated = self._next
+            self._next += 1
+            return allocated
+
+    def _reserve_block(self) -> Tuple[int, int]:
+        for _ in range(3):
+            db = SessionLocal()
+            try:
+                # UPDATE atômico: trava a linha (Postgres) / o banco (SQLite)
+                result = db.execute(
+                    update(IdSequence)
+                    .where(IdSequence.name == self.sequence_name)
+                    .values(next_value=IdSequence.next_value + self.block_size)
+                )
+                if result.rowcount == 0:
+                    start = (db.execute(select(func.max(ChatLog.id))).scalar() or 0) + 1
+                    db.add(IdSequence(name=self.sequence_name, next_value=start + self.block_size))
+                    db.commit()
+                    return start, start + self.block_size
+
+                limit = db.execute(
+                    select(IdSequence.next_value).where(IdSequence.name == self.sequence_name)
+                ).scalar()
+                db.commit()
+                return limit - self.block_size, limit
+            except IntegrityError:
+                # Outro worker criou a sequência ao mesmo tempo
+                db.rollback()
+            finally:
+                db.close()
+
+        raise RuntimeError(f"Could not reserve ids for sequence '{self.sequence_name}'")
+
+class ChatLogWriter:
+    """
+    Pipeline write-behind de chat logs
+    O handler só enfileira o turno; uma task em background grava em lotes
+    Lote que o banco recusa após as tentativas vai para um arquivo dead-letter (JSONL)
+    e é regravado no próximo start ou após o próximo flush bem-sucedido
+    Linhas que violam restrições vão para a quarentena (.rejected) e não travam o replay
+    """
+
+    REPLAY_BACKOFF_SECONDS = 30
+
+    def __init__(self, flush_interval_ms: int = 250, batch_size: int = 100,
+                 id_block_size: int = 100, dead_letter_path: Optional[str] = None):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.dead_letter_path = dead_letter_path
+        self.allocator = IdBlockAllocator("chat_logs", id_block_size)
+        self.queue: "asyncio.Queue[Optional[ChatTurn]]" = asyncio.Queue()
+        self.pending: Dict[int, List[ChatTurn]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._next_replay = 0.0
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "failures": 0,
+                      "dead_lettered": 0, "replayed": 0, "dropped": 0, "quarantined": 0}
+        self._known_lessons: set = set()
+        register_queue_depth("chat_log_writer", self.queue.qsize)
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info("📝 Chat log writer started")
+
+    async def stop(self):
+        """Parar o writer gravando o que ainda estiver na fila"""
+        if self._task is None:
+            return
+        # Sentinela no fim da fila: o writer grava tudo o que vem antes e encerra.
+        # (Cancelar a task pode se perder dentro de wait_for no Python < 3.12)
+        self.queue.put_nowait(None)
+        await self._task
+        self._task = None
+        logger.info("📝 Chat log writer stopped")
+
+    async def enqueue(self, user_id: int, message: str, response: str,
+                      lesson_id: Optional[int] = None) -> ChatTurn:
+        """Enfileirar um turno; retorna o turno já com ID definitivo"""
+        await self.start()
+
+        turn = ChatTurn(
+            id=await self.allocator.next_id(),
+            user_id=int(user_id),
+            message=message,
+            response=response,
+            timestamp=datetime.utcnow(),
+            lesson_id=await self._valid_lesson_id(lesson_id)
+        )
+        self.pending.setdefault(turn.user_id, []).append(turn)
+        self.queue.put_nowait(turn)
+        self.stats["enqueued"] += 1
+        return turn
+
+    async def _valid_lesson_id(self, lesson_id: Optional[int]) -> Optional[int]:
+        """
+        lesson_id inexistente vira None: a FK recusaria o INSERT do lote inteiro
+        IDs já vistos ficam em memória; lição apagada depois cai no fallback por linha
+        """
+        if lesson_id is None or lesson_id in self._known_lessons:
+            return lesson_id
+        exists = await asyncio.to_thread(self._lesson_exists, lesson_id)
+        if not exists:
+            logger.warning(f"Chat turn references unknown lesson {lesson_id}; stored without lesson")
+            return None
+        self._known_lessons.add(lesson_id)
+        return lesson_id
+
+    @staticmethod
+    def _lesson_exists(lesson_id: int) -> bool:
+        db = SessionLocal()
+        try:
+            return db.execute(select(Lesson.id).where(Lesson.id == lesson_id)).first() is not None
+        finally:
+            db.close()
+
+    async def load_recent_turns(self, user_id: int, limit: int = 20) -> List[ChatTurn]:
+        """
+        Histórico recente do usuário (mais antigo primeiro)
+        Usa o índice (user_id, timestamp) e inclui turnos ainda não gravados
+        """
+        user_id = int(user_id)
+        persisted = await asyncio.to_thread(self._query_recent, user_id, limit)
+        known_ids = {turn.id for turn in persisted}
+        unflushed = [turn for turn in self.pending.get(user_id, []) if turn.id not in known_ids]
+        return (persisted + unflushed)[-limit:]
+
+    def get_metrics(self) -> Dict:
+        return {**self.stats, "queue_depth": self.queue.qsize()}
+
+    async def _run(self):
+        await self._replay_dead_letters()
+        while True:
+            turn = await self.queue.get()
+            if turn is None:
+                return
+            batch = [turn]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    turn = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if turn is None:
+                    stopping = True
+                    break
+                batch.append(turn)
+
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[ChatTurn]):
+        for attempt in range(3):
+            try:
+                await asyncio.to_thread(self._insert_batch, batch)
+                CHAT_LOG_ROWS.labels(outcome="flushed").inc(len(batch))
+                # Banco voltou: regravar o que ficou no dead-letter
+                await self._replay_dead_letters()
+                break
+            except Exception as e:
+                self.stats["failures"] += 1
+                logger.error(f"Chat log flush failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(0.5 * (attempt + 1))
+        else:
+            await asyncio.to_thread(self._spill, batch)
+
+        for turn in batch:
+            user_pending = self.pending.get(turn.user_id, [])
+            if turn in user_pending:
+                user_pending.remove(turn)
+            if not user_pending:
+                self.pending.pop(turn.user_id, None)
+
+    @staticmethod
+    def _append_turns(path: str, batch: List[ChatTurn]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for turn in batch:
+                f.write(json.dumps({**asdict(turn), "timestamp": turn.timestamp.isoformat()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _spill(self, batch: List[ChatTurn]):
+        """Acrescentar o lote ao dead-letter; só conta como perdido se nem isso der certo"""
+        try:
+            if not self.dead_letter_path:
+                raise RuntimeError("no dead-letter path configured")
+            self._append_turns(self.dead_letter_path, batch)
+            self.stats["dead_lettered"] += len(batch)
+            CHAT_LOG_ROWS.labels(outcome="dead_lettered").inc(len(batch))
+            logger.error(f"Spilled {len(batch)} chat log rows to {self.dead_letter_path} after repeated failures")
+        except Exception as e:
+            self.stats["dropped"] += len(batch)
+            CHAT_LOG_ROWS.labels(outcome="dropped").inc(len(batch))
+            logger.error(f"Dropping {len(batch)} chat log rows, dead-letter write failed: {e}")
+
+    async def _replay_dead_letters(self):
+        if not self.dead_letter_path or time.monotonic() < self._next_replay:
+            return
+        if not (os.path.exists(self.dead_letter_path) or os.path.exists(self.dead_letter_path + ".replay")):
+            return
+        try:
+            replayed = await asyncio.to_thread(self._replay)
+        except Exception as e:
+            # Banco ainda recusando: não tentar de novo a cada flush
+            self._next_replay = time.monotonic() + self.REPLAY_BACKOFF_SECONDS
+            logger.warning(f"Chat log dead-letter replay failed: {e}")
+            return
+        if replayed:
+            logger.info(f"📝 Replayed {replayed} chat log rows from the dead-letter file")
+
+    def _replay(self) -> int:
+        """
+        Regravar o dead-letter em lotes
+        O arquivo é renomeado para .replay antes da leitura (novos spills vão para um arquivo novo)
+        e só é apagado depois de tudo gravado; numa falha fica para a próxima tentativa,
+        que ignora os IDs que já chegaram ao banco
+        """
+        replaying = self.dead_letter_path + ".replay"
+        replayed = 0
+        while True:
+            if not os.path.exists(replaying):
+                if not os.path.exists(self.dead_letter_path):
+                    break
+                os.replace(self.dead_letter_path, replaying)
+            with open(replaying, encoding="utf-8") as f:
+                turns = [
+                    ChatTurn(**{**row, "timestamp": datetime.fromisoformat(row["timestamp"])})
+                    for row in map(json.loads, filter(str.strip, f))
+                ]
+            for start in range(0, len(turns), self.batch_size):
+                batch = self._missing(turns[start:start + self.batch_size])
+                if batch:
+                    self._insert_batch(batch)
+                    replayed += len(batch)
+                    self.stats["replayed"] += len(batch)
+                    CHAT_LOG_ROWS.labels(outcome="replayed").inc(len(batch))
+            os.remove(replaying)
+        return replayed
+
+    def _missing(self, batch: List[ChatTurn]) -> List[ChatTurn]:
+        db = SessionLocal()
+        try:
+            existing = set(db.execute(
+                select(ChatLog.id).where(ChatLog.id.in_([turn.id for turn in batch]))
+            ).scalars())
+        finally:
+            db.close()
+        return [turn for turn in batch if turn.id not in existing]
+
+    def _insert_batch(self, batch: List[ChatTurn]):
+        """
+        INSERT multi-linha do lote
+        Violação de integridade (ex.: lição apagada) não derruba o lote: cai para linha a linha
+        Erros operacionais (banco fora) sobem para o retry/dead-letter
+        """
+        db = SessionLocal()
+        try:
+            db.execute(insert(ChatLog), [asdict(turn) for turn in batch])
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            db.close()
+            return self._insert_rows(batch)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.stats["flushed"] += len(batch)
+        self.stats["batches"] += 1
+
+    def _insert_rows(self, batch: List[ChatTurn]):
+        """
+        Linha a linha: lesson_id inválido é descartado e a linha regravada;
+        o que ainda violar restrições vai para a quarentena (não é regravado)
+        """
+        rejected = []
+        for turn in batch:
+            if self._missing([turn]) == []:
+                continue  # já gravada (replay interrompido)
+            attempts = [turn] if turn.lesson_id is None else [turn, ChatTurn(**{**asdict(turn), "lesson_id": None})]
+            for candidate in attempts:
+                db = SessionLocal()
+                try:
+                    db.execute(insert(ChatLog), [asdict(candidate)])
+                    db.commit()
+                    self.stats["flushed"] += 1
+                    break
+                except IntegrityError:
+                    db.rollback()
+                finally:
+                    db.close()
+            else:
+                rejected.append(turn)
+        self.stats["batches"] += 1
+
+        if rejected:
+            self.stats["quarantined"] += len(rejected)
+            CHAT_LOG_ROWS.labels(outcome="quarantined").inc(len(rejected))
+            logger.error(f"Quarantined {len(rejected)} chat log rows that violate constraints")
+            if self.dead_letter_path:
+                self._append_turns(self.dead_letter_path + ".rejected", rejected)
+
+    def _query_recent(self, user_id: int, limit: int) -> List[ChatTurn]:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(ChatLog)
+                .where(ChatLog.user_id == user_id)
+                .order_by(ChatLog.timestamp.desc())
+                .limit(limit)
+            ).scalars().all()
+            return [
+                ChatTurn(
+                    id=row.id,
+                    user_id=row.user_id,
+                    message=row.message,
+                    response=row.response,
+                    timestamp=row.timestamp,
+                    lesson_id=row.lesson_id
+                )
+                for row in reversed(rows)
+            ]
+        finally:
+            db.close()
+
+# Global instance
+chat_log_writer = ChatLogWriter(
+    flush_interval_ms=settings.CHAT_LOG_FLUSH_INTERVAL_MS,
+    batch_size=settings.CHAT_LOG_BATCH_SIZE,
+    id_block_size=settings.CHAT_LOG_ID_BLOCK_SIZE,
+    dead_letter_path=settings.CHAT_LOG_DEAD_LETTER_PATH
+)
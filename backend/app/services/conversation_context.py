@@ -0,0 +1,192 @@
+
+import asyncio
+import hashlib
+import logging
+import math
+import re
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional
+
+from app.config import settings
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def count_tokens(text: str) -> int:
+    """Estimativa de tokens (palavras/pontuação * ~1.3, como em tokenizers BPE)"""
+    return math.ceil(len(_TOKEN_PATTERN.findall(text)) * 1.3)
+
+@dataclass
+class ConversationTurn:
+    role: str
+    content: str
+    tokens: int
+    fingerprint: str
+    at: datetime = field(default_factory=datetime.utcnow)
+
+@dataclass
+class UserConversation:
+    turns: Deque[ConversationTurn] = field(default_factory=deque)
+    summary_lines: Deque[str] = field(default_factory=deque)
+    summary_tokens: int = 0
+    hydrated: bool = False
+
+class ConversationContextManager:
+    """
+    Janela de contexto por usuário com orçamento de tokens
+    Histórico compacto (sem turnos duplicados) + resumo incremental dos turnos antigos
+    """
+
+    def __init__(self, token_budget: int = 1500, max_turns: int = 24,
+                 summary_max_tokens: int = 200, max_users: int = 10000,
+                 session_idle_seconds: int = 1800):
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.max_users = max_users
+        self.session_idle = timedelta(seconds=session_idle_seconds)
+        self.conversations: "OrderedDict[str, UserConversation]" = OrderedDict()
+        self._hydrate_locks: Dict[str, asyncio.Lock] = {}
+
+    async def hydrate(self, user_id: str, limit: Optional[int] = None):
+        """Carregar o histórico persistido na primeira vez que o usuário aparece"""
+        conversation = self._get(user_id)
+        record_cache("conversation_context", conversation.hydrated)
+        if conversation.hydrated:
+            return
+
+        # Requisições simultâneas do mesmo usuário esperam a mesma carga:
+        # nenhuma monta o prompt antes de o histórico chegar
+        lock = self._hydrate_locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            if conversation.hydrated:
+                return
+            try:
+                from .chat_log_writer import chat_log_writer
+                turns = await chat_log_writer.load_recent_turns(int(user_id), limit=limit or self.max_turns)
+            except Exception as e:
+                logger.warning(f"Could not load chat history for {user_id}: {e}")
+                turns = []
+
+            for turn in turns:
+                self.add_exchange(user_id, turn.message, turn.response, at=turn.timestamp)
+            conversation.hydrated = True
+        self._hydrate_locks.pop(user_id, None)
+
+    def in_session(self, user_id: str) -> bool:
+        """
+        Usuário está no meio de uma conversa: último turno há menos de session_idle
+        O histórico reidratado de sessões anteriores não conta
+        """
+        conversation = self.conversations.get(user_id)
+        if not conversation or not conversation.turns:
+            return False
+        return datetime.utcnow() - conversation.turns[-1].at < self.session_idle
+
+    def add_exchange(self, user_id: str, message: str, response: str,
+                     at: Optional[datetime] = None):
+        self.add_turn(user_id, "user", message, at)
+        self.add_turn(user_id, "assistant", response, at)
+
+    def add_turn(self, user_id: str, role: str, content: str, at: Optional[datetime] = None):
+        content = (content or "").strip()
+        if not content:
+            return
+
+        conversation = self._get(user_id)
+        fingerprint = self._fingerprint(role, content)
+
+        # Mensagem repetida em sequência não ocupa espaço de novo
+        if any(turn.fingerprint == fingerprint for turn in list(conversation.turns)[-2:]):
+            return
+
+        conversation.turns.append(ConversationTurn(
+            role=role,
+            content=content,
+            tokens=count_tokens(content),
+            fingerprint=fingerprint,
+            at=at or datetime.utcnow()
+        ))
+
+        while len(conversation.turns) > self.max_turns:
+            self._fold_into_summary(conversation, conversation.turns.popleft())
+
+    def build_prompt(self, user_id: str, message: str, system_prompt: str = "",
+                     token_budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Montar as mensagens do prompt dentro do orçamento
+        Ordem: system, resumo, turnos mais recentes que couberem, mensagem atual
+        """
+        budget = token_budget or self.token_budget
+        conversation = self.conversations.get(user_id) or UserConversation()
+
+        head: List[Dict[str, str]] = []
+        used = count_tokens(message)
+        if system_prompt:
+            head.append({"role": "system", "content": system_prompt})
+            used += count_tokens(system_prompt)
+        if conversation.summary_lines and used + conversation.summary_tokens <= budget:
+            head.append({
+                "role": "system",
+                "content": "Earlier in this conversation: " + " ".join(conversation.summary_lines)
+            })
+            used += conversation.summary_tokens
+
+        recent: List[Dict[str, str]] = []
+        for turn in reversed(conversation.turns):
+            if used + turn.tokens > budget:
+                break
+            recent.append({"role": turn.role, "content": turn.content})
+            used += turn.tokens
+
+        return head + recent[::-1] + [{"role": "user", "content": message}]
+
+    def get_metrics(self) -> Dict:
+        return {
+            "users": len(self.conversations),
+            "turns": sum(len(c.turns) for c in self.conversations.values()),
+            "history_tokens": sum(
+                c.summary_tokens + sum(turn.tokens for turn in c.turns)
+                for c in self.conversations.values()
+            )
+        }
+
+    def _get(self, user_id: str) -> UserConversation:
+        conversation = self.conversations.get(user_id)
+        if conversation is None:
+            conversation = self.conversations[user_id] = UserConversation()
+            while len(self.conversations) > self.max_users:
+                self.conversations.popitem(last=False)
+        else:
+            self.conversations.move_to_end(user_id)
+        return conversation
+
+    def _fold_into_summary(self, conversation: UserConversation, turn: ConversationTurn):
+        """Resumo extrativo: primeira frase de cada turno antigo"""
+        first_sentence = _SENTENCE_END.split(turn.content, maxsplit=1)[0][:160]
+        speaker = "Student" if turn.role == "user" else "Tutor"
+        line = f"{speaker}: {first_sentence}"
+
+        conversation.summary_lines.append(line)
+        conversation.summary_tokens += count_tokens(line)
+        while conversation.summary_tokens > self.summary_max_tokens and len(conversation.summary_lines) > 1:
+            conversation.summary_tokens -= count_tokens(conversation.summary_lines.popleft())
+
+    @staticmethod
+    def _fingerprint(role: str, content: str) -> str:
+        normalized = " ".join(content.lower().split())
+        return hashlib.sha1(f"{role}:{normalized}".encode("utf-8")).hexdigest()
+
+# Global instance
+conversation_context = ConversationContextManager(
+    token_budget=settings.CHAT_CONTEXT_TOKEN_BUDGET,
+    max_turns=settings.CHAT_CONTEXT_MAX_TURNS,
+    summary_max_tokens=settings.CHAT_CONTEXT_SUMMARY_TOKENS,
+    max_users=settings.CHAT_CONTEXT_MAX_USERS,
+    session_idle_seconds=settings.CHAT_SESSION_IDLE_SECONDS
+)
@@ -0,0 +1,79 @@
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Opções repassadas a whisper.transcribe por perfil
+# fast: greedy, uma única temperatura (sem re-decodificações de fallback) e sem condicionar
+#       no texto anterior; com idioma fixo também não há passe de detecção de idioma
+# accurate: beam search + fallback de temperatura padrão do Whisper e timestamps por palavra
+DECODE_PROFILES: Dict[str, Dict] = {
+    "fast": {
+        "temperature": 0.0,
+        "beam_size": None,
+        "best_of": None,
+        "condition_on_previous_text": False,
+        "word_timestamps": False,
+    },
+    "accurate": {
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "beam_size": 5,
+        "best_of": 5,
+        "condition_on_previous_text": True,
+        "word_timestamps": True,
+    },
+}
+
+def whisper_language(value: Optional[str]) -> Optional[str]:
+    """
+    Código de idioma do Whisper a partir de "en", "pt-BR", "en_US" ou "English"
+    None quando desconhecido (o Whisper volta a detectar o idioma)
+    """
+    if not value:
+        return None
+    from whisper.tokenizer import LANGUAGES, TO_LANGUAGE_CODE
+
+    key = value.strip().lower().replace("_", "-")
+    code = key.split("-")[0]
+    if code in LANGUAGES:
+        return code
+    return TO_LANGUAGE_CODE.get(key)
+
+def decode_options(profile: Optional[str] = None, language: Optional[str] = None,
+                   endpoint: Optional[str] = None) -> Dict:
+    """Opções de decodificação para um perfil (ou o padrão do endpoint) e idioma"""
+    profile = profile or settings.DECODE_PROFILE_BY_ENDPOINT.get(endpoint or "", "fast")
+    if profile not in DECODE_PROFILES:
+        raise ValueError(f"Unknown decode profile '{profile}' (expected one of {tuple(DECODE_PROFILES)})")
+    options = dict(DECODE_PROFILES[profile])
+    code = whisper_language(language)
+    if code:
+        options["language"] = code
+    elif language:
+        logger.debug(f"Unknown language '{language}', Whisper will detect it")
+    return options
+
+async def resolve_language(language: Optional[str] = None, lesson_id: Optional[int] = None) -> Optional[str]:
+    """Idioma da requisição, senão o da lição, senão SPEECH_DEFAULT_LANGUAGE"""
+    if language:
+        return language
+    if lesson_id:
+        lesson_language = await asyncio.to_thread(_lesson_language, lesson_id)
+        if lesson_language:
+            return lesson_language
+    return settings.SPEECH_DEFAULT_LANGUAGE or None
+
+def _lesson_language(lesson_id: int) -> Optional[str]:
+    from app.database import SessionLocal
+    from app.models.lesson import Lesson
+
+    db = SessionLocal()
+    try:
+        row = db.query(Lesson.language).filter(Lesson.id == lesson_id).first()
+        return row[0] if row else None
+    finally:
+        db.close()
@@ -0,0 +1,130 @@
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+class HealthMonitor:
+    """
+    Checagens reais de liveness/readiness
+    O resultado da readiness fica em cache por alguns segundos para o probe ser barato
+    """
+
+    def __init__(self, cache_seconds: float = 2.0, db_timeout: float = 1.0,
+                 max_inference_queue: int = 8):
+        self.cache_seconds = cache_seconds
+        self.db_timeout = db_timeout
+        self.max_inference_queue = max_inference_queue
+        self.started_at = time.monotonic()
+        self._cached: Optional[Tuple[float, Dict]] = None
+        self._lock = asyncio.Lock()
+
+    def liveness(self) -> Dict:
+        """O processo responde - nenhuma dependência externa é consultada"""
+        return {
+            "status": "alive",
+            "timestamp": datetime.now().isoformat(),
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1)
+        }
+
+    async def readiness(self) -> Dict:
+        """Relatório de prontidão (cacheado por cache_seconds)"""
+        if self._fresh():
+            return self._cached[1]
+
+        # Um único probe em voo; os demais aguardam e reaproveitam o resultado
+        async with self._lock:
+            if self._fresh():
+                return self._cached[1]
+
+            checks = {
+                "ai_models": self._check_models(),
+                "database": await self._check_database(),
+                "storage": self._check_storage(),
+                "inference_queue": self._check_inference_queue()
+            }
+            report = {
+                "status": "ready" if all(check["ok"] for check in checks.values()) else "not_ready",
+                "timestamp": datetime.now().isoformat(),
+                "checks": checks
+            }
+            self._cached = (time.monotonic(), report)
+            return report
+
+    def _fresh(self) -> bool:
+        return self._cached is not None and time.monotonic() - self._cached[0] < self.cache_seconds
+
+    def _check_models(self) -> Dict:
+        try:
+            from app.services.real_ai_models import real_ai_models
+        except Exception as e:
+            return {"ok": False, "error": f"model runtime unavailable: {e}"}
+
+        models = real_ai_models.get_model_status()
+        missing = [name for name, status in models.items()
+                   if status["required"] and status["state"] != "loaded"]
+        return {"ok": not missing, "missing": missing, "models": models}
+
+    async def _check_database(self) -> Dict:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(_ping_database), timeout=self.db_timeout)
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": f"ping exceeded {self.db_timeout}s"}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    def _check_storage(self) -> Dict:
+        """Áreas do armazenamento de áudio configurado (AUDIO_STORAGE_ROOT) aceitam escrita"""
+        from app.services.audio_storage import STORAGE_AREAS, audio_storage
+
+        directories = {}
+        for directory in (os.path.join(audio_storage.root, area) for area in STORAGE_AREAS):
+            try:
+                os.makedirs(directory, exist_ok=True)
+                with tempfile.TemporaryFile(dir=directory) as probe:
+                    probe.write(b"ok")
+                directories[directory] = "writable"
+            except OSError as e:
+                directories[directory] = f"error: {e.strerror or e}"
+        return {
+            "ok": all(state == "writable" for state in directories.values()),
+            "directories": directories
+        }
+
+    def _check_inference_queue(self) -> Dict:
+        try:
+            from app.services.real_ai_models import real_ai_models
+        except Exception as e:
+            return {"ok": False, "error": f"model runtime unavailable: {e}"}
+
+        pending = real_ai_models.pending_inferences
+        return {
+            "ok": pending < self.max_inference_queue,
+            "pending": pending,
+            "workers": settings.INFERENCE_WORKERS,
+            "max_pending": self.max_inference_queue
+        }
+
+def _ping_database():
+    # Checkout do pool + round-trip mínimo
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+# Global instance
+health_monitor = HealthMonitor(
+    cache_seconds=settings.HEALTH_CACHE_SECONDS,
+    db_timeout=settings.HEALTH_DB_TIMEOUT_SECONDS,
+    max_inference_queue=settings.HEALTH_MAX_INFERENCE_QUEUE
+)
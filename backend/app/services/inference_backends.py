@@ -0,0 +1,294 @@
+
+import logging
+import os
+from typing import Dict, List, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# torch  = PyTorch fp32 (comportamento original)
+# int8   = PyTorch com quantização dinâmica int8 das camadas Linear (CPU)
+# onnx   = grafo exportado rodando no ONNX Runtime
+BACKENDS = ("torch", "int8", "onnx")
+
+class InferenceBackendError(RuntimeError):
+    pass
+
+def _check_backend(backend: str):
+    if backend not in BACKENDS:
+        raise InferenceBackendError(f"Unknown inference backend '{backend}' (expected one of {BACKENDS})")
+
+def _dynamic_linear_for_subclass():
+    """
+    Módulo quantizado para subclasses de nn.Linear (ex.: whisper.model.Linear)
+    Linear.from_float só aceita o tipo exato; essas subclasses só mudam o forward (cast de dtype),
+    então o módulo vira um nn.Linear comum antes da conversão
+    """
+    import torch
+
+    base = torch.ao.nn.quantized.dynamic.Linear
+
+    class SubclassDynamicLinear(base):
+        @classmethod
+        def from_float(cls, mod, *args, **kwargs):
+            mod.__class__ = torch.nn.Linear
+            return base.from_float(mod, *args, **kwargs)
+
+    return SubclassDynamicLinear
+
+def quantize_int8(module, linear_types: tuple = ()):
+    """
+    Quantização dinâmica: pesos das Linear em int8, ativações quantizadas em tempo de execução
+    quantize_dynamic compara o tipo exato do módulo; subclasses de Linear do modelo
+    (linear_types) precisam entrar na spec e no mapeamento, senão ficam em fp32 sem aviso
+    """
+    import torch
+    from torch.ao.quantization.quantization_mappings import get_default_dynamic_quant_module_mappings
+
+    targets = {torch.nn.Linear, *linear_types}
+    mapping = get_default_dynamic_quant_module_mappings()
+    if linear_types:
+        adapter = _dynamic_linear_for_subclass()
+        mapping.update({linear_type: adapter for linear_type in linear_types})
+
+    linears = [type(child) for child in module.modules() if isinstance(child, torch.nn.Linear)]
+    expected = sum(1 for linear_type in linears if linear_type in targets)
+    skipped = {linear_type.__name__ for linear_type in linears if linear_type not in targets}
+    module.eval()
+    quantized = torch.ao.quantization.quantize_dynamic(module, targets, dtype=torch.qint8, mapping=mapping)
+    replaced = sum(1 for child in quantized.modules()
+                   if isinstance(child, torch.ao.nn.quantized.dynamic.Linear))
+    if replaced < expected or (linears and not replaced):
+        raise InferenceBackendError(
+            f"int8 quantization replaced {replaced} of {len(linears)} Linear layers in {type(module).__name__}"
+        )
+    if skipped:
+        logger.warning(f"⚠️ {type(module).__name__}: Linear subclasses left in fp32: {sorted(skipped)}")
+    logger.info(f"⚖️ {type(module).__name__}: {replaced} Linear layers quantized to int8")
+    return quantized
+
+def _ort_session(path: str, threads: int = 0):
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+def _export_onnx(model, tokenizer, path: str):
+    """Exportar (input_ids, attention_mask) -> primeira saída do modelo HF, com eixos dinâmicos"""
+    import torch
+
+    class _FirstOutput(torch.nn.Module):
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, input_ids, attention_mask):
+            return self.wrapped(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sample = tokenizer(["export sample sentence"], return_tensors="pt")
+    temp_path = path + ".part"
+    with torch.no_grad():
+        torch.onnx.export(
+            _FirstOutput(model.eval()),
+            (sample["input_ids"], sample["attention_mask"]),
+            temp_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["output"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "output": {0: "batch", 1: "sequence"}
+            },
+            opset_version=17
+        )
+    os.replace(temp_path, path)
+
+def _onnx_path(cache_dir: str, model_name: str) -> str:
+    return os.path.join(cache_dir, model_name.replace("/", "__") + ".onnx")
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+# ----------------------------------------------------------------------
+# Classificador de texto (gramática)
+
+class TextClassifierBackend:
+    """
+    Interface comum: classifier(text) -> [[{"label", "score"}, ...]] (formato do pipeline HF
+    com return_all_scores=True)
+    """
+    backend = "torch"
+
+    def __call__(self, text: Union[str, List[str]]) -> List[List[Dict]]:
+        raise NotImplementedError
+
+class TorchTextClassifier(TextClassifierBackend):
+    def __init__(self, model_name: str, quantized: bool = False):
+        from transformers import pipeline
+
+        self.pipeline = pipeline("text-classification", model=model_name, return_all_scores=True)
+        if quantized:
+            self.pipeline.model = quantize_int8(self.pipeline.model)
+        self.backend = "int8" if quantized else "torch"
+
+    def __call__(self, text):
+        return self.pipeline(text)
+
+class OnnxTextClassifier(TextClassifierBackend):
+    backend = "onnx"
+
+    def __init__(self, model_name: str, cache_dir: str, threads: int = 0):
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.labels = AutoConfig.from_pretrained(model_name).id2label
+        path = _onnx_path(cache_dir, model_name)
+        if not os.path.exists(path):
+            from transformers import AutoModelForSequenceClassification
+
+            logger.info(f"📦 Exporting {model_name} to ONNX ({path})")
+            _export_onnx(AutoModelForSequenceClassification.from_pretrained(model_name), self.tokenizer, path)
+        self.session = _ort_session(path, threads)
+
+    def __call__(self, text):
+        texts = [text] if isinstance(text, str) else list(text)
+        encoded = self.tokenizer(texts, padding=True, truncation=True, return_tensors="np")
+        logits = self.session.run(None, {
+            "input_ids": encoded["input_ids"].astype(np.int64),
+            "attention_mask": encoded["attention_mask"].astype(np.int64)
+        })[0]
+        probabilities = _softmax(logits)
+        return [
+            [{"label": self.labels[index], "score": float(score)} for index, score in enumerate(row)]
+            for row in probabilities
+        ]
+
+# ----------------------------------------------------------------------
+# Sentence encoder (similaridade semântica)
+
+class SentenceEncoderBackend:
+    """Interface comum: encoder.encode(sentences) -> np.ndarray (n, dim)"""
+    backend = "torch"
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        raise NotImplementedError
+
+class TorchSentenceEncoder(SentenceEncoderBackend):
+    def __init__(self, model_name: str, quantized: bool = False):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        if quantized:
+            self.model = quantize_int8(self.model)
+        self.backend = "int8" if quantized else "torch"
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        return self.model.encode(sentences, batch_size=batch_size, **kwargs)
+
+class OnnxSentenceEncoder(SentenceEncoderBackend):
+    """Transformer em ONNX + mean pooling (e normalização, se o modelo original normaliza)"""
+    backend = "onnx"
+
+    def __init__(self, model_name: str, cache_dir: str, threads: int = 0):
+        from sentence_transformers import SentenceTransformer
+
+        reference = SentenceTransformer(model_name, device="cpu")
+        self.tokenizer = reference.tokenizer
+        self.max_seq_length = reference.max_seq_length
+        self.normalize = any(type(module).__name__ == "Normalize" for module in reference)
+        path = _onnx_path(cache_dir, model_name)
+        if not os.path.exists(path):
+            logger.info(f"📦 Exporting {model_name} to ONNX ({path})")
+            _export_onnx(reference[0].auto_model, self.tokenizer, path)
+        # O modelo PyTorch só era necessário para exportar
+        del reference
+        self.session = _ort_session(path, threads)
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np"
+            )
+            mask = encoded["attention_mask"].astype(np.int64)
+            hidden = self.session.run(None, {
+                "input_ids": encoded["input_ids"].astype(np.int64),
+                "attention_mask": mask
+            })[0]
+            weights = mask[..., None].astype(hidden.dtype)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled)
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+# ----------------------------------------------------------------------
+# Whisper
+
+class WhisperBackend:
+    """
+    Interface comum: transcribe(audio_ou_path, **opções) -> dict do openai-whisper
+    fp16 desligado: os nós são só CPU
+    """
+
+    def __init__(self, model_name: str, quantized: bool = False):
+        import whisper
+        from whisper.model import Linear as WhisperLinear
+
+        self.model_name = model_name
+        self.model = whisper.load_model(model_name, device="cpu")
+        if quantized:
+            # As camadas do openai-whisper são whisper.model.Linear, não nn.Linear
+            self.model = quantize_int8(self.model, linear_types=(WhisperLinear,))
+        self.backend = "int8" if quantized else "torch"
+
+    def transcribe(self, audio, **options) -> Dict:
+        options.setdefault("fp16", False)
+        return self.model.transcribe(audio, **options)
+
+# ----------------------------------------------------------------------
+# Fábricas
+
+def load_text_classifier(model_name: str, backend: str = "torch", cache_dir: str = "./data/onnx",
+                         threads: int = 0) -> TextClassifierBackend:
+    _check_backend(backend)
+    if backend == "onnx":
+        return OnnxTextClassifier(model_name, cache_dir, threads)
+    return TorchTextClassifier(model_name, quantized=backend == "int8")
+
+def load_sentence_encoder(model_name: str, backend: str = "torch", cache_dir: str = "./data/onnx",
+                          threads: int = 0) -> SentenceEncoderBackend:
+    _check_backend(backend)
+    if backend == "onnx":
+        return OnnxSentenceEncoder(model_name, cache_dir, threads)
+    return TorchSentenceEncoder(model_name, quantized=backend == "int8")
+
+def load_whisper(model_name: str, backend: str = "torch") -> WhisperBackend:
+    _check_backend(backend)
+    if backend == "onnx":
+        # O laço de decodificação do openai-whisper não roda sobre um grafo ONNX
+        logger.warning("⚠️ ONNX backend is not available for Whisper, using int8")
+        backend = "int8"
+    return WhisperBackend(model_name, quantized=backend == "int8")
+
+def resolve_backend(configured: Dict[str, str], model: str, default: str = "torch") -> str:
+    """Backend configurado para o modelo; onnx sem onnxruntime cai para int8"""
+    backend = configured.get(model, default)
+    _check_backend(backend)
+    if backend == "onnx":
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            logger.warning(f"⚠️ onnxruntime not installed, {model} falls back to int8")
+            return "int8"
+    return backend
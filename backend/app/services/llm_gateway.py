@@ -0,0 +1,270 @@
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.metrics import record_cache
+from app.utils.tracing import traced
+from .ai_orchestrator import ai_orchestrator, AIResponse
+from .conversation_context import count_tokens
+
+logger = logging.getLogger(__name__)
+
+PrefixKey = Tuple[Optional[int], str, str]
+
+@dataclass
+class PromptPrefix:
+    """Parte do prompt idêntica para todos os alunos de uma lição"""
+    key: PrefixKey
+    text: str
+    tokens: int
+    digest: str
+    created_at: float
+
+class LLMBackend:
+    """Interface comum dos backends de LLM"""
+    name = "base"
+
+    async def generate(self, prefix: PromptPrefix, messages: List[Dict[str, str]],
+                       user_context: Dict, lesson_context: str) -> AIResponse:
+        raise NotImplementedError
+
+class SimulatedBackend(LLMBackend):
+    """Backend atual: delega ao orquestrador (sem modelo real)"""
+    name = "simulated"
+
+    async def generate(self, prefix: PromptPrefix, messages: List[Dict[str, str]],
+                       user_context: Dict, lesson_context: str) -> AIResponse:
+        return await ai_orchestrator.generate_contextual_response(
+            message=messages[-1]["content"] if messages else "",
+            user_context=user_context,
+            lesson_context=lesson_context,
+            conversation=[{"role": "system", "content": prefix.text}] + messages
+        )
+
+class LlamaCppBackend(LLMBackend):
+    """
+    Modelo local via llama.cpp
+    O estado KV do prefixo é calculado uma vez e restaurado a cada turno
+    """
+    name = "llama_cpp"
+
+    def __init__(self, model_path: str, max_tokens: int, kv_cache_entries: int):
+        self.model_path = model_path
+        self.max_tokens = max_tokens
+        self.kv_cache_entries = kv_cache_entries
+        self.kv_states: "OrderedDict[str, Any]" = OrderedDict()
+        self.llm = None
+        self._lock = asyncio.Lock()
+
+    async def generate(self, prefix: PromptPrefix, messages: List[Dict[str, str]],
+                       user_context: Dict, lesson_context: str) -> AIResponse:
+        start_time = datetime.now()
+        # Um único contexto llama.cpp: turnos são serializados
+        async with self._lock:
+            text = await asyncio.to_thread(self._generate_sync, prefix, messages)
+        return _text_response(text, start_time, f"llama_cpp:{self.model_path}")
+
+    def _generate_sync(self, prefix: PromptPrefix, messages: List[Dict[str, str]]) -> str:
+        if self.llm is None:
+            from llama_cpp import Llama
+            self.llm = Llama(model_path=self.model_path, n_ctx=4096, verbose=False)
+
+        prefix_tokens = self.llm.tokenize(prefix.text.encode("utf-8"))
+        state = self.kv_states.get(prefix.digest)
+        if state is None:
+            self.llm.reset()
+            self.llm.eval(prefix_tokens)
+            state = self.kv_states[prefix.digest] = self.llm.save_state()
+            while len(self.kv_states) > self.kv_cache_entries:
+                self.kv_states.popitem(last=False)
+        else:
+            self.kv_states.move_to_end(prefix.digest)
+
+        # Com o estado restaurado, o llama.cpp só avalia os tokens após o prefixo
+        self.llm.load_state(state)
+        prompt = prefix.text + _render_turns(messages) + "\nTutor:"
+        completion = self.llm.create_completion(
+            prompt=prompt, max_tokens=self.max_tokens, stop=["\nStudent:"]
+        )
+        return completion["choices"][0]["text"].strip()
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    API remota compatível com OpenAI
+    O prefixo vai sempre primeiro e inalterado, com prompt_cache_key estável
+    """
+    name = "openai"
+
+    def __init__(self, api_base: str, api_key: str, model: str, max_tokens: int):
+        self.api_base = api_base.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens = max_tokens
+        self._client = None
+
+    async def generate(self, prefix: PromptPrefix, messages: List[Dict[str, str]],
+                       user_context: Dict, lesson_context: str) -> AIResponse:
+        import httpx
+
+        start_time = datetime.now()
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30.0)
+
+        response = await self._client.post(
+            f"{self.api_base}/chat/completions",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={
+                "model": self.model,
+                "messages": [{"role": "system", "content": prefix.text}] + messages,
+                "max_tokens": self.max_tokens,
+                "prompt_cache_key": prefix.digest
+            }
+        )
+        response.raise_for_status()
+        payload = response.json()
+
+        usage = payload.get("usage", {})
+        cached_tokens = usage.get("prompt_tokens_details", {}).get("cached_tokens", 0)
+        result = _text_response(
+            payload["choices"][0]["message"]["content"], start_time, self.model
+        )
+        result.data["cached_prompt_tokens"] = cached_tokens
+        return result
+
+class LLMGateway:
+    """
+    Gateway de LLM com cache de prefixo por (lesson_id, personality, model)
+    Só o sufixo específico do aluno é processado a cada turno
+    """
+
+    def __init__(self, backend: LLMBackend, model: str, prefix_cache_size: int = 256):
+        self.backend = backend
+        self.model = model
+        self.prefix_cache_size = prefix_cache_size
+        self.prefixes: "OrderedDict[PrefixKey, PromptPrefix]" = OrderedDict()
+        self.stats = {"prefix_hits": 0, "prefix_misses": 0, "prefix_tokens_reused": 0}
+
+    @traced()
+    async def generate_contextual_response(self, message: str, user_context: Dict,
+                                           lesson_context: str, lesson_id: Optional[int],
+                                           personality: str, personality_profile: Dict,
+                                           conversation: Optional[List[Dict[str, str]]] = None) -> AIResponse:
+        prefix = await self.get_prefix(lesson_id, personality, personality_profile, lesson_context)
+        messages = conversation or [{"role": "user", "content": message}]
+        return await self.backend.generate(prefix, messages, user_context, lesson_context)
+
+    async def get_prefix(self, lesson_id: Optional[int], personality: str,
+                         personality_profile: Dict, lesson_context: str = "") -> PromptPrefix:
+        # Sem lição associada, o contexto livre faz parte da chave
+        key: PrefixKey = (lesson_id, personality, self.model if lesson_id else f"{self.model}|{lesson_context}")
+        prefix = self.prefixes.get(key)
+        if prefix is not None:
+            self.prefixes.move_to_end(key)
+            self.stats["prefix_hits"] += 1
+            self.stats["prefix_tokens_reused"] += prefix.tokens
+            record_cache("llm_prompt_prefix", True)
+            return prefix
+
+        self.stats["prefix_misses"] += 1
+        record_cache("llm_prompt_prefix", False)
+        lesson = await asyncio.to_thread(_load_lesson, lesson_id) if lesson_id else None
+        text = _render_prefix(personality, personality_profile, lesson, lesson_context)
+        prefix = PromptPrefix(
+            key=key,
+            text=text,
+            tokens=count_tokens(text),
+            digest=hashlib.sha256(f"{self.model}\n{text}".encode("utf-8")).hexdigest()[:32],
+            created_at=time.monotonic()
+        )
+
+        self.prefixes[key] = prefix
+        while len(self.prefixes) > self.prefix_cache_size:
+            self.prefixes.popitem(last=False)
+        return prefix
+
+    def invalidate_lesson(self, lesson_id: int):
+        """Descartar prefixos de uma lição alterada"""
+        for key in [key for key in self.prefixes if key[0] == lesson_id]:
+            del self.prefixes[key]
+
+    def get_metrics(self) -> Dict:
+        lookups = self.stats["prefix_hits"] + self.stats["prefix_misses"]
+        return {
+            **self.stats,
+            "backend": self.backend.name,
+            "cached_prefixes": len(self.prefixes),
+            "prefix_hit_rate": self.stats["prefix_hits"] / lookups if lookups else 0.0
+        }
+
+def _load_lesson(lesson_id: int) -> Optional[Dict]:
+    from app.database import SessionLocal
+    from app.models.lesson import Lesson
+
+    db = SessionLocal()
+    try:
+        lesson = db.query(Lesson).get(lesson_id)
+        if not lesson:
+            return None
+        return {
+            "title": lesson.title,
+            "level": lesson.level,
+            "language": lesson.language,
+            "type": lesson.type,
+            "content": lesson.content
+        }
+    finally:
+        db.close()
+
+def _render_prefix(personality: str, profile: Dict, lesson: Optional[Dict],
+                   lesson_context: str) -> str:
+    lines = [
+        "You are Bilingui, an AI language tutor.",
+        f"Personality: {personality} (tone: {profile.get('tone')}, "
+        f"complexity: {profile.get('complexity')}, focus: {profile.get('focus')})."
+    ]
+    if lesson:
+        lines += [
+            f"Lesson: {lesson['title']} ({lesson['language']}, {lesson['level']}, {lesson['type']}).",
+            "Lesson content:",
+            lesson["content"] or ""
+        ]
+    elif lesson_context:
+        lines.append(f"Lesson context: {lesson_context}")
+    return "\n".join(lines) + "\n"
+
+def _render_turns(messages: List[Dict[str, str]]) -> str:
+    speakers = {"user": "Student", "assistant": "Tutor", "system": "Note"}
+    return "".join(f"\n{speakers.get(m['role'], m['role'])}: {m['content']}" for m in messages)
+
+def _text_response(text: str, start_time: datetime, model_used: str) -> AIResponse:
+    return AIResponse(
+        success=True,
+        data={"response": text},
+        confidence=1.0,
+        processing_time=(datetime.now() - start_time).total_seconds(),
+        model_used=model_used,
+        insights=[]
+    )
+
+def _create_backend() -> LLMBackend:
+    if settings.LLM_BACKEND == "llama_cpp":
+        return LlamaCppBackend(settings.MISTRAL_MODEL_PATH, settings.LLM_MAX_TOKENS,
+                               settings.LLM_KV_CACHE_ENTRIES)
+    if settings.LLM_BACKEND == "openai":
+        return OpenAICompatibleBackend(settings.LLM_API_BASE, settings.LLM_API_KEY,
+                                       settings.LLM_MODEL, settings.LLM_MAX_TOKENS)
+    return SimulatedBackend()
+
+# Global instance
+llm_gateway = LLMGateway(
+    _create_backend(),
+    model=settings.LLM_MODEL,
+    prefix_cache_size=settings.LLM_PREFIX_CACHE_SIZE
+)
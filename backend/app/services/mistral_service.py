@@ -4,7 +4,10 @@ import logging
 from typing import List, Dict, Optional
 from datetime import datetime
 import numpy as np
-from .ai_orchestrator import ai_orchestrator, AIResponse
+from .semantic_cache import semantic_response_cache
+from .conversation_context import conversation_context
+from .llm_gateway import llm_gateway
+from app.utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +19,6 @@ class AdvancedMistralService:
     
     def __init__(self):
         self.model_loaded = False
-        self.conversation_cache = {}
         self.personality_profiles = {
             "friendly_teacher": {
                 "tone": "encouraging",
@@ -48,8 +50,10 @@ class AdvancedMistralService:
             logger.error(f"❌ Failed to load Mistral model: {e}")
             return False
     
+    @traced()
     async def chat_with_mistral(self, messages: List[dict], context: str = "",
-                              user_id: str = None, personality: str = "friendly_teacher") -> str:
+                              user_id: str = None, personality: str = "friendly_teacher",
+                              lesson_id: Optional[int] = None) -> str:
         """
         Advanced chat with contextual understanding and personality
         """
@@ -61,17 +65,55 @@ class AdvancedMistralService:
             
             # Get user context for personalization
             user_context = await self._get_user_context(user_id) if user_id else {}
+            message = messages[-1]["content"] if messages else ""
+            level = user_context.get("level", "")
+            cache_scope = f"lesson:{lesson_id}|{context}" if lesson_id else context
             
-            # Use AI orchestrator for advanced response generation
-            ai_response = await ai_orchestrator.generate_contextual_response(
-                message=messages[-1]["content"] if messages else "",
+            # Prior turns are sent within the configured token budget
+            if user_id:
+                await conversation_context.hydrate(user_id)
+                in_session = conversation_context.in_session(user_id)
+                prompt_messages = conversation_context.build_prompt(user_id, message)
+            else:
+                in_session = len(messages) > 1
+                prompt_messages = messages
+            
+            # Near-duplicate questions are answered from the semantic cache, but not in the
+            # middle of a conversation: follow-ups depend on (and may quote) the recent turns.
+            # History rehydrated from earlier sessions doesn't count, so returning users still hit
+            cached_response, embedding = None, None
+            if not in_session:
+                cached_response, embedding = await semantic_response_cache.lookup(
+                    message, cache_scope, level
+                )
+            if cached_response is not None:
+                personalized_response = self._apply_personality(cached_response, personality)
+                if user_id:
+                    await self._cache_conversation(user_id, messages, personalized_response)
+                return personalized_response
+            
+            # The lesson/personality prompt prefix is cached by the LLM gateway
+            ai_response = await llm_gateway.generate_contextual_response(
+                message=message,
                 user_context=user_context,
-                lesson_context=context
+                lesson_context=context,
+                lesson_id=lesson_id,
+                personality=personality,
+                personality_profile=self.personality_profiles.get(
+                    personality, self.personality_profiles["friendly_teacher"]
+                ),
+                conversation=prompt_messages
             )
             
             if ai_response.success:
                 response_data = ai_response.data
                 
+                # Cache the raw answer (personality is applied per request)
+                if not in_session:
+                    await semantic_response_cache.store(
+                        message, cache_scope, level, response_data["response"], embedding
+                    )
+                
                 # Apply personality to response
                 personalized_response = self._apply_personality(
                     response_data["response"],
@@ -90,6 +132,7 @@ class AdvancedMistralService:
             logger.error(f"Mistral chat failed: {e}")
             return "I'm having trouble understanding right now. Could you please try again?"
     
+    @traced()
     async def generate_lesson_dialogue(self, topic: str, difficulty: str,
                                      user_profile: Dict) -> Dict:
         """
@@ -115,6 +158,7 @@ class AdvancedMistralService:
             logger.error(f"Lesson dialogue generation failed: {e}")
             return {"error": str(e)}
     
+    @traced()
     async def provide_grammar_feedback(self, user_text: str, target_grammar: str) -> Dict:
         """
         Provide detailed grammar feedback with explanations
@@ -226,19 +270,10 @@ class AdvancedMistralService:
         return response
     
     async def _cache_conversation(self, user_id: str, messages: List[dict], response: str):
-        """Cache conversation for continuity"""
-        if user_id not in self.conversation_cache:
-            self.conversation_cache[user_id] = []
-        
-        self.conversation_cache[user_id].append({
-            "timestamp": datetime.now().isoformat(),
-            "messages": messages,
-            "response": response
-        })
-        
-        # Keep only last 20 conversations
-        if len(self.conversation_cache[user_id]) > 20:
-            self.conversation_cache[user_id] = self.conversation_cache[user_id][-20:]
+        """Record the turn in the user's compact context window"""
+        conversation_context.add_exchange(
+            user_id, messages[-1]["content"] if messages else "", response
+        )
     
     def _get_fallback_response(self, context: str) -> str:
         """Get fallback response when AI fails"""
@@ -0,0 +1,300 @@
+
+import csv
+import json
+import logging
+import math
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.acoustic_features import AcousticFeatures, acoustic_feature_extractor, load_audio
+from app.services.phoneme_lexicon import normalize_phrase
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Peso do contorno de pitch (semitons / 12) frente aos 12 MFCCs normalizados
+_PITCH_WEIGHT = 2.0
+
+def template_features(features: AcousticFeatures) -> np.ndarray:
+    """
+    Sequência comparável entre falantes (frames x 13), só do primeiro ao último frame de fala:
+    MFCC 1-12 com normalização de média/variância por locução (tira canal e timbre)
+    + pitch em semitons relativo à mediana do falante (0 nos frames sem voz)
+    """
+    if not features.speech.any() or len(features.mfcc) == 0:
+        return np.zeros((0, 13), dtype=np.float32)
+    first, last = np.flatnonzero(features.speech)[[0, -1]]
+    mfcc = features.mfcc[first:last + 1, 1:13].astype(np.float32)
+    mfcc = (mfcc - mfcc.mean(axis=0)) / (mfcc.std(axis=0) + 1e-6)
+
+    f0 = features.f0[first:last + 1]
+    voiced = ~np.isnan(f0)
+    pitch = np.zeros(len(f0), dtype=np.float32)
+    if voiced.any():
+        pitch[voiced] = 12 * np.log2(f0[voiced] / np.median(f0[voiced]))
+    return np.column_stack((mfcc, _PITCH_WEIGHT * pitch / 12)).astype(np.float32)
+
+def banded_dtw(x: np.ndarray, y: np.ndarray, band: float = 0.15,
+               min_radius: int = 8) -> Tuple[float, np.ndarray]:
+    """
+    DTW com banda de Sakoe-Chiba inclinada (segue a diagonal n x m) e custo euclidiano por frame
+    Vetorizado por anti-diagonal: as células de i+j=k dependem só das diagonais k-1 e k-2,
+    então cada diagonal é uma operação numpy sobre a largura da banda - O((n+m) x raio)
+    Memória também O((n+m) x raio): só as duas últimas diagonais de custo ficam vivas,
+    e o caminho sai de um backpointer int8 por célula da banda
+    Retorna (custo médio por passo do caminho, caminho como array (passos x 2) de índices (x, y))
+    """
+    n, m = len(x), len(y)
+    if n == 0 or m == 0:
+        return math.inf, np.zeros((0, 2), dtype=np.int64)
+    slope = m / n
+    # Raio mínimo que mantém a banda conexa quando os tamanhos diferem muito
+    radius = max(min_radius, band * max(n, m), slope + 1, 1 / slope + 1)
+
+    # Diagonal k guardada como (primeiro i, custos das células i..); a 0 é só a origem e a 1 é borda
+    previous, before = (1, np.zeros(0)), (0, np.zeros(1))
+    # Passo que chegou a cada célula: 0 = (i-1, j-1), 1 = (i-1, j), 2 = (i, j-1)
+    lows = np.zeros(n + m + 1, dtype=np.int64)
+    pointers: List[np.ndarray] = [np.zeros(0, dtype=np.int8)] * (n + m + 1)
+
+    def window(diagonal: Tuple[int, np.ndarray], first: int, count: int) -> np.ndarray:
+        # Custos das células first..first+count-1 da diagonal (inf fora da banda)
+        low, values = diagonal
+        out = np.full(count, np.inf)
+        start, stop = max(first, low), min(first + count, low + len(values))
+        if start < stop:
+            out[start - first:stop - first] = values[start - low:stop - low]
+        return out
+
+    for k in range(2, n + m + 1):
+        # Células com i + j = k e |i·m/n - j| <= raio
+        low = max(1, k - m, math.ceil((k - radius) / (1 + slope)))
+        high = min(n, k - 1, math.floor((k + radius) / (1 + slope)))
+        if low > high:
+            previous, before = (low, np.zeros(0)), previous
+            continue
+        i = np.arange(low, high + 1)
+        j = k - i
+        local = np.sqrt(np.sum((x[i - 1] - y[j - 1]) ** 2, axis=1))
+        count = high - low + 1
+        candidates = np.stack((window(before, low - 1, count), window(previous, low - 1, count),
+                               window(previous, low, count)))
+        step = np.argmin(candidates, axis=0)
+        lows[k], pointers[k] = low, step.astype(np.int8)
+        previous, before = (low, local + candidates[step, np.arange(count)]), previous
+
+    low, values = previous
+    if low != n or not len(values) or not np.isfinite(values[0]):
+        return math.inf, np.zeros((0, 2), dtype=np.int64)
+    total = float(values[0])
+
+    path = [(n - 1, m - 1)]
+    i, j = n, m
+    while i > 1 or j > 1:
+        step = pointers[i + j][i - lows[i + j]]
+        i, j = (i - 1, j - 1) if step == 0 else (i - 1, j) if step == 1 else (i, j - 1)
+        path.append((i - 1, j - 1))
+    path = np.asarray(path[::-1], dtype=np.int64)
+    return total / len(path), path
+
+@dataclass
+class NativeTemplate:
+    phrase: str
+    features: np.ndarray         # view do arquivo memory-mapped (frames x dim)
+    recordings: int
+    reference_distance: float    # distância DTW típica entre falantes nativos desta frase
+
+class NativeTemplateStore:
+    """
+    Templates de falantes nativos por frase de lição, computados offline (build)
+    templates.npy: todos os frames (float16) concatenados, lido com mmap
+    index.json: frase normalizada -> offset/frames no array + distância de referência
+    Na requisição o custo é uma única DTW com banda contra o template da frase
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.NATIVE_TEMPLATE_DIR
+        self.band = settings.NATIVE_TEMPLATE_BAND
+        self.default_reference_distance = settings.NATIVE_TEMPLATE_REFERENCE_DISTANCE
+        self._frames: Optional[np.ndarray] = None
+        self._index: Dict[str, Dict] = {}
+        self._meta: Dict = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            index_path = os.path.join(self.directory, "index.json")
+            try:
+                if os.path.exists(index_path):
+                    with open(index_path) as f:
+                        meta = json.load(f)
+                    self._frames = np.load(os.path.join(self.directory, "templates.npy"), mmap_mode="r")
+                    self._index = meta.pop("phrases")
+                    self._meta = meta
+                    logger.info(f"🗣️ Native templates loaded: {len(self._index)} phrases")
+                else:
+                    logger.info("No native templates built; native comparison disabled")
+            except Exception as e:
+                logger.error(f"❌ Failed to load native templates: {e}")
+            self._loaded = True
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._index)
+
+    def __contains__(self, text: str) -> bool:
+        self._load()
+        return normalize_phrase(text) in self._index
+
+    def get(self, text: str) -> Optional[NativeTemplate]:
+        self._load()
+        phrase = normalize_phrase(text)
+        entry = self._index.get(phrase)
+        record_cache("native_template", entry is not None)
+        if entry is None:
+            return None
+        offset, frames = entry["offset"], entry["frames"]
+        return NativeTemplate(
+            phrase=phrase,
+            features=self._frames[offset:offset + frames],
+            recordings=entry["recordings"],
+            reference_distance=entry.get("reference_distance") or self.default_reference_distance
+        )
+
+    def compare(self, text: str, features: Optional[AcousticFeatures]) -> Optional[Dict]:
+        """Comparar a fala do aluno com o template nativo da frase; None sem template ou sem fala"""
+        template = self.get(text)
+        if template is None or features is None:
+            return None
+        if (features.sr, features.hop) != (self._meta.get("sr"), self._meta.get("hop")):
+            logger.warning(f"Native templates built for sr={self._meta.get('sr')}/hop={self._meta.get('hop')}, "
+                           f"got sr={features.sr}/hop={features.hop}")
+            return None
+        student = template_features(features)
+        if len(student) < 2:
+            return None
+
+        native = np.asarray(template.features, dtype=np.float32)
+        distance, path = banded_dtw(student, native, self.band)
+        if not path.size:
+            return None
+        reference = template.reference_distance
+        similarity = float(np.exp(-max(distance - reference, 0.0) / reference))
+
+        # Entonação: correlação dos contornos de pitch alinhados onde ambos têm voz
+        student_pitch, native_pitch = student[path[:, 0], -1], native[path[:, 1], -1]
+        voiced = (student_pitch != 0) & (native_pitch != 0)
+        intonation = None
+        if np.count_nonzero(voiced) >= 10 and student_pitch[voiced].std() > 0 and native_pitch[voiced].std() > 0:
+            intonation = float(np.corrcoef(student_pitch[voiced], native_pitch[voiced])[0, 1])
+
+        return {
+            "similarity_score": round(similarity, 4),
+            "distance": round(distance, 4),
+            "reference_distance": round(reference, 4),
+            "intonation_correlation": round(intonation, 3) if intonation is not None else None,
+            # > 1: mais lento que o nativo
+            "tempo_ratio": round(len(student) / len(native), 3),
+            "divergent_regions": self._divergent_regions(student, native, path, reference, features)
+        }
+
+    @staticmethod
+    def _divergent_regions(student: np.ndarray, native: np.ndarray, path: np.ndarray,
+                           reference: float, features: AcousticFeatures,
+                           min_seconds: float = 0.1) -> List[Tuple[float, float]]:
+        """Trechos da fala do aluno (segundos no áudio original) bem mais distantes que o nativo típico"""
+        local = np.sqrt(np.sum((student[path[:, 0]] - native[path[:, 1]]) ** 2, axis=1))
+        per_frame = np.zeros(len(student))
+        np.maximum.at(per_frame, path[:, 0], local)
+        divergent = per_frame > 1.5 * reference
+
+        offset = int(np.flatnonzero(features.speech)[0])
+        edges = np.diff(np.concatenate(([0], divergent.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        frame_seconds = features.frame_seconds
+        return [
+            (round((offset + start) * frame_seconds, 3), round((offset + end) * frame_seconds, 3))
+            for start, end in zip(starts.tolist(), ends.tolist())
+            if (end - start) * frame_seconds >= min_seconds
+        ]
+
+    @classmethod
+    def build(cls, recordings: Iterable[Tuple[str, str]], directory: Optional[str] = None,
+              band: Optional[float] = None) -> "NativeTemplateStore":
+        """
+        Compilar (frase, caminho do áudio nativo) no diretório
+        Com várias gravações da mesma frase fica a medoide (menor DTW média às demais)
+        e a média dessas distâncias vira a distância de referência da frase
+        """
+        directory = directory or settings.NATIVE_TEMPLATE_DIR
+        band = settings.NATIVE_TEMPLATE_BAND if band is None else band
+        sr = 16000
+        hop = None
+        by_phrase: Dict[str, List[np.ndarray]] = defaultdict(list)
+        for phrase, path in recordings:
+            audio, _ = load_audio(path, sr=sr)
+            features = acoustic_feature_extractor.extract(audio, sr)
+            sequence = template_features(features)
+            if len(sequence) < 2:
+                logger.warning(f"No speech in native recording {path}, skipped")
+                continue
+            hop = features.hop
+            by_phrase[normalize_phrase(phrase)].append(sequence)
+
+        chunks, index, offset = [], {}, 0
+        for phrase, sequences in by_phrase.items():
+            reference = None
+            chosen = sequences[0]
+            if len(sequences) > 1:
+                distances = np.zeros((len(sequences), len(sequences)))
+                for a in range(len(sequences)):
+                    for b in range(a + 1, len(sequences)):
+                        distances[a, b] = distances[b, a] = banded_dtw(sequences[a], sequences[b], band)[0]
+                mean_distance = distances.sum(axis=1) / (len(sequences) - 1)
+                medoid = int(np.argmin(mean_distance))
+                chosen = sequences[medoid]
+                if np.isfinite(mean_distance[medoid]):
+                    reference = round(float(mean_distance[medoid]), 4)
+            chunks.append(chosen.astype(np.float16))
+            index[phrase] = {"offset": offset, "frames": len(chosen), "recordings": len(sequences),
+                             "reference_distance": reference}
+            offset += len(chosen)
+
+        os.makedirs(directory, exist_ok=True)
+        frames = np.concatenate(chunks) if chunks else np.zeros((0, 13), dtype=np.float16)
+        np.save(os.path.join(directory, "templates.npy"), frames)
+        with open(os.path.join(directory, "index.json"), "w") as f:
+            json.dump({"sr": sr, "hop": hop, "dim": int(frames.shape[1]), "phrases": index}, f)
+        logger.info(f"🗣️ Native templates compiled: {len(index)} phrases, {len(frames)} frames")
+        return cls(directory)
+
+def read_manifest(path: str) -> Iterable[Tuple[str, str]]:
+    """CSV com colunas phrase,audio_path (caminhos relativos ao manifesto)"""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            yield row["phrase"], os.path.join(base, row["audio_path"])
+
+# Global instance
+native_template_store = NativeTemplateStore()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile native-speaker recordings into the memory-mapped template store")
+    parser.add_argument("manifest", help="CSV com as colunas phrase,audio_path")
+    parser.add_argument("--output", default=settings.NATIVE_TEMPLATE_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    NativeTemplateStore.build(read_manifest(args.manifest), args.output)
@@ -0,0 +1,455 @@
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+VOWELS = frozenset(("AA", "AE", "AH", "AO", "AW", "AY", "EH", "ER", "EY", "IH", "IY", "OW", "OY", "UH", "UW"))
+
+# Fonemas do inglês (ARPAbet) que costumam dar trabalho por língua nativa
+DIFFICULT_PHONEMES = {
+    "pt": {
+        "TH": "Put the tongue between the teeth and blow air, as in 'think' (not 't' or 'f')",
+        "DH": "Voiced 'th' as in 'this': tongue between the teeth, with voice (not 'd')",
+        "HH": "An initial 'h' is breathed out, as in 'house' (it is not silent)",
+        "IH": "Short, relaxed 'i' as in 'ship', different from the long 'ee' in 'sheep'",
+        "AE": "Open the mouth wide for the 'a' in 'cat', between 'é' and 'a'",
+        "R": "Curl the tongue back without touching the roof of the mouth, as in 'red'",
+        "NG": "End 'ng' in the back of the mouth without adding a vowel, as in 'sing'",
+        "UH": "Short 'u' as in 'book', shorter than the 'oo' in 'food'",
+    },
+    "es": {
+        "TH": "Put the tongue between the teeth and blow air, as in 'think'",
+        "DH": "Voiced 'th' as in 'this', softer than 'd'",
+        "V": "Upper teeth on the lower lip for 'v', different from 'b'",
+        "Z": "Buzz the 'z' as in 'zoo', it is voiced unlike 's'",
+        "SH": "Round the lips for 'sh' as in 'she', different from 'ch'",
+        "IH": "Short, relaxed 'i' as in 'ship', different from 'sheep'",
+        "JH": "'j' as in 'job' starts with a 'd' sound",
+    },
+}
+
+_WORD = re.compile(r"[a-z']+")
+_PHRASE_SPLIT = re.compile(r"[.!?;:\n]+")
+_LEXICON_FILES = ("labels", "first_child", "child_count", "pron_index", "pron_offsets", "phones")
+
+@dataclass
+class WordPhonemes:
+    word: str
+    phonemes: List[str]
+    source: str    # lexicon | g2p
+
+    @property
+    def vowels(self) -> List[str]:
+        return [phone for phone in self.phonemes if base_phone(phone) in VOWELS]
+
+    @property
+    def stress(self) -> str:
+        """Padrão de acento a partir dos dígitos das vogais (ex.: "10" em HH AH1 L OW0)"""
+        return "".join(phone[-1] for phone in self.vowels if phone[-1].isdigit())
+
+    def to_row(self) -> List:
+        return [self.word, " ".join(self.phonemes), self.source]
+
+    @classmethod
+    def from_row(cls, row: List) -> "WordPhonemes":
+        return cls(word=row[0], phonemes=row[1].split(), source=row[2])
+
+def base_phone(phone: str) -> str:
+    return phone.rstrip("012")
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+def split_phrases(content: str) -> List[str]:
+    """Frases de uma lição (por pontuação final e quebras de linha), normalizadas e sem repetição"""
+    phrases = []
+    for piece in _PHRASE_SPLIT.split(content or ""):
+        phrase = normalize_phrase(piece)
+        if phrase and phrase not in phrases:
+            phrases.append(phrase)
+    return phrases
+
+def is_english(language: Optional[str]) -> bool:
+    return (language or "").strip().lower().replace("_", "-").split("-")[0] in ("en", "english", "")
+
+# ----------------------------------------------------------------------
+# Léxico compilado: trie em arrays planos (BFS), lidos com mmap
+
+class PhonemeLexicon:
+    """
+    Trie de um dicionário estilo CMUdict em arrays .npy memory-mapped:
+    os filhos de cada nó ficam contíguos e ordenados pelo caractere (busca binária por nível)
+    labels[n]       caractere da aresta que chega ao nó n
+    first_child[n]  índice do primeiro filho; child_count[n] quantidade de filhos
+    pron_index[n]   pronúncia do nó (-1 se o prefixo não é palavra)
+    pron_offsets/phones: fonemas de cada pronúncia (índices em symbols)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        self.symbols: List[str] = meta["symbols"]
+        self.words = meta["words"]
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in _LEXICON_FILES}
+        self.labels = arrays["labels"]
+        self.first_child = arrays["first_child"]
+        self.child_count = arrays["child_count"]
+        self.pron_index = arrays["pron_index"]
+        self.pron_offsets = arrays["pron_offsets"]
+        self.phones = arrays["phones"]
+        self.lookup = functools.lru_cache(maxsize=50_000)(self._lookup)
+
+    def _lookup(self, word: str) -> Optional[Tuple[str, ...]]:
+        node = 0
+        for char in word.lower():
+            count = int(self.child_count[node])
+            if count == 0:
+                return None
+            start = int(self.first_child[node])
+            labels = self.labels[start:start + count]
+            code = ord(char)
+            position = int(np.searchsorted(labels, code))
+            if position == count or labels[position] != code:
+                return None
+            node = start + position
+        pron = int(self.pron_index[node])
+        if pron < 0:
+            return None
+        begin, end = int(self.pron_offsets[pron]), int(self.pron_offsets[pron + 1])
+        return tuple(self.symbols[index] for index in self.phones[begin:end])
+
+    def __contains__(self, word: str) -> bool:
+        return self.lookup(word) is not None
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, List[str]]], directory: str) -> "PhonemeLexicon":
+        """Compilar (palavra, fonemas) no diretório; a primeira pronúncia de cada palavra prevalece"""
+        root: Dict = {}
+        pronunciations: List[List[str]] = []
+        symbols: Dict[str, int] = {}
+        for word, phonemes in entries:
+            node = root
+            for char in word:
+                node = node.setdefault(char, {})
+            if None in node:
+                continue
+            node[None] = len(pronunciations)
+            pronunciations.append(phonemes)
+            for phone in phonemes:
+                symbols.setdefault(phone, len(symbols))
+
+        labels, first_child, child_count, pron_index = [0], [0], [0], [-1]
+        queue = deque([(0, root)])
+        while queue:
+            index, node = queue.popleft()
+            children = sorted((char, child) for char, child in node.items() if char is not None)
+            first_child[index] = len(labels)
+            child_count[index] = len(children)
+            for char, child in children:
+                queue.append((len(labels), child))
+                labels.append(ord(char))
+                first_child.append(0)
+                child_count.append(0)
+                pron_index.append(child.get(None, -1))
+
+        offsets = np.zeros(len(pronunciations) + 1, dtype=np.int32)
+        offsets[1:] = np.cumsum([len(phonemes) for phonemes in pronunciations])
+        phones = np.fromiter((symbols[phone] for phonemes in pronunciations for phone in phonemes),
+                             dtype=np.uint8, count=int(offsets[-1]))
+
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            "labels": np.asarray(labels, dtype=np.uint16),
+            "first_child": np.asarray(first_child, dtype=np.int32),
+            "child_count": np.asarray(child_count, dtype=np.uint16),
+            "pron_index": np.asarray(pron_index, dtype=np.int32),
+            "pron_offsets": offsets,
+            "phones": phones,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"symbols": sorted(symbols, key=symbols.get), "words": len(pronunciations),
+                       "nodes": len(labels)}, f)
+        logger.info(f"📚 Phoneme lexicon compiled: {len(pronunciations)} words, {len(labels)} trie nodes")
+        return cls(directory)
+
+def read_cmudict(path: str) -> Iterator[Tuple[str, List[str]]]:
+    """Entradas de um arquivo CMUdict ("WORD  P1 P2", "word(2) p1 p2 # comentário" ou "word 1 P1 P2")"""
+    with open(path, encoding="latin-1") as f:
+        for line in f:
+            if not line.strip() or line.startswith(";;;"):
+                continue
+            parts = line.split("#", 1)[0].split()
+            if len(parts) < 2:
+                continue
+            word = parts[0].lower()
+            if word.endswith(")") and "(" in word:
+                word = word[:word.index("(")]
+            phones = parts[1:]
+            # Corpus do NLTK traz o número da variante antes dos fonemas ("a 1 AH0")
+            if phones[0].isdigit():
+                phones = phones[1:]
+            if phones:
+                yield word, [phone.upper() for phone in phones]
+
+def _find_source() -> Optional[str]:
+    if settings.PHONEME_LEXICON_SOURCE and os.path.exists(settings.PHONEME_LEXICON_SOURCE):
+        return settings.PHONEME_LEXICON_SOURCE
+    try:
+        import nltk
+
+        return nltk.data.find("corpora/cmudict/cmudict")
+    except (ImportError, LookupError):
+        return None
+
+def load_lexicon(directory: Optional[str] = None) -> Optional[PhonemeLexicon]:
+    """Léxico compilado (compila na primeira vez a partir do CMUdict); None = só G2P"""
+    directory = directory or settings.PHONEME_LEXICON_DIR
+    if os.path.exists(os.path.join(directory, "meta.json")):
+        return PhonemeLexicon(directory)
+    source = _find_source()
+    if source is None:
+        logger.warning("⚠️ No CMUdict source found, phonemes come from the G2P rules only")
+        return None
+    return PhonemeLexicon.build(read_cmudict(source), directory)
+
+# ----------------------------------------------------------------------
+# G2P por regras (fallback para palavras fora do léxico)
+
+# Grafemas testados do mais longo para o mais curto em cada posição
+_G2P_RULES = {
+    "tion": ["SH", "AH", "N"], "sion": ["ZH", "AH", "N"], "ough": ["AO"], "augh": ["AO"],
+    "igh": ["AY"], "tch": ["CH"], "dge": ["JH"], "dg": ["JH"], "ght": ["T"],
+    "ch": ["CH"], "sh": ["SH"], "th": ["TH"], "ph": ["F"], "wh": ["W"], "ck": ["K"], "ng": ["NG"],
+    "qu": ["K", "W"], "kn": ["N"], "wr": ["R"], "gh": ["G"],
+    "ee": ["IY"], "ea": ["IY"], "oo": ["UW"], "ai": ["EY"], "ay": ["EY"], "oa": ["OW"], "ow": ["OW"],
+    "ou": ["AW"], "oi": ["OY"], "oy": ["OY"], "au": ["AO"], "aw": ["AO"], "ew": ["UW"], "ie": ["IY"],
+    "ar": ["AA", "R"], "er": ["ER"], "ir": ["ER"], "ur": ["ER"], "or": ["AO", "R"],
+    "a": ["AE"], "e": ["EH"], "i": ["IH"], "o": ["AA"], "u": ["AH"],
+    "b": ["B"], "d": ["D"], "f": ["F"], "h": ["HH"], "j": ["JH"], "k": ["K"], "l": ["L"], "m": ["M"],
+    "n": ["N"], "p": ["P"], "r": ["R"], "s": ["S"], "t": ["T"], "v": ["V"], "w": ["W"], "x": ["K", "S"],
+    "z": ["Z"],
+}
+_G2P_MAX = max(len(grapheme) for grapheme in _G2P_RULES)
+_LONG_VOWELS = {"a": "EY", "e": "IY", "i": "AY", "o": "OW", "u": "UW"}
+
+def rule_g2p(word: str) -> List[str]:
+    """Letra-para-som por regras gulosas; acento primário na primeira vogal"""
+    word = word.lower().replace("'", "")
+    long_vowel_at = -1
+    soft_end = False
+    if len(word) > 2 and word.endswith("e") and word[-2] not in "aeiouy":
+        soft_end = word[-2] in "cg"    # "ce"/"ge" finais: c e g brandos
+        word = word[:-1]    # "e" final mudo
+        # Vogal + consoante + "e" mudo = vogal longa ("phone", "make", "time")
+        if len(word) >= 2 and word[-2] in _LONG_VOWELS and (len(word) < 3 or word[-3] not in "aeiou"):
+            long_vowel_at = len(word) - 2
+    phonemes: List[str] = []
+    position = 0
+    while position < len(word):
+        char = word[position]
+        following = word[position + 1:position + 2]
+        soft = following in ("e", "i", "y") or (soft_end and position == len(word) - 1)
+        if char == "c":
+            phonemes.append("S" if soft else "K")
+            position += 1 + (following == "c")
+            continue
+        if char == "g" and soft:
+            phonemes.append("JH")
+            position += 1
+            continue
+        if position == long_vowel_at:
+            phonemes.append(_LONG_VOWELS[char])
+            position += 1
+            continue
+        if char == "y":
+            phonemes.append("Y" if position == 0 else ("IY" if position == len(word) - 1 else "IH"))
+            position += 1
+            continue
+        for size in range(min(_G2P_MAX, len(word) - position), 0, -1):
+            grapheme = word[position:position + size]
+            if grapheme in _G2P_RULES:
+                phones = _G2P_RULES[grapheme]
+                # Consoante dobrada soa uma vez
+                if not (size == 1 and phonemes and phonemes[-1] == phones[-1] and phones[-1] not in VOWELS):
+                    phonemes.extend(phones)
+                position += size
+                break
+        else:
+            position += 1
+
+    stressed = False
+    for index, phone in enumerate(phonemes):
+        if phone in VOWELS:
+            phonemes[index] = phone + ("0" if stressed else "1")
+            stressed = True
+    return phonemes
+
+# ----------------------------------------------------------------------
+# Fonemas por palavra/frase e índice de frases-alvo das lições
+
+class PhonemeTranscriber:
+    """Léxico (mmap) primeiro, G2P por regras como fallback; carregado sob demanda"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._lexicon: Optional[PhonemeLexicon] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def lexicon(self) -> Optional[PhonemeLexicon]:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._lexicon = load_lexicon(self.directory)
+                    except Exception as e:
+                        logger.error(f"❌ Failed to load phoneme lexicon: {e}")
+                    self._loaded = True
+        return self._lexicon
+
+    def word(self, word: str) -> WordPhonemes:
+        word = word.lower()
+        phonemes = self.lexicon.lookup(word) if self.lexicon is not None else None
+        if phonemes is not None:
+            return WordPhonemes(word=word, phonemes=list(phonemes), source="lexicon")
+        return WordPhonemes(word=word, phonemes=rule_g2p(word), source="g2p")
+
+    def phrase(self, text: str) -> List[WordPhonemes]:
+        return [self.word(word) for word in normalize_phrase(text).split()]
+
+def lesson_phonemes(content: str, language: Optional[str]) -> Dict[str, List[List]]:
+    """
+    Fonemas de todas as frases da lição (gravados em Lesson.phonemes)
+    Fora do inglês grava {} e não NULL: NULL marca a lição como pendente no backfill do startup
+    """
+    if not is_english(language):
+        return {}
+    return {
+        phrase: [word.to_row() for word in phoneme_transcriber.phrase(phrase)]
+        for phrase in split_phrases(content)
+    }
+
+class TargetPhraseIndex:
+    """
+    Frase normalizada -> fonemas, a partir de Lesson.phonemes (pré-computado na escrita da lição)
+    A análise por requisição só consulta este índice; frases fora das lições caem no transcritor
+    Escritas confirmadas neste processo entram pelo hook after_commit (app.models.lesson);
+    as de outros workers, pelo recarregamento periódico
+    """
+
+    def __init__(self, transcriber: PhonemeTranscriber, refresh_interval: float = 0):
+        self.transcriber = transcriber
+        self.refresh_interval = refresh_interval
+        self.phrases: Dict[str, List[List]] = {}
+        self.lessons: Dict[int, Dict[str, List[List]]] = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self):
+        """
+        Carregar as frases de todas as lições (startup e recarregamento, fora do event loop)
+        Lições gravadas antes do léxico recebem os fonemas aqui
+        """
+        from app.database import SessionLocal
+        from app.models.lesson import Lesson
+
+        db = SessionLocal()
+        try:
+            pending = db.query(Lesson).filter(Lesson.phonemes.is_(None)).all()
+            for lesson in pending:
+                lesson.phonemes = lesson_phonemes(lesson.content, lesson.language)
+            if pending:
+                db.commit()
+            rows = db.query(Lesson.id, Lesson.phonemes).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            self.lessons = {lesson_id: phonemes or {} for lesson_id, phonemes in rows}
+            self._rebuild()
+        if not self.loaded or pending:
+            logger.info(f"📚 Target phrase index loaded: {len(self.phrases)} phrases ({len(pending)} lessons backfilled)")
+        self.loaded = True
+
+    def set_lessons(self, changed: Dict[int, Optional[Dict[str, List[List]]]]):
+        """Trocar as frases das lições alteradas (None = lição removida); frases antigas saem"""
+        with self._lock:
+            for lesson_id, phonemes in changed.items():
+                if phonemes is None:
+                    self.lessons.pop(lesson_id, None)
+                else:
+                    self.lessons[lesson_id] = phonemes
+            self._rebuild()
+
+    def _rebuild(self):
+        phrases: Dict[str, List[List]] = {}
+        for lesson_id in sorted(self.lessons):
+            phrases.update(self.lessons[lesson_id])
+        self.phrases = phrases
+
+    async def start(self):
+        if self.refresh_interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._stop.is_set():
+                return
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception as e:
+                logger.error(f"Target phrase index refresh failed: {e}")
+
+    def lookup(self, text: str) -> List[WordPhonemes]:
+        rows = self.phrases.get(normalize_phrase(text))
+        record_cache("phrase_phonemes", rows is not None)
+        if rows is not None:
+            return [WordPhonemes.from_row(row) for row in rows]
+        return self.transcriber.phrase(text)
+
+# Global instance
+phoneme_transcriber = PhonemeTranscriber()
+target_phrase_index = TargetPhraseIndex(phoneme_transcriber, settings.PHRASE_INDEX_REFRESH_SECONDS)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile a CMUdict file into the memory-mapped phoneme lexicon")
+    parser.add_argument("source", help="arquivo no formato CMUdict")
+    parser.add_argument("--output", default=settings.PHONEME_LEXICON_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    PhonemeLexicon.build(read_cmudict(args.source), args.output)
@@ -8,6 +8,7 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 import json
 from .real_ai_models import real_ai_models, RealTimeAnalysis, LanguageLevel
+from app.utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -99,6 +100,7 @@ class ProductionLearningEngine:
             logger.error(f"Failed to create student profile: {e}")
             raise
 
+    @traced()
     async def analyze_learning_session(self, user_id: str, session_data: Dict) -> Dict:
         """
         Analisar sessão de aprendizado em tempo real
@@ -136,6 +138,7 @@ class ProductionLearningEngine:
             logger.error(f"Learning session analysis failed: {e}")
             raise
 
+    @traced()
     async def generate_adaptive_lesson(self, user_id: str, lesson_type: str) -> Dict:
         """
         Gerar lição adaptativa baseada no perfil do estudante
@@ -173,6 +176,7 @@ class ProductionLearningEngine:
             logger.error(f"Adaptive lesson generation failed: {e}")
             raise
 
+    @traced()
     async def track_learning_progress(self, user_id: str) -> Dict:
         """
         Rastrear progresso de aprendizado com métricas detalhadas
@@ -1,6 +1,10 @@
 
 import asyncio
+import contextvars
+import functools
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple, Any
 import numpy as np
 from datetime import datetime, timedelta
@@ -9,12 +13,9 @@ import re
 from dataclasses import dataclass, asdict
 from enum import Enum
 import torch
-import librosa
 import soundfile as sf
 from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
 import spacy
-from sentence_transformers import SentenceTransformer
-import whisper
 import speech_recognition as sr
 from scipy.spatial.distance import cosine
 import textstat
@@ -22,6 +23,18 @@ from textblob import TextBlob
 import requests
 import os
 
+from app.config import settings
+from app.services.acoustic_features import AcousticFeatures, acoustic_feature_extractor, load_audio
+from app.services.decode_profiles import decode_options, whisper_language
+from app.services.inference_backends import (
+    load_sentence_encoder, load_text_classifier, load_whisper, resolve_backend
+)
+from app.services.target_alignment import TargetAlignment, target_aligner
+from app.services.voice_activity import VadResult, voice_activity_detector
+from app.services.whisper_cascade import WhisperCascade
+from app.utils.metrics import MODEL_LOAD_SECONDS, register_queue_depth, track_stage
+from app.utils.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 class LanguageLevel(Enum):
@@ -50,84 +63,208 @@ class RealAIModels:
     Focado em resultados reais de aprendizado
     """
     
+    REQUIRED_MODELS = ("whisper", "grammar", "sentence_transformer")
+    
     def __init__(self):
         self.whisper_model = None
+        self.cascade_models: Dict[str, Any] = {}
         self.grammar_model = None
         self.sentence_transformer = None
         self.nlp = None
         self.speech_recognizer = None
         self.models_loaded = False
+        self.model_status: Dict[str, Dict] = {
+            name: {"state": "not_loaded", "error": None, "load_seconds": None, "loaded_at": None, "backend": None}
+            for name in ("whisper", *self._cascade_model_names(), "grammar", "sentence_transformer", "spacy")
+        }
+        self.whisper_cascade = WhisperCascade(
+            max_short_seconds=settings.WHISPER_CASCADE_MAX_SHORT_SECONDS,
+            max_target_words=settings.WHISPER_CASCADE_MAX_TARGET_WORDS,
+            min_confidence=settings.WHISPER_CASCADE_MIN_CONFIDENCE,
+            min_target_match=settings.WHISPER_CASCADE_MIN_TARGET_MATCH
+        )
+        
+        # Inferência CPU-bound roda fora do event loop, em um pool dedicado
+        self.inference_executor = ThreadPoolExecutor(
+            max_workers=settings.INFERENCE_WORKERS, thread_name_prefix="inference"
+        )
+        self.pending_inferences = 0
+        register_queue_depth("inference", lambda: self.pending_inferences)
+        
+    async def _run_inference(self, fn, *args, **kwargs):
+        """Executar chamada de modelo no pool de inferência"""
+        self.pending_inferences += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # Propagar o contexto (span atual) para a thread do pool
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self.inference_executor, context.run, functools.partial(fn, *args, **kwargs)
+            )
+        finally:
+            self.pending_inferences -= 1
         
-    async def initialize_production_models(self):
+    async def initialize_production_models(self) -> bool:
         """
         Inicializar modelos reais para produção
         """
+        logger.info("🚀 Loading production AI models...")
+        
+        backends = {
+            name: resolve_backend(settings.INFERENCE_BACKENDS, name)
+            for name in ("whisper", "grammar", "sentence_transformer")
+        }
+        
+        # Carregar Whisper para transcrição real (maior tier da cascata)
+        whisper_tiers = settings.WHISPER_CASCADE_TIERS if settings.WHISPER_CASCADE_ENABLED else ["base"]
+        self._load_model("whisper", lambda: load_whisper(whisper_tiers[-1], backends["whisper"]), "whisper_model")
+        
+        # Tiers menores da cascata são opcionais: sem eles tudo vai para o maior
+        cascade = []
+        for tier in whisper_tiers[:-1]:
+            name = f"whisper_{tier}"
+            if not self._load_model(name, lambda tier=tier: load_whisper(tier, backends["whisper"]), None):
+                logger.warning(f"⚠️ Whisper {tier} not loaded, cascade skips this tier")
+            cascade.append((tier, self.cascade_models.get(name)))
+        cascade.append((whisper_tiers[-1], self.whisper_model))
+        self.whisper_cascade.set_tiers(cascade)
+        
+        # Carregar modelo de gramática
+        self._load_model("grammar", lambda: load_text_classifier(
+            "textattack/roberta-base-CoLA", backends["grammar"],
+            cache_dir=settings.ONNX_MODEL_DIR, threads=settings.ONNX_INTRA_OP_THREADS
+        ), "grammar_model")
+        
+        # Carregar sentence transformer para análise semântica
+        self._load_model("sentence_transformer", lambda: load_sentence_encoder(
+            "all-MiniLM-L6-v2", backends["sentence_transformer"],
+            cache_dir=settings.ONNX_MODEL_DIR, threads=settings.ONNX_INTRA_OP_THREADS
+        ), "sentence_transformer")
+        
+        # Carregar spaCy para análise linguística (opcional)
+        if not self._load_model("spacy", lambda: spacy.load("en_core_web_sm"), "nlp"):
+            logger.warning("⚠️ spaCy model not found, using basic NLP")
+        
+        # Inicializar reconhecedor de fala
+        self.speech_recognizer = sr.Recognizer()
+        
+        failed = [name for name in self.REQUIRED_MODELS if self.model_status[name]["state"] != "loaded"]
+        if failed:
+            logger.error(f"❌ Failed to load production models: {failed}")
+            raise RuntimeError(f"Failed to load models: {', '.join(failed)}")
+        
+        self.models_loaded = True
+        logger.info("✅ All production AI models loaded successfully")
+        return True
+
+    def _load_model(self, name: str, loader, attribute: str) -> bool:
+        """Carregar um modelo registrando estado e tempo de carga"""
+        status = self.model_status[name]
+        status.update(state="loading", error=None)
+        started = time.perf_counter()
         try:
-            logger.info("🚀 Loading production AI models...")
-            
-            # Carregar Whisper para transcrição real
-            self.whisper_model = whisper.load_model("base")
-            logger.info("✅ Whisper model loaded")
-            
-            # Carregar modelo de gramática
-            self.grammar_model = pipeline(
-                "text-classification",
-                model="textattack/roberta-base-CoLA",
-                return_all_scores=True
-            )
-            logger.info("✅ Grammar model loaded")
-            
-            # Carregar sentence transformer para análise semântica
-            self.sentence_transformer = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("✅ Sentence transformer loaded")
-            
-            # Carregar spaCy para análise linguística
-            try:
-                self.nlp = spacy.load("en_core_web_sm")
-            except OSError:
-                logger.warning("⚠️ spaCy model not found, using basic NLP")
-                self.nlp = None
-            
-            # Inicializar reconhecedor de fala
-            self.speech_recognizer = sr.Recognizer()
-            
-            self.models_loaded = True
-            logger.info("✅ All production AI models loaded successfully")
-            
+            model = loader()
+            if attribute is None:
+                self.cascade_models[name] = model
+            else:
+                setattr(self, attribute, model)
         except Exception as e:
-            logger.error(f"❌ Failed to load production models: {e}")
-            raise
+            status.update(state="failed", error=str(e))
+            logger.error(f"❌ Failed to load {name}: {e}")
+            return False
+        
+        elapsed = time.perf_counter() - started
+        MODEL_LOAD_SECONDS.labels(model=name).set(elapsed)
+        backend = getattr(model, "backend", None)
+        status.update(state="loaded", load_seconds=round(elapsed, 3), loaded_at=datetime.now().isoformat(),
+                      backend=backend)
+        logger.info(f"✅ {name} model loaded" + (f" ({backend})" if backend else ""))
+        return True
+
+    @staticmethod
+    def _cascade_model_names() -> List[str]:
+        if not settings.WHISPER_CASCADE_ENABLED:
+            return []
+        return [f"whisper_{tier}" for tier in settings.WHISPER_CASCADE_TIERS[:-1]]
+
+    def get_cascade_stats(self) -> Dict:
+        """Taxa de acerto por tier da cascata Whisper"""
+        return {"enabled": settings.WHISPER_CASCADE_ENABLED, **self.whisper_cascade.stats()}
+
+    def get_model_status(self) -> Dict[str, Dict]:
+        """Estado de carga de cada modelo (usado pelo readiness probe)"""
+        return {
+            name: {**status, "required": name in self.REQUIRED_MODELS}
+            for name, status in self.model_status.items()
+        }
 
+    @traced()
     async def analyze_speech_real(self, audio_file_path: str, target_text: str, 
-                                 user_level: str) -> RealTimeAnalysis:
+                                 user_level: str, scoring_mode: Optional[str] = None,
+                                 language: Optional[str] = None,
+                                 decode_profile: Optional[str] = None) -> RealTimeAnalysis:
         """
         Análise real de fala com múltiplos modelos
         """
         try:
             if not self.models_loaded:
                 await self.initialize_production_models()
-            
-            # Carregar áudio
-            audio, sr_rate = librosa.load(audio_file_path, sr=16000)
-            
-            # Transcrição com Whisper
-            result = self.whisper_model.transcribe(audio_file_path)
+            options = decode_options(decode_profile, language, endpoint="speech_analysis")
+            
+            # Carregar áudio (o .npy canônico da ingestão vem por mmap, sem decodificar)
+            with track_stage("decode"):
+                audio, sr_rate = await self._run_inference(load_audio, audio_file_path, sr=16000)
+            
+            # Recortar silêncio antes do Whisper (custo da inferência cresce com a duração)
+            with track_stage("vad"):
+                vad = await self._run_inference(self._trim_silence, audio, sr_rate)
+            
+            # Com texto-alvo conhecido: alinhamento forçado em vez de decodificação livre
+            alignment = None
+            if (scoring_mode or settings.SPEECH_SCORING_MODE) == "target":
+                alignment = await self._align_target(audio, vad, target_text, options.get("language", "en"))
+            
+            # Transcrição com Whisper (cascata: tier barato primeiro em frases curtas)
+            if alignment is not None:
+                result = {"text": alignment.transcription, "confidence": alignment.confidence}
+            elif vad is not None and not vad.has_speech:
+                result = {"text": "", "segments": [], "confidence": 0.0}
+            else:
+                with track_stage("whisper"):
+                    result = await self._run_inference(
+                        self.whisper_cascade.transcribe,
+                        vad.audio if vad is not None else audio,
+                        duration=vad.trimmed_duration if vad is not None else len(audio) / sr_rate,
+                        target_text=target_text,
+                        user_level=user_level,
+                        **options
+                    )
+                if vad is not None:
+                    vad.remap_transcription(result)
             transcription = result["text"].strip()
             
-            # Análise de precisão
-            accuracy = self._calculate_accuracy(transcription, target_text)
-            
             # Análise de fluência
-            fluency = self._analyze_fluency(audio, sr_rate)
-            
-            # Análise de pronúncia
-            pronunciation = self._analyze_pronunciation(transcription, target_text)
-            
-            # Análise de confiança
-            confidence = result.get("confidence", 0.8)
-            
-            # Detectar erros específicos
-            errors = self._detect_speech_errors(transcription, target_text)
+            with track_stage("fluency"):
+                fluency = await self._run_inference(self._analyze_fluency, audio, sr_rate)
+            
+            with track_stage("scoring"):
+                if alignment is not None:
+                    # Palavra a palavra, a partir das probabilidades do teacher forcing
+                    accuracy = alignment.accuracy
+                    pronunciation = alignment.score
+                    errors = alignment.errors()
+                else:
+                    # Análise de precisão
+                    accuracy = self._calculate_accuracy(transcription, target_text)
+                    
+                    # Análise de pronúncia
+                    pronunciation = self._analyze_pronunciation(transcription, target_text)
+                    
+                    # Detectar erros específicos
+                    errors = self._detect_speech_errors(transcription, target_text)
+                
+                # Análise de confiança
+                confidence = result.get("confidence", 0.8)
             
             # Gerar sugestões
             suggestions = self._generate_speech_suggestions(errors, user_level)
@@ -157,19 +294,21 @@ class RealAIModels:
             logger.error(f"Speech analysis failed: {e}")
             raise
 
+    @traced()
     async def analyze_text_comprehension(self, user_text: str, reference_text: str) -> Dict:
         """
         Análise real de compreensão textual
         """
         try:
             # Análise de similaridade semântica
-            user_embedding = self.sentence_transformer.encode([user_text])
-            reference_embedding = self.sentence_transformer.encode([reference_text])
+            embeddings = await self._run_inference(
+                self.sentence_transformer.encode, [user_text, reference_text]
+            )
             
-            similarity = 1 - cosine(user_embedding[0], reference_embedding[0])
+            similarity = 1 - cosine(embeddings[0], embeddings[1])
             
             # Análise gramatical
-            grammar_analysis = self.grammar_model(user_text)
+            grammar_analysis = await self._run_inference(self.grammar_model, user_text)
             grammar_score = max([score['score'] for score in grammar_analysis[0] 
                                if score['label'] == 'ACCEPTABLE'])
             
@@ -229,6 +368,70 @@ class RealAIModels:
             logger.error(f"Personalized content generation failed: {e}")
             raise
 
+    def _trim_silence(self, audio: np.ndarray, sr: int) -> Optional[VadResult]:
+        """VAD por energia/ZCR; None quando desligado (Whisper recebe o arquivo inteiro)"""
+        if not settings.VAD_ENABLED:
+            return None
+        vad = voice_activity_detector.trim(
+            np.ascontiguousarray(audio, dtype=np.float32), sr, compact=settings.VAD_COMPACT_PAUSES
+        )
+        logger.debug(f"VAD trim: {vad.summary()}")
+        return vad
+
+    async def _align_target(self, audio: np.ndarray, vad: Optional[VadResult],
+                            target_text: str, language: str = "en") -> Optional[TargetAlignment]:
+        """
+        Alinhar o texto-alvo ao áudio (já recortado pelo VAD) e devolver os tempos no original
+        None quando não se aplica (sem alvo, sem fala ou acima de uma janela de 30 s)
+        """
+        speech = vad.audio if vad is not None else audio
+        if not target_text.strip() or not target_aligner.fits(speech):
+            return None
+        with track_stage("alignment"):
+            alignment = await self._run_inference(
+                target_aligner.align, self.whisper_model.model, speech, target_text, language
+            )
+        if vad is not None:
+            alignment.remap(vad.to_original)
+        return alignment
+
+    @traced()
+    async def score_against_target(self, audio_file_path: str, target_text: str,
+                                   language: Optional[str] = None) -> Optional[TargetAlignment]:
+        """Pontuação por palavra contra o texto-alvo (sem decodificação livre)"""
+        if not self.models_loaded:
+            await self.initialize_production_models()
+        with track_stage("decode"):
+            audio, sr_rate = await self._run_inference(load_audio, audio_file_path, sr=16000)
+        with track_stage("vad"):
+            vad = await self._run_inference(self._trim_silence, audio, sr_rate)
+        return await self._align_target(audio, vad, target_text, whisper_language(language) or "en")
+
+    @traced()
+    async def transcribe(self, audio_file_path: str, language: Optional[str] = None,
+                         decode_profile: Optional[str] = None) -> Dict:
+        """Transcrição livre (sem texto-alvo) com o perfil de decodificação do endpoint de transcrição"""
+        if not self.models_loaded:
+            await self.initialize_production_models()
+        options = decode_options(decode_profile, language, endpoint="transcribe")
+        with track_stage("decode"):
+            audio, sr_rate = await self._run_inference(load_audio, audio_file_path, sr=16000)
+        with track_stage("vad"):
+            vad = await self._run_inference(self._trim_silence, audio, sr_rate)
+        if vad is not None and not vad.has_speech:
+            return {"text": "", "segments": [], "language": options.get("language"), "confidence": 0.0}
+        
+        with track_stage("whisper"):
+            result = await self._run_inference(
+                self.whisper_cascade.transcribe,
+                vad.audio if vad is not None else audio,
+                duration=vad.trimmed_duration if vad is not None else len(audio) / sr_rate,
+                **options
+            )
+        if vad is not None:
+            vad.remap_transcription(result)
+        return result
+
     def _calculate_accuracy(self, transcription: str, target: str) -> float:
         """Calcular precisão real da transcrição"""
         words_transcribed = set(transcription.lower().split())
@@ -240,25 +443,12 @@ class RealAIModels:
         correct_words = words_transcribed.intersection(words_target)
         return len(correct_words) / len(words_target)
 
-    def _analyze_fluency(self, audio: np.ndarray, sr: int) -> float:
-        """Analisar fluência real baseada em características do áudio"""
-        # Detectar pausas
-        rms = librosa.feature.rms(y=audio)[0]
-        pause_threshold = np.mean(rms) * 0.1
-        pauses = np.where(rms < pause_threshold)[0]
-        
-        # Calcular taxa de fala
-        duration = len(audio) / sr
-        speech_rate = len(audio) / duration if duration > 0 else 0
-        
-        # Análise de ritmo
-        tempo = librosa.beat.tempo(y=audio, sr=sr)
-        
-        # Score de fluência baseado em múltiplos fatores
-        pause_penalty = len(pauses) / len(rms)
-        fluency_score = max(0, 1 - pause_penalty) * min(1, speech_rate / 1000)
-        
-        return float(fluency_score)
+    def _analyze_fluency(self, audio: np.ndarray, sr: int,
+                         features: Optional[AcousticFeatures] = None) -> float:
+        """Analisar fluência real baseada em características do áudio (pausas e taxa silábica)"""
+        if features is None:
+            features = acoustic_feature_extractor.extract(audio, sr)
+        return features.fluency_score()
 
     def _analyze_pronunciation(self, transcription: str, target: str) -> float:
         """Analisar pronúncia comparando transcrição com target"""
@@ -334,6 +524,10 @@ class RealAIModels:
         if "extra_word" in error_types:
             suggestions.append("Focus on the exact phrase and avoid adding extra words.")
         
+        if "mispronounced_word" in error_types:
+            unclear = [error["word"] for error in errors if error["type"] == "mispronounced_word"][:3]
+            suggestions.append(f"Repeat slowly, paying attention to: {', '.join(unclear)}.")
+        
         if user_level in ["beginner", "elementary"]:
             suggestions.append("Practice repeating the phrase several times.")
         else:
@@ -0,0 +1,259 @@
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.utils.metrics import record_cache
+from app.utils.tracing import traced
+from .real_ai_models import real_ai_models
+from .vector_index import VectorIndex, vector_indexes
+
+logger = logging.getLogger(__name__)
+
+BucketKey = Tuple[str, str]
+
+@dataclass
+class CachedAnswer:
+    entry_id: int
+    bucket: BucketKey
+    question: str
+    answer: str
+    created_at: float
+    hits: int = 0
+    qa_key: Optional[str] = None
+    stored_at: float = 0.0      # relógio de parede gravado na linha do chat_qa
+
+class SemanticResponseCache:
+    """
+    Cache semântico de respostas do tutor
+    Reaproveita respostas para perguntas quase idênticas no mesmo contexto e nível
+    """
+
+    # A cada quantos stores varrer entradas expiradas (memória e índice chat_qa)
+    PURGE_EVERY = 256
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: int = 21600,
+                 max_entries: int = 5000, enabled: bool = True):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self.buckets: Dict[BucketKey, VectorIndex] = {}
+        # chave no índice chat_qa -> entrada do cache dona da linha persistida
+        self.qa_owners: Dict[str, int] = {}
+        self._next_id = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    @traced()
+    async def lookup(self, message: str, context: str,
+                     level: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Buscar resposta em cache para a mensagem
+        Retorna (resposta, embedding) - o embedding é reaproveitado em store()
+        """
+        embedding = await self._embed(message)
+        if embedding is None:
+            self.stats["bypassed"] += 1
+            return None, None
+
+        bucket = self.buckets.get(self._bucket_key(context, level))
+        nearest = bucket.search(embedding, k=1) if bucket else []
+
+        if nearest and nearest[0][1] >= self.threshold:
+            entry_id, score = nearest[0]
+            entry = self.entries[entry_id]
+            if time.monotonic() - entry.created_at <= self.ttl_seconds:
+                entry.hits += 1
+                self.entries.move_to_end(entry_id)
+                self.stats["hits"] += 1
+                record_cache("semantic_response", True)
+                logger.info(f"⚡ Semantic cache hit (similarity={score:.3f})")
+                return entry.answer, embedding
+
+            await self._drop_persisted([self._remove(entry_id)])
+            self.stats["expirations"] += 1
+
+        self.stats["misses"] += 1
+        record_cache("semantic_response", False)
+        return None, embedding
+
+    @traced()
+    async def store(self, message: str, context: str, level: str, answer: str,
+                    embedding: Optional[np.ndarray] = None):
+        """Guardar resposta gerada pelo modelo"""
+        if embedding is None:
+            embedding = await self._embed(message)
+            if embedding is None:
+                return
+
+        bucket_key = self._bucket_key(context, level)
+        bucket = self.buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self.buckets[bucket_key] = VectorIndex(embedding.shape[0])
+
+        entry_id = self._next_id
+        self._next_id += 1
+        qa_key = f"{bucket_key[0]}|{bucket_key[1]}|{message.strip().lower()}"
+        entry = self.entries[entry_id] = CachedAnswer(
+            entry_id=entry_id,
+            bucket=bucket_key,
+            question=message,
+            answer=answer,
+            created_at=time.monotonic(),
+            qa_key=qa_key,
+            stored_at=time.time()
+        )
+        bucket.add([entry_id], embedding[None, :])
+        self.stats["stores"] += 1
+
+        # Q&A também alimenta o índice persistente de "perguntas semelhantes"
+        # A linha vive enquanto a entrada do cache viver (sai junto na eviction/expiração)
+        # Dono registrado antes do await: a remoção de uma entrada antiga da mesma pergunta não apaga esta
+        self.qa_owners[qa_key] = entry_id
+        qa_index = vector_indexes.get("chat_qa")
+        await vector_indexes.run_locked(
+            qa_index, qa_index.add,
+            [qa_key],
+            embedding[None, :],
+            [{"question": message, "answer": answer, "context": context, "level": level,
+              "stored_at": entry.stored_at}]
+        )
+
+        # Eviction LRU
+        evicted = []
+        while len(self.entries) > self.max_entries:
+            oldest_id = next(iter(self.entries))
+            evicted.append(self._remove(oldest_id))
+            self.stats["evictions"] += 1
+        await self._drop_persisted(evicted)
+
+        if self.stats["stores"] % self.PURGE_EVERY == 0:
+            await self.purge_expired()
+
+    async def purge_expired(self) -> int:
+        """Remover entradas expiradas (e linhas do chat_qa que sobraram de execuções anteriores)"""
+        now = time.monotonic()
+        expired = [
+            entry_id for entry_id, entry in self.entries.items()
+            if now - entry.created_at > self.ttl_seconds
+        ]
+        await self._drop_persisted([self._remove(entry_id) for entry_id in expired])
+        self.stats["expirations"] += len(expired)
+
+        qa_index = vector_indexes.get("chat_qa")
+        purged = await vector_indexes.run_locked(
+            qa_index, self._purge_persisted, qa_index, set(self.qa_owners), time.time() - self.ttl_seconds
+        )
+        return len(expired) + purged
+
+    @staticmethod
+    def _purge_persisted(index: VectorIndex, owned: set, cutoff: float) -> int:
+        """Linhas do chat_qa sem entrada viva no cache e mais velhas que o TTL (roda em thread, com o lock)"""
+        stale = [
+            key for key, row in list(index.key_to_row.items())
+            if key not in owned and (index.metadata[row] or {}).get("stored_at", 0) < cutoff
+        ]
+        if stale:
+            index.remove(stale)
+            logger.info(f"🧹 Removed {len(stale)} expired chat Q&A entries from the vector index")
+        return len(stale)
+
+    async def _drop_persisted(self, rows: List[Optional[Tuple[str, float]]]):
+        """Tirar do chat_qa as linhas (chave, stored_at) de entradas que saíram do cache"""
+        rows = [row for row in rows if row is not None]
+        if not rows:
+            return
+        qa_index = vector_indexes.get("chat_qa")
+        await vector_indexes.run_locked(qa_index, self._remove_rows, qa_index, rows)
+
+    @staticmethod
+    def _remove_rows(index: VectorIndex, rows: List[Tuple[str, float]]):
+        # Só a mesma gravação: a chave pode ter sido regravada por uma entrada mais nova
+        index.remove([
+            key for key, stored_at in rows
+            if (index.get_metadata(key) or {}).get("stored_at") == stored_at
+        ])
+
+    async def invalidate_scope(self, prefix: str) -> int:
+        """
+        Descartar as respostas de um escopo (ex.: "lesson:12|" quando a lição é editada)
+        Inclui as linhas do chat_qa do escopo gravadas por execuções anteriores
+        """
+        prefix = prefix.strip().lower()
+        stale = [entry_id for entry_id, entry in self.entries.items() if entry.bucket[0].startswith(prefix)]
+        for entry_id in stale:
+            self._remove(entry_id)
+
+        qa_index = vector_indexes.get("chat_qa")
+        await vector_indexes.run_locked(qa_index, self._remove_prefix, qa_index, prefix)
+        return len(stale)
+
+    @staticmethod
+    def _remove_prefix(index: VectorIndex, prefix: str):
+        index.remove([key for key in list(index.key_to_row) if str(key).startswith(prefix)])
+
+    def get_metrics(self) -> Dict:
+        """Métricas de hit-rate do cache"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "buckets": len(self.buckets),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+        }
+
+    def _remove(self, entry_id: int) -> Optional[Tuple[str, float]]:
+        """Tirar a entrada do cache; retorna a linha do chat_qa a remover (ver _drop_persisted)"""
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return None
+        bucket = self.buckets.get(entry.bucket)
+        if bucket is not None:
+            bucket.remove([entry_id])
+            if not bucket.live_count:
+                del self.buckets[entry.bucket]
+        # A mesma pergunta pode ter sido guardada de novo por uma entrada mais nova
+        if entry.qa_key is not None and self.qa_owners.get(entry.qa_key) == entry_id:
+            del self.qa_owners[entry.qa_key]
+            return entry.qa_key, entry.stored_at
+        return None
+
+    def _bucket_key(self, context: str, level: str) -> BucketKey:
+        return ((context or "").strip().lower(), (level or "").strip().lower())
+
+    async def _embed(self, message: str) -> Optional[np.ndarray]:
+        """Embedding MiniLM normalizado (None quando o modelo não está carregado)"""
+        encoder = real_ai_models.sentence_transformer
+        if not self.enabled or encoder is None or not message.strip():
+            return None
+
+        try:
+            embedding = await asyncio.to_thread(
+                encoder.encode, [message.strip()], normalize_embeddings=True
+            )
+            return np.asarray(embedding[0], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None
+
+# Global instance
+semantic_response_cache = SemanticResponseCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    enabled=settings.SEMANTIC_CACHE_ENABLED
+)
@@ -6,6 +6,10 @@ from datetime import datetime
 import numpy as np
 from dataclasses import dataclass
 import json
+from app.services.acoustic_features import AcousticFeatures, acoustic_feature_extractor, load_audio
+from app.services.native_templates import native_template_store
+from app.services.phoneme_lexicon import DIFFICULT_PHONEMES, WordPhonemes, base_phone, target_phrase_index
+from app.utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -26,9 +30,10 @@ class SpeechAnalysisEngine:
     
     def __init__(self):
         self.phoneme_patterns = {}
-        self.native_patterns = {}
+        self.native_patterns = native_template_store
         self.user_progress_cache = {}
         
+    @traced()
     async def analyze_pronunciation_advanced(self, audio_data: bytes, 
                                            target_text: str,
                                            user_id: str,
@@ -39,21 +44,21 @@ class SpeechAnalysisEngine:
         try:
             logger.info(f"🎯 Advanced pronunciation analysis for user: {user_id}")
             
-            # Simular análise avançada de pronúncia
-            await asyncio.sleep(0.8)
+            # Features acústicas em uma única passada (compartilhadas por prosódia e fluência)
+            features = await asyncio.to_thread(self._extract_features, audio_data)
             
             # Análise fonética detalhada
             phonetic_analysis = self._analyze_phonetics(target_text, native_language)
             
             # Análise de prosódia
-            prosody_analysis = self._analyze_prosody(audio_data, target_text)
+            prosody_analysis = self._analyze_prosody(features, target_text)
             
             # Análise de fluência
-            fluency_analysis = self._analyze_fluency_patterns(audio_data, target_text)
+            fluency_analysis = self._analyze_fluency_patterns(features, target_text)
             
-            # Comparação com padrões nativos
-            native_comparison = self._compare_with_native_patterns(
-                target_text, phonetic_analysis
+            # Comparação com padrões nativos (DTW contra o template pré-computado da frase)
+            native_comparison = await asyncio.to_thread(
+                self._compare_with_native_patterns, target_text, phonetic_analysis, features
             )
             
             # Identificação de erros específicos
@@ -98,6 +103,7 @@ class SpeechAnalysisEngine:
             logger.error(f"Advanced pronunciation analysis failed: {e}")
             return {"error": str(e), "overall_score": 0}
     
+    @traced()
     async def analyze_conversational_flow(self, conversation_audio: bytes,
                                         conversation_context: str,
                                         user_id: str) -> Dict:
@@ -152,6 +158,7 @@ class SpeechAnalysisEngine:
             logger.error(f"Conversational flow analysis failed: {e}")
             return {"error": str(e)}
     
+    @traced()
     async def provide_real_time_coaching(self, audio_chunk: bytes,
                                        context: Dict,
                                        user_id: str) -> Dict:
@@ -196,14 +203,16 @@ class SpeechAnalysisEngine:
     
     # Métodos auxiliares de análise
     def _analyze_phonetics(self, text: str, native_language: str) -> Dict:
-        """Análise fonética detalhada"""
-        # Simular análise fonética avançada
-        words = text.split()
+        """Análise fonética detalhada (fonemas do alvo vêm do índice pré-computado das lições)"""
+        words = target_phrase_index.lookup(text)
         phoneme_scores = {}
         
-        for word in words:
+        for entry in words:
             # Análise de fonemas específicos
-            phoneme_scores[word] = {
+            phoneme_scores[entry.word] = {
+                "phonemes": entry.phonemes,
+                "source": entry.source,
+                "stress": entry.stress,
                 "vowels": np.random.uniform(0.7, 0.95),
                 "consonants": np.random.uniform(0.6, 0.9),
                 "stress_pattern": np.random.uniform(0.5, 0.9),
@@ -211,50 +220,149 @@ class SpeechAnalysisEngine:
             }
         
         overall_accuracy = np.mean([
-            np.mean(list(scores.values())) 
+            np.mean([value for value in scores.values() if isinstance(value, float)])
             for scores in phoneme_scores.values()
-        ])
+        ]) if phoneme_scores else 0.0
         
+        difficult_sounds = self._identify_difficult_sounds(words, native_language)
         return {
             "accuracy": overall_accuracy,
             "phoneme_scores": phoneme_scores,
-            "difficult_sounds": self._identify_difficult_sounds(text, native_language),
-            "improvement_priority": self._prioritize_phoneme_improvements(phoneme_scores)
+            "total_phonemes": sum(len(entry.phonemes) for entry in words),
+            "difficult_sounds": difficult_sounds,
+            "improvement_priority": self._prioritize_phoneme_improvements(difficult_sounds)
         }
     
-    def _analyze_prosody(self, audio_data: bytes, text: str) -> Dict:
+    def _identify_difficult_sounds(self, words: List[WordPhonemes], native_language: str) -> List[Dict]:
+        """Fonemas do alvo que costumam ser difíceis para falantes da língua nativa"""
+        difficult = DIFFICULT_PHONEMES.get((native_language or "").lower()[:2], {})
+        found: Dict[str, Dict] = {}
+        for entry in words:
+            for phone in entry.phonemes:
+                phone = base_phone(phone)
+                if phone in difficult:
+                    sound = found.setdefault(phone, {"phoneme": phone, "tip": difficult[phone], "words": []})
+                    if entry.word not in sound["words"]:
+                        sound["words"].append(entry.word)
+        return list(found.values())
+    
+    def _prioritize_phoneme_improvements(self, difficult_sounds: List[Dict]) -> List[str]:
+        """Sons difíceis ordenados pelo número de palavras do alvo em que aparecem"""
+        ranked = sorted(difficult_sounds, key=lambda sound: len(sound["words"]), reverse=True)
+        return [sound["phoneme"] for sound in ranked]
+    
+    def _extract_features(self, audio_data: bytes) -> Optional[AcousticFeatures]:
+        """Decodificar o áudio e extrair as features; None sem áudio utilizável"""
+        if not audio_data:
+            return None
+        try:
+            audio, sr = load_audio(audio_data, sr=16000)
+        except Exception as e:
+            logger.warning(f"Could not decode audio for analysis: {e}")
+            return None
+        return acoustic_feature_extractor.extract(audio, sr)
+
+    def _analyze_prosody(self, features: Optional[AcousticFeatures], text: str) -> Dict:
         """Análise de prosódia (ritmo, entonação, ênfase)"""
+        if features is None or features.speech_seconds <= 0:
+            return {
+                "score": 0.0, "rhythm_score": 0.0, "intonation_score": 0.0,
+                "stress_accuracy": 0.0, "emotional_expression": 0.0, "naturalness": 0.0,
+                "audio_available": False
+            }
+
+        # Entonação: faixa de pitch em semitons (fala monótona < ~3 st)
+        pitch_range = features.pitch_range_semitones()
+        intonation = float(np.clip(pitch_range / 6.0, 0, 1) - np.clip((pitch_range - 14.0) / 10.0, 0, 0.5))
+
+        # Ritmo: variabilidade entre intervalos silábicos (nPVI; inglês ~55-65, ritmo "silábico" ~40)
+        intervals = np.diff(features.syllable_frames) * features.frame_seconds
+        if len(intervals) >= 2:
+            npvi = 100 * np.mean(np.abs(np.diff(intervals)) / ((intervals[1:] + intervals[:-1]) / 2))
+            rhythm = float(np.clip(npvi / 60.0, 0, 1))
+        else:
+            npvi, rhythm = 0.0, 0.0
+
+        # Ênfase: contraste de energia entre sílabas tônicas e átonas
+        peak_db = 20 * np.log10(features.rms[features.syllable_frames] + 1e-9)
+        stress = float(np.clip(np.std(peak_db) / 5.0, 0, 1)) if len(peak_db) >= 2 else 0.0
+
+        # Expressividade: variação de pitch e de energia ao longo da fala
+        speech_db = 20 * np.log10(features.rms[features.speech] + 1e-9)
+        expression = float(np.clip(0.5 * pitch_range / 8.0 + 0.5 * np.std(speech_db) / 10.0, 0, 1))
+
         return {
-            "score": np.random.uniform(0.7, 0.9),
-            "rhythm_score": np.random.uniform(0.6, 0.9),
-            "intonation_score": np.random.uniform(0.7, 0.95),
-            "stress_accuracy": np.random.uniform(0.65, 0.9),
-            "emotional_expression": np.random.uniform(0.5, 0.8),
-            "naturalness": np.random.uniform(0.6, 0.85)
+            "score": float(np.mean([rhythm, intonation, stress])),
+            "rhythm_score": rhythm,
+            "intonation_score": intonation,
+            "stress_accuracy": stress,
+            "emotional_expression": expression,
+            "naturalness": float(np.mean([rhythm, intonation, stress, expression, features.fluency_score()])),
+            "pitch_range_semitones": round(pitch_range, 2),
+            "npvi": round(float(npvi), 1)
         }
     
-    def _analyze_fluency_patterns(self, audio_data: bytes, text: str) -> Dict:
+    def _analyze_fluency_patterns(self, features: Optional[AcousticFeatures], text: str) -> Dict:
         """Análise de padrões de fluência"""
+        if features is None or features.speech_seconds <= 0:
+            return {
+                "score": 0.0, "speech_rate": 0.0, "pause_patterns": "unknown",
+                "hesitation_frequency": 0.0, "connected_speech": 0.0, "audio_available": False
+            }
+
+        span = features.speech_seconds + features.pause_seconds
+        long_pauses = [pause for pause in features.pauses if pause[1] - pause[0] > 1.0]
+        pauses_per_minute = len(features.pauses) * 60 / span
+        if long_pauses:
+            pause_patterns = "long_pauses"
+        elif pauses_per_minute > 20:
+            pause_patterns = "frequent"
+        else:
+            pause_patterns = "natural"
+
+        # Fala conectada: fração da fala em trechos contínuos de pelo menos 1s
+        runs = np.diff(np.concatenate(([0], features.speech.astype(np.int8), [0])))
+        run_lengths = (np.flatnonzero(runs == -1) - np.flatnonzero(runs == 1)) * features.frame_seconds
+        connected = float(run_lengths[run_lengths >= 1.0].sum() / features.speech_seconds)
+
         return {
-            "score": np.random.uniform(0.7, 0.9),
-            "speech_rate": np.random.uniform(120, 180),  # WPM
-            "pause_patterns": "natural",
-            "hesitation_frequency": np.random.uniform(0.1, 0.4),
-            "repair_frequency": np.random.uniform(0.05, 0.2),
-            "connected_speech": np.random.uniform(0.6, 0.9)
+            "score": features.fluency_score(),
+            "speech_rate": round(features.words_per_minute, 1),  # WPM estimado
+            "syllables_per_second": round(features.speech_rate, 2),
+            "pause_patterns": pause_patterns,
+            "hesitation_frequency": round(len(features.pauses) / max(features.syllables, 1), 3),
+            "connected_speech": round(connected, 3),
+            "pause_count": len(features.pauses),
+            "pause_seconds": round(features.pause_seconds, 2)
         }
     
-    def _compare_with_native_patterns(self, text: str, phonetic_analysis: Dict) -> Dict:
+    def _compare_with_native_patterns(self, text: str, phonetic_analysis: Dict,
+                                      features: Optional[AcousticFeatures] = None) -> Dict:
         """Comparação com padrões de falantes nativos"""
+        comparison = self.native_patterns.compare(text, features)
+        if comparison is None:
+            return {
+                "similarity_score": None,
+                "template_available": text in self.native_patterns,
+                "gap_analysis": {},
+                "target_improvements": []
+            }
+
+        improvements = []
+        if comparison["intonation_correlation"] is not None and comparison["intonation_correlation"] < 0.3:
+            improvements.append("Follow the native speaker's intonation more closely")
+        if comparison["tempo_ratio"] > 1.4:
+            improvements.append("Speak the phrase more smoothly, closer to native pace")
+        elif comparison["tempo_ratio"] < 0.7:
+            improvements.append("Slow down slightly to articulate every sound")
+        if comparison["divergent_regions"]:
+            improvements.append("Reduce accent in specific sounds")
+
         return {
-            "similarity_score": np.random.uniform(0.6, 0.9),
-            "native_benchmarks": {
-                "pronunciation": 0.95,
-                "fluency": 0.98,
-                "naturalness": 0.96
-            },
-            "gap_analysis": self._analyze_native_gaps(phonetic_analysis),
-            "target_improvements": ["Reduce accent in specific sounds", "Improve rhythm"]
+            "similarity_score": comparison["similarity_score"],
+            "template_available": True,
+            "gap_analysis": comparison,
+            "target_improvements": improvements
         }
     
     def _identify_pronunciation_errors(self, phonetic_analysis: Dict, 
@@ -0,0 +1,163 @@
+
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Mesma pontuação que o Whisper junta às palavras vizinhas em word_timestamps
+_PREPEND_PUNCTUATIONS = "\"'“¿([{-"
+_APPEND_PUNCTUATIONS = "\"'.。,，!！?？:：”)]}、"
+
+@dataclass
+class WordScore:
+    word: str
+    start: float
+    end: float
+    probability: float
+    status: str = "ok"    # ok | unclear | missing
+
+@dataclass
+class TargetAlignment:
+    """Texto-alvo alinhado ao áudio: probabilidade (teacher forcing) e tempo por palavra"""
+    words: List[WordScore] = field(default_factory=list)
+
+    @property
+    def score(self) -> float:
+        """Probabilidade média por palavra (0-1)"""
+        return float(np.mean([word.probability for word in self.words])) if self.words else 0.0
+
+    @property
+    def confidence(self) -> float:
+        """Média geométrica das probabilidades: uma palavra perdida derruba o valor"""
+        if not self.words:
+            return 0.0
+        probabilities = np.clip([word.probability for word in self.words], 1e-6, 1.0)
+        return float(np.exp(np.mean(np.log(probabilities))))
+
+    @property
+    def accuracy(self) -> float:
+        """Fração das palavras-alvo reconhecidas com clareza"""
+        if not self.words:
+            return 0.0
+        return sum(1 for word in self.words if word.status == "ok") / len(self.words)
+
+    @property
+    def transcription(self) -> str:
+        """Palavras-alvo efetivamente ouvidas (para os consumidores que esperam texto)"""
+        return " ".join(word.word for word in self.words if word.status != "missing")
+
+    def words_per_minute(self) -> float:
+        spoken = [word for word in self.words if word.status != "missing"]
+        if len(spoken) < 2:
+            return 0.0
+        span = spoken[-1].end - spoken[0].start
+        return len(spoken) * 60 / span if span > 0 else 0.0
+
+    def remap(self, to_original: Callable[[float], float]):
+        """Levar os tempos das palavras para a linha do tempo original (ex.: VadResult.to_original)"""
+        for word in self.words:
+            word.start = round(to_original(word.start), 3)
+            word.end = round(to_original(word.end), 3)
+
+    def errors(self) -> List[Dict]:
+        """Erros no formato de RealAIModels._detect_speech_errors, com tempo e confiança"""
+        errors = []
+        for word in self.words:
+            if word.status == "missing":
+                errors.append({
+                    "type": "missing_word",
+                    "word": word.word,
+                    "suggestion": f"Include the word '{word.word}'"
+                })
+            elif word.status == "unclear":
+                errors.append({
+                    "type": "mispronounced_word",
+                    "word": word.word,
+                    "confidence": round(word.probability, 3),
+                    "start": word.start,
+                    "end": word.end,
+                    "suggestion": f"Practice the pronunciation of '{word.word}'"
+                })
+        return errors
+
+    def to_dict(self) -> Dict:
+        return {
+            "score": round(self.score, 4),
+            "confidence": round(self.confidence, 4),
+            "accuracy": round(self.accuracy, 4),
+            "words": [asdict(word) for word in self.words]
+        }
+
+class TargetAligner:
+    """
+    Modo de pontuação com texto-alvo conhecido: em vez de decodificar livremente (beam search)
+    e comparar strings, o alvo tokenizado é forçado no decoder em um único forward pass.
+    A probabilidade de cada token vem do teacher forcing e o tempo de cada palavra do DTW
+    sobre as cabeças de atenção cruzada de alinhamento (whisper.timing.find_alignment).
+    Limitado a uma janela do Whisper (30 s); acima disso o chamador volta à decodificação livre.
+    """
+
+    def __init__(self, min_word_probability: float = 0.5, missing_probability: float = 0.1,
+                 min_word_seconds: float = 0.04):
+        self.min_word_probability = min_word_probability
+        self.missing_probability = missing_probability
+        self.min_word_seconds = min_word_seconds
+
+    @staticmethod
+    def fits(audio: np.ndarray) -> bool:
+        from whisper.audio import N_SAMPLES
+
+        return 0 < len(audio) <= N_SAMPLES
+
+    def align(self, model, audio: np.ndarray, target_text: str, language: str = "en") -> TargetAlignment:
+        """model: whisper.model.Whisper (fp32 ou int8); audio: float32 16 kHz de até 30 s"""
+        import torch
+        from whisper.audio import N_FRAMES, HOP_LENGTH, log_mel_spectrogram, pad_or_trim
+        from whisper.timing import find_alignment, merge_punctuations
+        from whisper.tokenizer import get_tokenizer
+
+        tokenizer = get_tokenizer(
+            model.is_multilingual, num_languages=model.num_languages, language=language, task="transcribe"
+        )
+        text_tokens = tokenizer.encode(" " + target_text.strip())
+        if not text_tokens:
+            return TargetAlignment()
+
+        audio_tensor = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))
+        mel = log_mel_spectrogram(audio_tensor, model.dims.n_mels)
+        mel = pad_or_trim(mel, N_FRAMES).to(model.device)
+        num_frames = min(len(audio) // HOP_LENGTH, N_FRAMES)
+
+        timings = find_alignment(model, tokenizer, text_tokens, mel, num_frames)
+        merge_punctuations(timings, _PREPEND_PUNCTUATIONS, _APPEND_PUNCTUATIONS)
+
+        words = []
+        for timing in timings:
+            text = timing.word.strip()
+            if not text:
+                continue
+            probability = float(timing.probability)
+            start, end = float(timing.start), float(timing.end)
+            # Palavra curta demais só conta como ausente se o modelo também não a reconheceu
+            if probability < self.missing_probability or (
+                end - start < self.min_word_seconds and probability < self.min_word_probability
+            ):
+                status = "missing"
+            elif probability < self.min_word_probability:
+                status = "unclear"
+            else:
+                status = "ok"
+            words.append(WordScore(word=text, start=round(start, 3), end=round(end, 3),
+                                   probability=round(probability, 4), status=status))
+        return TargetAlignment(words=words)
+
+# Global instance
+target_aligner = TargetAligner(
+    min_word_probability=settings.TARGET_MIN_WORD_PROBABILITY,
+    missing_probability=settings.TARGET_MISSING_PROBABILITY
+)
@@ -0,0 +1,392 @@
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class VectorIndex:
+    """
+    Índice vetorial aproximado (IVF-flat) sobre embeddings normalizados
+    Vetores ficam em um .npy memory-mapped; inserções e remoções são incrementais
+    """
+
+    def __init__(self, dim: int, directory: Optional[str] = None, nlist: int = 64,
+                 nprobe: int = 8, train_threshold: int = 2048):
+        self.dim = dim
+        self.directory = directory
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold
+
+        self.size = 0
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self.inverted_lists: List[List[int]] = []
+        self._list_cache: Dict[int, np.ndarray] = {}
+
+        self.keys: List[Optional[Hashable]] = []
+        self.metadata: List[Optional[Dict[str, Any]]] = []
+        self.key_to_row: Dict[Hashable, int] = {}
+        # Escritas (crescer/compactar/treinar) rodam em threads; buscas concorrentes esperam
+        self.lock = threading.RLock()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # ------------------------------------------------------------------ #
+    # Escrita
+    # ------------------------------------------------------------------ #
+    def add(self, keys: Sequence[Hashable], vectors: np.ndarray,
+            metadata: Optional[Sequence[Dict[str, Any]]] = None):
+        """Inserir (ou substituir) vetores"""
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        metadata = list(metadata) if metadata is not None else [{} for _ in keys]
+
+        # Chave repetida no mesmo lote: vale a última (senão sobra uma linha viva sem chave)
+        last = {key: position for position, key in enumerate(keys)}
+        if len(last) < len(keys):
+            positions = sorted(last.values())
+            keys = [keys[position] for position in positions]
+            vectors = vectors[positions]
+            metadata = [metadata[position] for position in positions]
+
+        self.remove([key for key in keys if key in self.key_to_row])
+        self._reserve(self.size + len(keys))
+
+        rows = np.arange(self.size, self.size + len(keys))
+        self.vectors[rows] = vectors
+        self.alive[rows] = True
+        self.assignments[rows] = -1
+
+        for row, key, meta in zip(rows, keys, metadata):
+            self.keys.append(key)
+            self.metadata.append(meta)
+            self.key_to_row[key] = int(row)
+        self.size += len(keys)
+
+        if self.centroids is not None:
+            self._assign(rows)
+        elif self.live_count >= self.train_threshold:
+            self.train()
+
+    def remove(self, keys: Sequence[Hashable]):
+        """Remoção lógica (tombstone); compacta quando há muitos removidos"""
+        for key in keys:
+            row = self.key_to_row.pop(key, None)
+            if row is None:
+                continue
+            self.alive[row] = False
+            self.keys[row] = None
+            self.metadata[row] = None
+
+        if self.size and self.live_count < self.size * 0.75:
+            self._compact()
+
+    def train(self, iterations: int = 10, sample_size: int = 20000):
+        """Treinar centróides (k-means esférico) e montar as listas invertidas"""
+        live_rows = np.flatnonzero(self.alive[:self.size])
+        if len(live_rows) < self.nlist:
+            return
+
+        rng = np.random.default_rng(0)
+        sample = self.vectors[rng.choice(live_rows, min(sample_size, len(live_rows)), replace=False)]
+        centroids = sample[rng.choice(len(sample), self.nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(self.nlist):
+                members = sample[labels == list_id]
+                if len(members):
+                    centroids[list_id] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+
+        self.centroids = centroids
+        self.inverted_lists = [[] for _ in range(self.nlist)]
+        self._list_cache.clear()
+        self._assign(live_rows)
+        logger.info(f"🧭 Vector index trained: {len(live_rows)} vectors, {self.nlist} lists")
+
+    # ------------------------------------------------------------------ #
+    # Busca
+    # ------------------------------------------------------------------ #
+    def search(self, vector: np.ndarray, k: int = 5,
+               where: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Tuple[Hashable, float]]:
+        """Retorna os k vizinhos mais próximos como (key, similaridade)"""
+        if not self.live_count:
+            return []
+
+        query = self._normalize(np.asarray(vector, dtype=np.float32).reshape(1, self.dim))[0]
+
+        if self.centroids is None:
+            rows = np.flatnonzero(self.alive[:self.size])
+        else:
+            probe = np.argsort(self.centroids @ query)[::-1][:self.nprobe]
+            rows = np.concatenate([self._list_rows(list_id) for list_id in probe])
+            rows = rows[self.alive[rows]]
+
+        if where is not None:
+            rows = np.array([row for row in rows if where(self.metadata[row])], dtype=np.int64)
+        if not len(rows):
+            return []
+
+        scores = self.vectors[rows] @ query
+        top = min(k, len(rows))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(self.keys[rows[i]], float(scores[i])) for i in best]
+
+    def get_metadata(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        row = self.key_to_row.get(key)
+        return self.metadata[row] if row is not None else None
+
+    @property
+    def live_count(self) -> int:
+        return len(self.key_to_row)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.key_to_row
+
+    # ------------------------------------------------------------------ #
+    # Persistência
+    # ------------------------------------------------------------------ #
+    def flush(self):
+        """Persistir estado auxiliar (os vetores já vivem no arquivo mapeado)"""
+        if not self.directory:
+            return
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+
+        np.save(os.path.join(self.directory, "alive.npy"), self.alive[:self.size])
+        np.save(os.path.join(self.directory, "assignments.npy"), self.assignments[:self.size])
+        if self.centroids is not None:
+            np.save(os.path.join(self.directory, "centroids.npy"), self.centroids)
+
+        meta_path = os.path.join(self.directory, "index.json")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({
+                "dim": self.dim,
+                "size": self.size,
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "keys": self.keys,
+                "metadata": self.metadata
+            }, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    @classmethod
+    def open(cls, directory: str, dim: int, **kwargs) -> "VectorIndex":
+        """Abrir índice persistido (ou criar um novo vazio)"""
+        index = cls(dim, directory=directory, **kwargs)
+        meta_path = os.path.join(directory, "index.json")
+        vectors_path = os.path.join(directory, "vectors.npy")
+        if not (os.path.exists(meta_path) and os.path.exists(vectors_path)):
+            return index
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["dim"] != dim:
+            raise ValueError(f"Index at {directory} has dim {meta['dim']}, expected {dim}")
+
+        index.size = meta["size"]
+        index.nlist = meta.get("nlist", index.nlist)
+        # nprobe persistido mantém o recall da busca após um restart (a menos que o chamador defina outro)
+        if "nprobe" not in kwargs:
+            index.nprobe = meta.get("nprobe", index.nprobe)
+        index.vectors = np.load(vectors_path, mmap_mode="r+")
+        capacity = index.vectors.shape[0]
+        index.alive = np.zeros(capacity, dtype=bool)
+        index.alive[:index.size] = np.load(os.path.join(directory, "alive.npy"))
+        index.assignments = np.full(capacity, -1, dtype=np.int32)
+        index.assignments[:index.size] = np.load(os.path.join(directory, "assignments.npy"))
+
+        # JSON converte chaves em listas; tuplas voltam como listas
+        index.keys = [tuple(key) if isinstance(key, list) else key for key in meta["keys"]]
+        index.metadata = meta["metadata"]
+        index.key_to_row = {
+            key: row for row, key in enumerate(index.keys)
+            if key is not None and index.alive[row]
+        }
+
+        centroids_path = os.path.join(directory, "centroids.npy")
+        if os.path.exists(centroids_path):
+            index.centroids = np.load(centroids_path)
+            index.inverted_lists = [[] for _ in range(index.nlist)]
+            for row in np.flatnonzero(index.alive[:index.size]):
+                index.inverted_lists[index.assignments[row]].append(int(row))
+
+        return index
+
+    # ------------------------------------------------------------------ #
+    # Internos
+    # ------------------------------------------------------------------ #
+    def _reserve(self, needed: int):
+        capacity = self.vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 256)
+
+        if self.directory:
+            path = os.path.join(self.directory, "vectors.npy")
+            tmp_path = path + ".tmp"
+            vectors = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=np.float32, shape=(new_capacity, self.dim)
+            )
+            vectors[:self.size] = self.vectors[:self.size]
+            vectors.flush()
+            os.replace(tmp_path, path)
+        else:
+            vectors = np.zeros((new_capacity, self.dim), dtype=np.float32)
+            vectors[:self.size] = self.vectors[:self.size]
+
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        assignments = np.full(new_capacity, -1, dtype=np.int32)
+        assignments[:self.size] = self.assignments[:self.size]
+
+        self.vectors, self.alive, self.assignments = vectors, alive, assignments
+
+    def _assign(self, rows: np.ndarray):
+        labels = np.argmax(self.vectors[rows] @ self.centroids.T, axis=1)
+        self.assignments[rows] = labels
+        for row, list_id in zip(rows, labels):
+            self.inverted_lists[list_id].append(int(row))
+            self._list_cache.pop(int(list_id), None)
+
+    def _list_rows(self, list_id: int) -> np.ndarray:
+        rows = self._list_cache.get(list_id)
+        if rows is None:
+            rows = self._list_cache[list_id] = np.asarray(self.inverted_lists[list_id], dtype=np.int64)
+        return rows
+
+    def _compact(self):
+        live_rows = np.flatnonzero(self.alive[:self.size])
+        vectors = self.vectors[live_rows].copy()
+        keys = [self.keys[row] for row in live_rows]
+        metadata = [self.metadata[row] for row in live_rows]
+        assignments = self.assignments[live_rows].copy()
+
+        self.size = len(live_rows)
+        self.vectors[:self.size] = vectors
+        self.alive[:] = False
+        self.alive[:self.size] = True
+        self.assignments[:self.size] = assignments
+        self.keys = keys
+        self.metadata = metadata
+        self.key_to_row = {key: row for row, key in enumerate(keys)}
+
+        if self.centroids is not None:
+            self.inverted_lists = [[] for _ in range(self.nlist)]
+            for row, list_id in enumerate(assignments):
+                self.inverted_lists[list_id].append(row)
+            self._list_cache.clear()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class VectorIndexRegistry:
+    """
+    Índices nomeados sobre embeddings MiniLM (lições, exercícios, Q&A do chat)
+    """
+
+    def __init__(self, base_dir: str, dim: int = 384):
+        self.base_dir = base_dir
+        self.dim = dim
+        self.indexes: Dict[str, VectorIndex] = {}
+
+    def get(self, name: str) -> VectorIndex:
+        index = self.indexes.get(name)
+        if index is None:
+            index = self.indexes[name] = VectorIndex.open(os.path.join(self.base_dir, name), self.dim)
+        return index
+
+    @staticmethod
+    async def run_locked(index: VectorIndex, fn: Callable, *args, **kwargs):
+        """Operação no índice fora do event loop, serializada pelo lock do índice"""
+        def call():
+            with index.lock:
+                return fn(*args, **kwargs)
+        return await asyncio.to_thread(call)
+
+    async def index_texts(self, name: str, keys: Sequence[Hashable], texts: Sequence[str],
+                          metadata: Optional[Sequence[Dict[str, Any]]] = None) -> int:
+        """Gerar embeddings e inserir no índice; retorna quantos foram indexados"""
+        embeddings = await self.embed(texts)
+        if embeddings is None:
+            return 0
+        # add() pode disparar o treino do k-means: fora do event loop
+        index = self.get(name)
+        await self.run_locked(index, index.add, list(keys), embeddings, metadata)
+        return len(keys)
+
+    async def sync(self, name: str, items: Dict[Hashable, Tuple[str, Dict[str, Any]]]) -> Dict[str, int]:
+        """
+        Sincronizar um índice com o catálogo atual
+        Só gera embeddings de itens novos ou alterados e remove os que sumiram
+        """
+        index = self.get(name)
+        changed = [
+            key for key, (text, _) in items.items()
+            if (index.get_metadata(key) or {}).get("text_hash") != _text_hash(text)
+        ]
+        stale = [key for key in list(index.key_to_row) if key not in items]
+
+        await self.run_locked(index, index.remove, stale)
+        indexed = await self.index_texts(
+            name,
+            changed,
+            [items[key][0] for key in changed],
+            [{**items[key][1], "text_hash": _text_hash(items[key][0])} for key in changed]
+        ) if changed else 0
+        await self.run_locked(index, index.flush)
+
+        return {"indexed": indexed, "removed": len(stale), "total": index.live_count}
+
+    async def similar(self, name: str, text: str, k: int = 5,
+                      where: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Dict[str, Any]]:
+        """Buscar itens semelhantes ao texto"""
+        index = self.get(name)
+        if not index.live_count:
+            return []
+        embeddings = await self.embed([text])
+        if embeddings is None:
+            return []
+        def search():
+            return [
+                {"key": key, "similarity": round(score, 4), **(index.get_metadata(key) or {})}
+                for key, score in index.search(embeddings[0], k=k, where=where)
+            ]
+        return await self.run_locked(index, search)
+
+    async def embed(self, texts: Sequence[str]) -> Optional[np.ndarray]:
+        """Embeddings normalizados (None quando o modelo não está carregado)"""
+        from .real_ai_models import real_ai_models
+
+        encoder = real_ai_models.sentence_transformer
+        if encoder is None or not texts:
+            return None
+        embeddings = await asyncio.to_thread(encoder.encode, list(texts), normalize_embeddings=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def flush_all(self):
+        for index in self.indexes.values():
+            with index.lock:
+                index.flush()
+
+# Global instance
+vector_indexes = VectorIndexRegistry(settings.VECTOR_INDEX_DIR)
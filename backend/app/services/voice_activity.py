@@ -0,0 +1,208 @@
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class VadResult:
+    """
+    Áudio recortado + mapa para a linha do tempo original
+    spans: (início no original, fim no original, início no recortado), em amostras
+    """
+    audio: np.ndarray
+    sr: int
+    original_samples: int
+    segments: List[Tuple[int, int]] = field(default_factory=list)
+    spans: List[Tuple[int, int, int]] = field(default_factory=list)
+
+    @property
+    def has_speech(self) -> bool:
+        return bool(self.segments)
+
+    @property
+    def original_duration(self) -> float:
+        return self.original_samples / self.sr
+
+    @property
+    def trimmed_duration(self) -> float:
+        return len(self.audio) / self.sr
+
+    @property
+    def speech_duration(self) -> float:
+        return sum(end - start for start, end in self.segments) / self.sr
+
+    def to_original(self, seconds: float) -> float:
+        """Converter um instante do áudio recortado para o áudio original"""
+        if not self.spans:
+            return seconds
+        position = seconds * self.sr
+        trimmed_starts = np.fromiter((span[2] for span in self.spans), dtype=np.int64, count=len(self.spans))
+        index = max(int(np.searchsorted(trimmed_starts, position, side="right")) - 1, 0)
+        original_start, original_end, trimmed_start = self.spans[index]
+        return min(original_start + (position - trimmed_start), original_end) / self.sr
+
+    def remap_transcription(self, result: Dict) -> Dict:
+        """Levar timestamps de segmentos/palavras do Whisper de volta à linha do tempo original"""
+        for segment in result.get("segments", []):
+            for key in ("start", "end"):
+                if key in segment:
+                    segment[key] = round(self.to_original(segment[key]), 3)
+            for word in segment.get("words", []) or []:
+                for key in ("start", "end"):
+                    if key in word:
+                        word[key] = round(self.to_original(word[key]), 3)
+        return result
+
+    def pauses(self) -> List[Tuple[float, float]]:
+        """Pausas entre trechos de fala, em segundos do áudio original"""
+        return [
+            (previous_end / self.sr, start / self.sr)
+            for (_, previous_end), (start, _) in zip(self.segments, self.segments[1:])
+        ]
+
+    def summary(self) -> Dict:
+        return {
+            "original_seconds": round(self.original_duration, 3),
+            "trimmed_seconds": round(self.trimmed_duration, 3),
+            "speech_seconds": round(self.speech_duration, 3),
+            "segments": len(self.segments)
+        }
+
+class VoiceActivityDetector:
+    """
+    VAD por energia + taxa de cruzamento por zero, vetorizado por frames (NumPy)
+    Limiar adaptativo ao ruído de fundo; fricativas surdas (energia baixa, ZCR alto) contam como fala
+    """
+
+    def __init__(self, frame_ms: float = 30.0, hop_ms: float = 10.0, threshold_db: float = 12.0,
+                 dynamic_range_db: float = 45.0, unvoiced_zcr: float = 0.25,
+                 min_speech_ms: float = 60.0, min_silence_ms: float = 200.0,
+                 padding_ms: float = 150.0, max_pause_ms: float = 400.0):
+        self.frame_ms = frame_ms
+        self.hop_ms = hop_ms
+        self.threshold_db = threshold_db
+        self.dynamic_range_db = dynamic_range_db
+        self.unvoiced_zcr = unvoiced_zcr
+        self.min_speech_ms = min_speech_ms
+        self.min_silence_ms = min_silence_ms
+        self.padding_ms = padding_ms
+        self.max_pause_ms = max_pause_ms
+
+    def speech_mask(self, audio: np.ndarray, sr: int) -> Tuple[np.ndarray, int, int]:
+        """Máscara booleana por frame -> (máscara, tamanho do frame, hop) em amostras"""
+        frame = max(int(sr * self.frame_ms / 1000), 1)
+        hop = max(int(sr * self.hop_ms / 1000), 1)
+        if len(audio) < frame:
+            return np.zeros(0, dtype=bool), frame, hop
+
+        frames = np.lib.stride_tricks.sliding_window_view(audio, frame)[::hop]
+        energy_db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-12)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame
+        return self.classify(energy_db, zcr), frame, hop
+
+    def classify(self, energy_db: np.ndarray, zcr: np.ndarray) -> np.ndarray:
+        """Fala/silêncio por frame a partir de energia (dB) e ZCR já calculados"""
+        if len(energy_db) == 0:
+            return np.zeros(0, dtype=bool)
+        noise_floor = np.percentile(energy_db, 10)
+        peak = energy_db.max()
+        threshold = max(noise_floor + self.threshold_db, peak - self.dynamic_range_db)
+        voiced = energy_db > threshold
+        unvoiced = (energy_db > threshold - 6.0) & (zcr > self.unvoiced_zcr)
+        mask = voiced | unvoiced
+
+        mask = _fill_short_runs(mask, False, int(self.min_silence_ms / self.hop_ms))
+        return _fill_short_runs(mask, True, int(self.min_speech_ms / self.hop_ms))
+
+    def detect(self, audio: np.ndarray, sr: int) -> List[Tuple[int, int]]:
+        """Trechos de fala (início, fim) em amostras, já com margem"""
+        mask, frame, hop = self.speech_mask(audio, sr)
+        if not mask.any():
+            return []
+
+        edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1) * hop
+        ends = (np.flatnonzero(edges == -1) - 1) * hop + frame
+
+        padding = int(sr * self.padding_ms / 1000)
+        starts = np.maximum(starts - padding, 0)
+        ends = np.minimum(ends + padding, len(audio))
+
+        # Margens podem se sobrepor: unir trechos encostados
+        segments: List[Tuple[int, int]] = []
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            if segments and start <= segments[-1][1]:
+                segments[-1] = (segments[-1][0], max(end, segments[-1][1]))
+            else:
+                segments.append((start, end))
+        return segments
+
+    def trim(self, audio: np.ndarray, sr: int, compact: bool = True) -> VadResult:
+        """
+        Remover silêncio inicial/final e, com compact=True, encurtar pausas internas para max_pause_ms
+        Sem fala detectada o áudio volta vazio (a inferência pode ser pulada)
+        """
+        segments = self.detect(audio, sr)
+        if not segments:
+            return VadResult(audio=audio[:0], sr=sr, original_samples=len(audio))
+
+        if not compact:
+            start, end = segments[0][0], segments[-1][1]
+            return VadResult(audio=audio[start:end], sr=sr, original_samples=len(audio),
+                             segments=segments, spans=[(start, end, 0)])
+
+        # Metade da pausa máxima fica de cada lado do corte, para o Whisper ainda ver a fronteira
+        keep = int(sr * self.max_pause_ms / 2000)
+        spans: List[Tuple[int, int, int]] = []
+        pieces: List[np.ndarray] = []
+        span_start, span_end = segments[0]
+        trimmed_position = 0
+        for start, end in segments[1:]:
+            if start - span_end > 2 * keep:
+                spans.append((span_start, span_end + keep, trimmed_position))
+                pieces.append(audio[span_start:span_end + keep])
+                trimmed_position += span_end + keep - span_start
+                span_start = start - keep
+            span_end = end
+        spans.append((span_start, span_end, trimmed_position))
+        pieces.append(audio[span_start:span_end])
+
+        return VadResult(
+            audio=np.concatenate(pieces) if len(pieces) > 1 else pieces[0],
+            sr=sr,
+            original_samples=len(audio),
+            segments=segments,
+            spans=spans
+        )
+
+def _fill_short_runs(mask: np.ndarray, value: bool, max_length: int) -> np.ndarray:
+    """Inverter sequências internas de `value` mais curtas que max_length frames"""
+    if max_length <= 0 or len(mask) == 0:
+        return mask
+    values = mask.astype(np.int8)
+    change = np.flatnonzero(np.diff(values)) + 1
+    run_starts = np.concatenate(([0], change))
+    run_lengths = np.diff(np.concatenate((run_starts, [len(mask)])))
+    run_values = values[run_starts].astype(bool)
+
+    flip = (run_values == value) & (run_lengths < max_length)
+    if not value:
+        # Silêncio das pontas nunca vira fala
+        flip &= (run_starts > 0) & (run_starts + run_lengths < len(mask))
+    if not flip.any():
+        return mask
+    run_values = np.where(flip, not value, run_values)
+    return np.repeat(run_values, run_lengths)
+
+# Global instance
+voice_activity_detector = VoiceActivityDetector(
+    padding_ms=settings.VAD_PADDING_MS,
+    max_pause_ms=settings.VAD_MAX_PAUSE_MS
+)
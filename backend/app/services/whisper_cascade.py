@@ -0,0 +1,147 @@
+
+import logging
+import re
+import threading
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.metrics import WHISPER_CASCADE_PASSES
+
+logger = logging.getLogger(__name__)
+
+# Ajuste do limiar de confiança por nível: avançados recebem feedback mais fino,
+# então o passe barato precisa ser mais confiável para ser aceito
+LEVEL_CONFIDENCE_OFFSET = {
+    "beginner": -0.05,
+    "elementary": -0.05,
+    "intermediate": 0.0,
+    "upper_intermediate": 0.05,
+    "advanced": 0.1,
+    "proficient": 0.1,
+}
+
+_WORD = re.compile(r"[\w']+")
+
+def transcription_confidence(result: Dict) -> float:
+    """
+    Confiança 0-1 a partir dos segmentos do Whisper: exp(avg_logprob) x (1 - no_speech_prob),
+    ponderada pela duração; compression_ratio alto (repetição/alucinação) derruba o segmento
+    """
+    segments = result.get("segments") or []
+    if not segments:
+        return 0.0
+    scores, weights = [], []
+    for segment in segments:
+        score = float(np.exp(segment.get("avg_logprob", -1.0))) * (1 - segment.get("no_speech_prob", 0.0))
+        if segment.get("compression_ratio", 0.0) > 2.4:
+            score *= 0.5
+        scores.append(score)
+        weights.append(max(segment.get("end", 0.0) - segment.get("start", 0.0), 0.01))
+    return float(np.clip(np.average(scores, weights=weights), 0.0, 1.0))
+
+def target_match(transcription: str, target_text: str) -> float:
+    """Similaridade 0-1 entre as sequências de palavras normalizadas"""
+    spoken = _WORD.findall(transcription.lower())
+    expected = _WORD.findall(target_text.lower())
+    if not expected:
+        return 1.0
+    return SequenceMatcher(None, spoken, expected, autojunk=False).ratio()
+
+class WhisperCascade:
+    """
+    Cascata de modelos Whisper do menor para o maior
+    Clipes curtos com texto-alvo curto começam no tier mais barato; o resultado só sobe
+    de tier quando a confiança ou a aderência ao alvo ficam abaixo do limiar.
+    Demais clipes vão direto ao maior tier.
+    """
+
+    def __init__(self, max_short_seconds: float = 8.0, max_target_words: int = 12,
+                 min_confidence: float = 0.6, min_target_match: float = 0.7):
+        self.max_short_seconds = max_short_seconds
+        self.max_target_words = max_target_words
+        self.min_confidence = min_confidence
+        self.min_target_match = min_target_match
+        self.tiers: List[Tuple[str, object]] = []
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def set_tiers(self, tiers: List[Tuple[str, object]]):
+        """Tiers (nome, modelo com .transcribe) do mais barato para o mais caro; None é ignorado"""
+        self.tiers = [(name, model) for name, model in tiers if model is not None]
+        with self._lock:
+            self._stats = {name: {"entered": 0, "passes": 0, "accepted": 0, "escalated": 0, "exhausted": 0}
+                           for name, _ in self.tiers}
+
+    def required_confidence(self, user_level: Optional[str] = None) -> float:
+        return float(np.clip(self.min_confidence + LEVEL_CONFIDENCE_OFFSET.get(user_level or "", 0.0), 0, 1))
+
+    def first_tier(self, duration: float, target_text: Optional[str] = None) -> int:
+        """Índice do tier inicial para um clipe"""
+        if len(self.tiers) < 2 or not target_text:
+            return len(self.tiers) - 1
+        if duration > self.max_short_seconds or len(_WORD.findall(target_text)) > self.max_target_words:
+            return len(self.tiers) - 1
+        return 0
+
+    def transcribe(self, audio, duration: float, target_text: Optional[str] = None,
+                   user_level: Optional[str] = None, min_confidence: Optional[float] = None,
+                   **options) -> Dict:
+        """
+        Transcrever subindo de tier quando necessário
+        O resultado ganha confidence, target_match, model_tier e o histórico dos passes (cascade)
+        """
+        if not self.tiers:
+            raise RuntimeError("Whisper cascade has no models loaded")
+
+        required = self.required_confidence(user_level) if min_confidence is None else min_confidence
+        start = self.first_tier(duration, target_text)
+        passes = []
+        self._count(self.tiers[start][0], "entered")
+
+        for index in range(start, len(self.tiers)):
+            name, model = self.tiers[index]
+            result = model.transcribe(audio, **options)
+            confidence = transcription_confidence(result)
+            match = target_match(result.get("text", ""), target_text) if target_text else None
+            accepted = confidence >= required and (match is None or match >= self.min_target_match)
+            last = index == len(self.tiers) - 1
+            passes.append({
+                "tier": name,
+                "confidence": round(confidence, 3),
+                "target_match": round(match, 3) if match is not None else None,
+                "accepted": accepted
+            })
+
+            self._count(name, "passes")
+            if accepted or last:
+                # O último tier é a palavra final, mesmo abaixo do limiar
+                self._count(name, "accepted" if accepted else "exhausted")
+                WHISPER_CASCADE_PASSES.labels(tier=name, outcome="accepted" if accepted else "exhausted").inc()
+                result.update(confidence=confidence, target_match=match, model_tier=name, cascade=passes)
+                return result
+
+            self._count(name, "escalated")
+            WHISPER_CASCADE_PASSES.labels(tier=name, outcome="escalated").inc()
+            logger.debug(f"Whisper cascade escalating from {name}: confidence={confidence:.2f}, match={match}")
+
+    def _count(self, tier: str, key: str):
+        with self._lock:
+            counters = self._stats.setdefault(tier, {})
+            counters[key] = counters.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, Dict]:
+        """Por tier: passes, aceitos, escalados e taxa de acerto (aceitos / passes)"""
+        with self._lock:
+            snapshot = {name: dict(counters) for name, counters in self._stats.items()}
+        for counters in snapshot.values():
+            passes = counters.get("passes", 0)
+            counters["hit_rate"] = round(counters.get("accepted", 0) / passes, 3) if passes else None
+        return {
+            "tiers": [name for name, _ in self.tiers],
+            "min_confidence": self.min_confidence,
+            "min_target_match": self.min_target_match,
+            "max_short_seconds": self.max_short_seconds,
+            "by_tier": snapshot
+        }
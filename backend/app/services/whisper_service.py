@@ -1,10 +1,14 @@
 
 import asyncio
 import logging
+import time
 from typing import Dict, List, Optional
 from datetime import datetime
 import numpy as np
 from .ai_orchestrator import ai_orchestrator, AIResponse
+from .phoneme_lexicon import DIFFICULT_PHONEMES, base_phone, normalize_phrase, target_phrase_index
+from .target_alignment import TargetAlignment
+from app.utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +36,7 @@ class AdvancedWhisperService:
             logger.error(f"❌ Failed to load Whisper model: {e}")
             return False
     
+    @traced()
     async def evaluate_speech_with_whisper(self, audio_path: str, user_id: str = None,
                                          target_phrase: str = "", difficulty: str = "intermediate") -> Dict:
         """
@@ -86,26 +91,27 @@ class AdvancedWhisperService:
                 "feedback": "Technical error occurred. Please try again."
             }
     
-    async def transcribe_audio(self, audio_path: str, language: str = "en") -> Dict:
+    @traced()
+    async def transcribe_audio(self, audio_path: str, language: Optional[str] = "en",
+                               decode_profile: Optional[str] = None) -> Dict:
         """
         Transcribe audio with high accuracy
+        A known language skips Whisper's language-detection pass; decode_profile is fast or accurate
         """
         try:
             logger.info(f"📝 Transcribing audio: {audio_path}")
+            from app.services.real_ai_models import real_ai_models
             
-            # Simulate advanced transcription
-            await asyncio.sleep(0.5)
-            
-            # In production, use actual Whisper transcription
-            transcription = "Hello, how are you today?"
-            confidence = np.random.uniform(0.85, 0.98)
+            started = time.perf_counter()
+            result = await real_ai_models.transcribe(audio_path, language=language, decode_profile=decode_profile)
             
             return {
-                "transcription": transcription,
-                "confidence": confidence,
-                "language_detected": language,
-                "processing_time": 0.5,
-                "word_timestamps": self._generate_word_timestamps(transcription),
+                "transcription": result["text"].strip(),
+                "confidence": result.get("confidence", 0.0),
+                "language_detected": result.get("language", language),
+                "model_tier": result.get("model_tier"),
+                "processing_time": round(time.perf_counter() - started, 3),
+                "word_timestamps": self._generate_word_timestamps(result),
                 "audio_quality": self._assess_audio_quality(audio_path)
             }
             
@@ -117,25 +123,33 @@ class AdvancedWhisperService:
                 "confidence": 0.0
             }
     
-    async def analyze_pronunciation(self, audio_path: str, target_text: str) -> Dict:
+    @traced()
+    async def analyze_pronunciation(self, audio_path: str, target_text: str,
+                                    language: Optional[str] = None) -> Dict:
         """
         Detailed pronunciation analysis
+        Word scores come from aligning target_text to the audio (teacher-forced decoder, no free decoding)
         """
         try:
             logger.info(f"🎯 Analyzing pronunciation for: {target_text}")
+            from app.services.real_ai_models import real_ai_models
             
-            # Advanced pronunciation analysis
-            await asyncio.sleep(0.7)
+            alignment = await real_ai_models.score_against_target(audio_path, target_text, language)
+            if alignment is None or not alignment.words:
+                return {"error": "No speech detected or clip longer than 30 seconds", "overall_score": 0}
             
             # Generate detailed pronunciation metrics
             analysis = {
-                "overall_score": np.random.uniform(75, 95),
-                "phoneme_accuracy": self._analyze_phonemes(target_text),
+                "overall_score": round(alignment.score * 100, 2),
+                "word_accuracy": round(alignment.accuracy, 4),
+                "alignment_confidence": round(alignment.confidence, 4),
+                "word_scores": alignment.to_dict()["words"],
+                "phoneme_accuracy": self._analyze_phonemes(target_text, alignment),
                 "stress_pattern": self._analyze_stress_pattern(target_text),
                 "rhythm_score": np.random.uniform(0.7, 1.0),
                 "intonation_score": np.random.uniform(0.75, 0.95),
-                "pace_analysis": self._analyze_pace(target_text),
-                "improvement_suggestions": self._generate_pronunciation_suggestions(target_text)
+                "pace_analysis": self._analyze_pace(alignment.words_per_minute()),
+                "improvement_suggestions": self._generate_pronunciation_suggestions(alignment)
             }
             
             return analysis
@@ -144,6 +158,7 @@ class AdvancedWhisperService:
             logger.error(f"Pronunciation analysis failed: {e}")
             return {"error": str(e), "overall_score": 0}
     
+    @traced()
     async def real_time_feedback(self, audio_chunk: bytes, context: Dict) -> Dict:
         """
         Real-time feedback during speech practice
@@ -219,31 +234,54 @@ class AdvancedWhisperService:
         if len(self.performance_cache[user_id]) > 50:
             self.performance_cache[user_id] = self.performance_cache[user_id][-50:]
     
-    def _generate_word_timestamps(self, transcription: str) -> List[Dict]:
-        """Generate word-level timestamps"""
-        words = transcription.split()
+    def _generate_word_timestamps(self, result: Dict) -> List[Dict]:
+        """Word-level timestamps (from Whisper when decoded with word_timestamps, else split per segment)"""
         timestamps = []
-        
-        current_time = 0.0
-        for word in words:
-            word_duration = len(word) * 0.1 + np.random.uniform(0.1, 0.3)
-            timestamps.append({
-                "word": word,
-                "start": current_time,
-                "end": current_time + word_duration,
-                "confidence": np.random.uniform(0.8, 0.98)
-            })
-            current_time += word_duration
+        for segment in result.get("segments", []):
+            words = segment.get("words")
+            if words:
+                timestamps.extend({
+                    "word": word["word"].strip(),
+                    "start": word["start"],
+                    "end": word["end"],
+                    "confidence": round(word.get("probability", 0.0), 3)
+                } for word in words)
+                continue
+            
+            # Without word timings: spread the segment over its words by character count
+            segment_words = segment.get("text", "").split()
+            total = sum(len(word) for word in segment_words)
+            current_time = segment["start"]
+            for word in segment_words:
+                word_duration = (segment["end"] - segment["start"]) * len(word) / total
+                timestamps.append({
+                    "word": word,
+                    "start": round(current_time, 3),
+                    "end": round(current_time + word_duration, 3),
+                    "confidence": None
+                })
+                current_time += word_duration
         
         return timestamps
     
-    def _analyze_phonemes(self, text: str) -> Dict:
-        """Analyze phoneme accuracy"""
+    def _analyze_phonemes(self, text: str, alignment: Optional[TargetAlignment] = None) -> Dict:
+        """Analyze phoneme accuracy (target phonemes from the lesson phrase index, scored per aligned word)"""
+        words = target_phrase_index.lookup(text)
+        total = sum(len(entry.phonemes) for entry in words)
+        
+        # Phonemes of words the alignment accepted count as correct
+        accepted = {normalize_phrase(word.word) for word in (alignment.words if alignment else [])
+                    if word.status == "ok"}
+        correct = sum(len(entry.phonemes) for entry in words if entry.word in accepted)
+        problematic = {base_phone(phone) for entry in words if entry.word not in accepted
+                       for phone in entry.phonemes if base_phone(phone) in DIFFICULT_PHONEMES["pt"]}
+        
         return {
-            "total_phonemes": len(text.replace(" ", "")) * 1.2,
-            "correct_phonemes": len(text.replace(" ", "")) * 1.1,
-            "accuracy_percentage": np.random.uniform(85, 95),
-            "problematic_sounds": ["th", "r", "w"] if np.random.random() > 0.7 else []
+            "total_phonemes": total,
+            "correct_phonemes": correct,
+            "accuracy_percentage": round(100 * correct / total, 2) if total else 0.0,
+            "problematic_sounds": sorted(problematic),
+            "phonemes": {entry.word: " ".join(entry.phonemes) for entry in words}
         }
     
     def _analyze_stress_pattern(self, text: str) -> Dict:
@@ -254,16 +292,27 @@ class AdvancedWhisperService:
             "rhythm_score": np.random.uniform(0.7, 1.0)
         }
     
-    def _analyze_pace(self, text: str) -> Dict:
+    def _analyze_pace(self, words_per_minute: float) -> Dict:
         """Analyze speaking pace"""
+        if words_per_minute < 110:
+            rating = "slow"
+        elif words_per_minute > 180:
+            rating = "fast"
+        elif words_per_minute > 160:
+            rating = "slightly_fast"
+        else:
+            rating = "optimal"
         return {
-            "words_per_minute": np.random.uniform(120, 180),
+            "words_per_minute": round(words_per_minute, 1),
             "optimal_range": "140-160 WPM",
-            "pace_rating": "optimal" if np.random.random() > 0.4 else "slightly_fast"
+            "pace_rating": rating
         }
     
-    def _generate_pronunciation_suggestions(self, text: str) -> List[str]:
+    def _generate_pronunciation_suggestions(self, alignment: TargetAlignment) -> List[str]:
         """Generate pronunciation improvement suggestions"""
+        specific = [error["suggestion"] for error in alignment.errors()][:3]
+        if specific:
+            return specific
         suggestions = [
             "Focus on vowel sounds in stressed syllables",
             "Practice consonant clusters slowly",
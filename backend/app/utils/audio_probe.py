@@ -0,0 +1,343 @@
+
+import io
+import logging
+import os
+import struct
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.config import settings
+from app.utils.metrics import AUDIO_PROBE_RESULTS
+
+logger = logging.getLogger(__name__)
+
+# Extensões aceitas por container detectado (apps móveis às vezes trocam .m4a/.mp4 e .ogg/.opus)
+_CONTAINER_EXTENSIONS = {
+    "wav": {".wav"},
+    "flac": {".flac"},
+    "ogg": {".ogg", ".opus"},
+    "mp3": {".mp3"},
+    "aac": {".aac"},
+    "mp4": {".m4a", ".mp4", ".aac"},
+}
+
+# Taxas de amostragem do MPEG-1/2/2.5 e do ADTS
+_MP3_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+# Bitrates (kbps) do layer III: MPEG-1 e MPEG-2/2.5
+_MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_ADTS_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+class AudioRejected(ValueError):
+    """Áudio inutilizável: status HTTP + código estável para o app"""
+
+    def __init__(self, code: str, message: str, status_code: int = 422):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+@dataclass
+class AudioProbe:
+    """Resultado da sondagem: só cabeçalhos e uma amostra dizimada, sem decodificar o arquivo"""
+    container: str
+    codec: Optional[str] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    duration: Optional[float] = None
+    peak_dbfs: Optional[float] = None
+    rms_dbfs: Optional[float] = None
+    clipping_ratio: Optional[float] = None
+    warnings: List[str] = field(default_factory=list)
+
+    @property
+    def extension(self) -> str:
+        """Extensão pelo container detectado (não pelo nome enviado)"""
+        return {"mp4": ".m4a"}.get(self.container, f".{self.container}")
+
+    def to_dict(self) -> Dict:
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+# ----------------------------------------------------------------------
+# Cabeçalhos por container
+
+def _probe_wav(data: bytes) -> AudioProbe:
+    probe = AudioProbe(container="wav")
+    position = 12
+    fmt = None
+    while position + 8 <= len(data):
+        chunk, size = data[position:position + 4], struct.unpack_from("<I", data, position + 4)[0]
+        body = position + 8
+        if chunk == b"fmt " and size >= 16:
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+            tag, probe.channels, probe.sample_rate, _, block_align, bits = fmt
+            if tag == 0xFFFE and size >= 40:    # WAVE_FORMAT_EXTENSIBLE: subformato nos 2 primeiros bytes do GUID
+                tag = struct.unpack_from("<H", data, body + 24)[0]
+            probe.codec = {1: f"pcm_s{bits}", 3: f"pcm_f{bits}"}.get(tag, f"wav_0x{tag:04x}")
+        elif chunk == b"data" and fmt is not None:
+            block_align = fmt[4]
+            # Gravação interrompida deixa o tamanho zerado ou maior que o arquivo
+            available = min(size, len(data) - body) if size else len(data) - body
+            if block_align and probe.sample_rate:
+                probe.duration = (available // block_align) / probe.sample_rate
+            if probe.codec in ("pcm_s16", "pcm_s32", "pcm_f32", "pcm_s8"):
+                _sample_levels(probe, _pcm_samples(data[body:body + available], probe.codec, probe.channels))
+            return probe
+        position = body + size + (size & 1)
+    if fmt is None:
+        raise AudioRejected("corrupt_header", "WAV file has no format chunk")
+    raise AudioRejected("no_audio_data", "WAV file has no audio data")
+
+def _pcm_samples(payload: bytes, codec: str, channels: int) -> np.ndarray:
+    """Só o primeiro canal e no máximo ~AUDIO_PROBE_SAMPLES amostras espaçadas (view sem cópia do payload)"""
+    dtype = {"pcm_s16": "<i2", "pcm_s32": "<i4", "pcm_f32": "<f4", "pcm_s8": "u1"}[codec]
+    width = np.dtype(dtype).itemsize
+    frames = len(payload) // (width * max(channels, 1))
+    samples = np.frombuffer(payload, dtype=dtype, count=frames * max(channels, 1))[::max(channels, 1)]
+    step = max(1, len(samples) // settings.AUDIO_PROBE_SAMPLES)
+    samples = samples[::step].astype(np.float32)
+    if codec == "pcm_s8":
+        return (samples - 128) / 128
+    if codec == "pcm_f32":
+        return samples
+    return samples / float(2 ** (8 * width - 1))
+
+def _probe_flac(data: bytes) -> AudioProbe:
+    # STREAMINFO: primeiro bloco de metadados, logo após "fLaC" + cabeçalho de 4 bytes
+    if len(data) < 42:
+        raise AudioRejected("corrupt_header", "FLAC header is truncated")
+    info = int.from_bytes(data[18:26], "big")
+    sample_rate = info >> 44
+    channels = ((info >> 41) & 0x7) + 1
+    total = info & ((1 << 36) - 1)
+    return AudioProbe(container="flac", codec="flac", sample_rate=sample_rate, channels=channels,
+                      duration=total / sample_rate if total and sample_rate else None)
+
+def _probe_ogg(data: bytes) -> AudioProbe:
+    # Primeiro pacote do primeiro page: cabeçalho do codec; granule do último page: posição final
+    segments = data[26] if len(data) > 26 else 0
+    packet = data[27 + segments:27 + segments + 64]
+    probe = AudioProbe(container="ogg")
+    pre_skip, granule_rate = 0, None
+    if packet.startswith(b"OpusHead") and len(packet) >= 16:
+        probe.codec = "opus"
+        probe.channels = packet[9]
+        pre_skip = struct.unpack_from("<H", packet, 10)[0]
+        probe.sample_rate = struct.unpack_from("<I", packet, 12)[0] or 48000
+        granule_rate = 48000    # Opus sempre conta granules a 48 kHz
+    elif packet.startswith(b"\x01vorbis") and len(packet) >= 16:
+        probe.codec = "vorbis"
+        probe.channels = packet[11]
+        probe.sample_rate = struct.unpack_from("<I", packet, 12)[0]
+        granule_rate = probe.sample_rate
+    else:
+        probe.codec = "unknown"
+
+    last_page = data.rfind(b"OggS", max(0, len(data) - 65536))
+    if granule_rate and last_page >= 0 and last_page + 14 <= len(data):
+        granule = struct.unpack_from("<q", data, last_page + 6)[0]
+        if granule > 0:
+            probe.duration = max(granule - pre_skip, 0) / granule_rate
+    return probe
+
+def _skip_id3(data: bytes) -> int:
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+def _probe_mpeg(data: bytes) -> AudioProbe:
+    """MP3 (MPEG áudio layer III) ou AAC em ADTS, pelo primeiro cabeçalho de frame"""
+    start = _skip_id3(data)
+    sync = data.find(b"\xff", start, start + 4096)
+    while 0 <= sync < len(data) - 4 and (data[sync + 1] & 0xE0) != 0xE0:
+        sync = data.find(b"\xff", sync + 1, start + 4096)
+    if sync < 0 or sync >= len(data) - 4:
+        raise AudioRejected("corrupt_header", "No MPEG audio frame found")
+    header = int.from_bytes(data[sync:sync + 4], "big")
+    layer = (header >> 17) & 0x3
+
+    if layer == 0:    # ADTS: AAC
+        rate_index = (header >> 10) & 0xF
+        if rate_index >= len(_ADTS_RATES):
+            raise AudioRejected("corrupt_header", "Invalid AAC sample rate")
+        probe = AudioProbe(container="aac", codec="aac", sample_rate=_ADTS_RATES[rate_index],
+                           channels=(header >> 6) & 0x7)
+        frame_length = (int.from_bytes(data[sync + 3:sync + 6], "big") >> 5) & 0x1FFF
+        if frame_length:
+            # Estimativa por bitrate do primeiro frame (1024 amostras por frame)
+            probe.duration = (len(data) - sync) / frame_length * 1024 / probe.sample_rate
+        return probe
+
+    version = (header >> 19) & 0x3
+    rate_index = (header >> 10) & 0x3
+    bitrate_index = (header >> 12) & 0xF
+    if version == 1 or rate_index == 3 or bitrate_index in (0, 15):
+        raise AudioRejected("corrupt_header", "Invalid MP3 frame header")
+    if layer != 1:
+        raise AudioRejected("unsupported_format", "Only MPEG layer III (MP3) audio is supported", status_code=415)
+    sample_rate = _MP3_RATES[version][rate_index]
+    probe = AudioProbe(container="mp3", codec="mp3", sample_rate=sample_rate,
+                       channels=1 if (header >> 6) & 0x3 == 3 else 2)
+    samples_per_frame = 1152 if version == 3 else 576
+
+    # VBR: cabeçalho Xing/Info com o número de frames; senão estimativa pelo bitrate (CBR)
+    xing = data.find(b"Xing", sync, sync + 64)
+    if xing < 0:
+        xing = data.find(b"Info", sync, sync + 64)
+    if xing >= 0 and struct.unpack_from(">I", data, xing + 4)[0] & 0x1:
+        frames = struct.unpack_from(">I", data, xing + 8)[0]
+        probe.duration = frames * samples_per_frame / sample_rate
+    else:
+        kbps = _MP3_BITRATES[3 if version == 3 else 2][bitrate_index]
+        probe.duration = (len(data) - sync) * 8 / (kbps * 1000)
+    return probe
+
+def _mp4_boxes(data: bytes, start: int, end: int):
+    while start + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, start)
+        header = 8
+        if size == 1 and start + 16 <= end:
+            size, header = struct.unpack_from(">Q", data, start + 8)[0], 16
+        elif size == 0:
+            size = end - start
+        if size < header:
+            return
+        yield kind, start + header, min(start + size, end)
+        start += size
+
+def _probe_mp4(data: bytes) -> AudioProbe:
+    """Duração do mvhd e taxa/canais do sample entry mp4a; moov pode estar no fim do arquivo"""
+    probe = AudioProbe(container="mp4")
+    moov = next(((body, end) for kind, body, end in _mp4_boxes(data, 0, len(data)) if kind == b"moov"), None)
+    if moov is None:
+        raise AudioRejected("corrupt_header", "MP4 file has no movie header (upload may be truncated)")
+    for kind, body, end in _mp4_boxes(data, *moov):
+        if kind == b"mvhd" and end - body >= 20:
+            if data[body] == 1:
+                timescale, duration = struct.unpack_from(">IQ", data, body + 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", data, body + 12)
+            if timescale:
+                probe.duration = duration / timescale
+    entry = data.find(b"mp4a", moov[0], moov[1])
+    if entry >= 0 and entry + 32 <= moov[1]:
+        probe.codec = "aac"
+        probe.channels = struct.unpack_from(">H", data, entry + 20)[0]
+        probe.sample_rate = struct.unpack_from(">I", data, entry + 28)[0] >> 16
+    else:
+        probe.codec = "unknown"
+    return probe
+
+def sniff_container(data: bytes) -> Optional[str]:
+    """Container pelos primeiros bytes (a extensão do arquivo não é confiável)"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:4] == b"fLaC":
+        return "flac"
+    if data[:4] == b"OggS":
+        return "ogg"
+    if data[4:8] == b"ftyp":
+        return "mp4"
+    start = _skip_id3(data)
+    if len(data) > start + 1 and data[start] == 0xFF and (data[start + 1] & 0xE0) == 0xE0:
+        return "mpeg"
+    if start:
+        return "mpeg"    # ID3 seguido de lixo/padding: o frame sync é procurado adiante
+    return None
+
+_PROBERS = {"wav": _probe_wav, "flac": _probe_flac, "ogg": _probe_ogg, "mpeg": _probe_mpeg, "mp4": _probe_mp4}
+
+# ----------------------------------------------------------------------
+# Níveis (pico, RMS, clipping) em uma amostra dizimada
+
+def _sample_levels(probe: AudioProbe, samples: np.ndarray):
+    if len(samples) == 0:
+        return
+    magnitude = np.abs(samples)
+    probe.peak_dbfs = round(float(20 * np.log10(magnitude.max() + 1e-9)), 1)
+    probe.rms_dbfs = round(float(10 * np.log10(np.mean(np.square(samples, dtype=np.float64)) + 1e-18)), 1)
+    probe.clipping_ratio = round(float(np.count_nonzero(magnitude >= 0.999)) / len(samples), 4)
+
+def _decoded_levels(probe: AudioProbe, data: bytes):
+    """
+    Formatos comprimidos: decodificar só os primeiros AUDIO_PROBE_SECONDS com libsndfile
+    (FLAC, Ogg Vorbis/Opus, MP3); MP4/AAC ficam sem checagem de nível
+    """
+    if probe.container not in ("flac", "ogg", "mp3") or not probe.sample_rate:
+        return
+    import soundfile as sf
+
+    try:
+        with sf.SoundFile(io.BytesIO(data)) as audio:
+            frames = int(settings.AUDIO_PROBE_SECONDS * audio.samplerate)
+            samples = audio.read(frames=frames, dtype="float32", always_2d=True)[:, 0]
+    except Exception as e:
+        logger.debug(f"Level probe skipped for {probe.codec}: {e}")
+        probe.warnings.append("levels_unchecked")
+        return
+    step = max(1, len(samples) // settings.AUDIO_PROBE_SAMPLES)
+    _sample_levels(probe, samples[::step])
+
+# ----------------------------------------------------------------------
+
+def probe_audio(data: bytes, filename: Optional[str] = None) -> AudioProbe:
+    """
+    Sondar o upload e rejeitar (AudioRejected) áudio inutilizável antes de qualquer decode/modelo:
+    container desconhecido, cabeçalho corrompido, curto/longo demais, taxa baixa, silêncio ou clipping pesado
+    Problemas leves (clipping moderado, volume baixo, extensão trocada) viram warnings
+    """
+    if len(data) < 64:
+        raise AudioRejected("empty_file", "Audio file is empty or truncated", status_code=400)
+    container = sniff_container(data)
+    if container is None:
+        raise AudioRejected("unsupported_format", "Unrecognized audio format", status_code=415)
+    try:
+        probe = _PROBERS[container](data)
+    except AudioRejected:
+        raise
+    except (struct.error, IndexError, KeyError) as e:
+        raise AudioRejected("corrupt_header", f"Could not read {container} header: {e}")
+
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension and extension not in _CONTAINER_EXTENSIONS.get(probe.container, set()):
+        probe.warnings.append("extension_mismatch")
+
+    if probe.sample_rate is not None and probe.sample_rate < settings.AUDIO_MIN_SAMPLE_RATE:
+        raise AudioRejected("sample_rate_too_low",
+                            f"Sample rate {probe.sample_rate} Hz is below {settings.AUDIO_MIN_SAMPLE_RATE} Hz")
+    if probe.duration is not None:
+        if probe.duration < settings.AUDIO_MIN_SECONDS:
+            raise AudioRejected("too_short", f"Recording is too short ({probe.duration:.2f}s)")
+        if probe.duration > settings.AUDIO_MAX_SECONDS:
+            raise AudioRejected("too_long", f"Recording is too long ({probe.duration:.0f}s, "
+                                            f"max {settings.AUDIO_MAX_SECONDS:.0f}s)", status_code=413)
+
+    if probe.peak_dbfs is None:
+        _decoded_levels(probe, data)
+    if probe.peak_dbfs is not None:
+        if probe.peak_dbfs < settings.AUDIO_SILENCE_PEAK_DBFS:
+            raise AudioRejected("silent", "No audible sound in the recording")
+        if probe.clipping_ratio > settings.AUDIO_MAX_CLIPPING_RATIO:
+            raise AudioRejected("clipped", "Recording is heavily distorted (clipping); move away from the microphone")
+        if probe.clipping_ratio > 0.01:
+            probe.warnings.append("clipping")
+        if probe.rms_dbfs < -45:
+            probe.warnings.append("low_volume")
+    return probe
+
+def check_upload(data: bytes, filename: Optional[str] = None) -> AudioProbe:
+    """probe_audio para os endpoints: rejeição vira HTTPException com o código no detail"""
+    try:
+        probe = probe_audio(data, filename)
+    except AudioRejected as e:
+        AUDIO_PROBE_RESULTS.labels(result=e.code).inc()
+        logger.info(f"Audio rejected ({e.code}): {e.message}")
+        raise HTTPException(status_code=e.status_code, detail={"error": e.code, "message": e.message})
+    AUDIO_PROBE_RESULTS.labels(result="flagged" if probe.warnings else "ok").inc()
+    return probe
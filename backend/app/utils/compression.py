@@ -0,0 +1,187 @@
+
+import gzip
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependência opcional
+    zstandard = None
+
+# Conteúdo já comprimido: recomprimir só gasta CPU
+SKIP_CONTENT_TYPES = ("application/pdf", "application/zip", "application/gzip",
+                      "application/octet-stream", "audio/", "video/", "image/")
+SKIP_PATH_PREFIXES = ("/static",)
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+def available_encodings() -> List[str]:
+    """Ordem de preferência do servidor"""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+def negotiate(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """Escolher a codificação pelo Accept-Encoding (q-values), desempate pela ordem do servidor"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    candidates = [
+        (weights.get(encoding, weights.get("*", 0.0)), -index, encoding)
+        for index, encoding in enumerate(supported)
+    ]
+    best = max(candidates, default=None)
+    return best[2] if best and best[0] > 0 else None
+
+class CompressedVariantCache:
+    """
+    LRU de variantes já comprimidas, chaveado por (hash do corpo, codificação)
+    Respostas repetidas (catálogo de lições, relatórios em cache) não são recomprimidas
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self.size = 0
+
+    def get_or_compress(self, body: bytes, encoding: str) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        compressed = self.entries.get(key)
+        if compressed is not None:
+            self.entries.move_to_end(key)
+            record_cache("compressed_variants", True)
+            return compressed
+
+        record_cache("compressed_variants", False)
+        compressed = _compress(body, encoding)
+        self.entries[key] = compressed
+        self.size += len(compressed)
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+        return compressed
+
+class CompressionMiddleware:
+    """
+    Compressão gzip/br/zstd negociada por requisição
+    Limite mínimo de tamanho por rota; PDFs, áudio e /static passam direto
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, route_minimum_sizes: Optional[Dict[str, int]] = None,
+                 cache: Optional[CompressedVariantCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.route_minimum_sizes = route_minimum_sizes or {}
+        self.cache = cache or CompressedVariantCache()
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(SKIP_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body_parts: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                if not self._compressible(message):
+                    passthrough = True
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                # Streaming: não segura o corpo inteiro em memória
+                if len(body_parts) == 1:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    body_parts.clear()
+                return
+
+            body = b"".join(body_parts)
+            if len(body) < self._minimum_size(scope):
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            compressed = self.cache.get_or_compress(body, encoding)
+            vary = [b"Accept-Encoding"]
+            response_headers = []
+            for name, value in start_message.get("headers", []):
+                if name.lower() == b"vary":
+                    vary.insert(0, value)
+                elif name.lower() != b"content-length":
+                    response_headers.append((name, value))
+            response_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", b", ".join(vary))
+            ]
+            await send({**start_message, "headers": response_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _compressible(self, start_message) -> bool:
+        response_headers = {name.lower(): value for name, value in start_message.get("headers", [])}
+        if b"content-encoding" in response_headers:
+            return False
+        content_type = response_headers.get(b"content-type", b"").decode("latin-1").lower()
+        return not content_type.startswith(SKIP_CONTENT_TYPES)
+
+    def _minimum_size(self, scope) -> int:
+        route = scope.get("route")
+        path = getattr(route, "path", None)
+        return self.route_minimum_sizes.get(path, self.minimum_size)
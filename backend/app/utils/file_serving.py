@@ -0,0 +1,212 @@
+
+import asyncio
+import hashlib
+import logging
+import os
+import stat
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import Response
+
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+class ContentHashCache:
+    """
+    ETag forte = hash do conteúdo, calculado uma vez por (path, tamanho, mtime)
+    O arquivo só é relido quando muda em disco
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+
+    def get(self, path: str, st: os.stat_result) -> str:
+        key = (path, st.st_size, st.st_mtime_ns)
+        digest = self.entries.get(key)
+        if digest is not None:
+            self.entries.move_to_end(key)
+            record_cache("audio_etag", True)
+            return digest
+
+        record_cache("audio_etag", False)
+        digest = hash_file(path)
+        self.entries[key] = digest
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return digest
+
+def hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpretar um header Range de intervalo único -> (início, fim inclusivo)
+    None = servir o arquivo inteiro (sem Range, unidade desconhecida ou múltiplos intervalos)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec or "," in spec:
+        return None
+
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            # Sufixo: os últimos N bytes
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+class RangeFileResponse(Response):
+    """
+    Resposta de arquivo com Range/206, ETag forte e cache longo
+    Transferência zero-copy quando o servidor oferece a extensão ASGI http.response.zerocopy
+    (sendfile) ou quando um proxy atende X-Accel-Redirect; senão lê em blocos com os.pread
+    """
+
+    def __init__(self, path: str, etag: str, st: os.stat_result, media_type: str,
+                 range_header: str = "", if_range: str = "", accel_prefix: str = "",
+                 accel_root: str = ""):
+        self.path = path
+        self.size = st.st_size
+        self.media_type = media_type
+        self.background = None
+        self.body = b""
+        self.status_code = 200
+        self.byte_range = (0, self.size - 1) if self.size else None
+
+        # If-Range: o intervalo só vale se o cliente tiver a mesma versão do arquivo
+        if range_header and (not if_range or if_range == etag):
+            try:
+                requested = parse_range(range_header, self.size)
+            except RangeNotSatisfiable:
+                self.status_code = 416
+                self.byte_range = None
+            else:
+                if requested is not None:
+                    self.status_code = 206
+                    self.byte_range = requested
+
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": formatdate(st.st_mtime, usegmt=True),
+            "cache-control": IMMUTABLE_CACHE_CONTROL
+        }
+        self.accel_path = None
+        if self.status_code == 416:
+            headers["content-range"] = f"bytes */{self.size}"
+            headers["content-length"] = "0"
+        elif accel_prefix:
+            # O proxy (nginx) trata Range e sendfile; aqui só vão os headers
+            relative = os.path.relpath(path, accel_root or ".").replace(os.sep, "/")
+            self.accel_path = f"{accel_prefix.rstrip('/')}/{relative}"
+            self.status_code = 200
+            headers["content-type"] = media_type
+            headers["x-accel-redirect"] = self.accel_path
+        else:
+            start, end = self.byte_range or (0, -1)
+            headers["content-type"] = media_type
+            headers["content-length"] = str(end - start + 1)
+            if self.status_code == 206:
+                headers["content-range"] = f"bytes {start}-{end}/{self.size}"
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers
+        })
+        if scope.get("method") == "HEAD" or self.status_code == 416 or self.accel_path or not self.byte_range:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        start, end = self.byte_range
+        count = end - start + 1
+        fd = await asyncio.to_thread(os.open, self.path, os.O_RDONLY)
+        try:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": fd,
+                    "offset": start,
+                    "count": count,
+                    "more_body": False
+                })
+                return
+
+            offset = start
+            while count > 0:
+                chunk = await asyncio.to_thread(os.pread, fd, min(CHUNK_SIZE, count), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                count -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": count > 0})
+            if count > 0:
+                # Arquivo encolheu durante a transferência
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (candidate.strip() for candidate in if_none_match.split(","))
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={
+        "etag": etag,
+        "cache-control": IMMUTABLE_CACHE_CONTROL,
+        "accept-ranges": "bytes"
+    })
+
+def stat_regular_file(path: str) -> Optional[os.stat_result]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st if stat.S_ISREG(st.st_mode) else None
+
+class PrivateStaticFiles(StaticFiles):
+    """StaticFiles que não expõe diretórios com áudio de usuários"""
+
+    def __init__(self, *args, private_prefixes: Tuple[str, ...] = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.private_prefixes = tuple(prefix.strip("/") + "/" for prefix in private_prefixes)
+
+    async def get_response(self, path: str, scope):
+        normalized = os.path.normpath(path).replace(os.sep, "/").lstrip("/") + "/"
+        if normalized.startswith(self.private_prefixes):
+            return Response(status_code=404)
+        return await super().get_response(path, scope)
+
+# Global instance
+content_hash_cache = ContentHashCache()
@@ -55,19 +55,57 @@ def get_current_user(token: str = None) -> Optional[Dict]:
 
 def calculate_audio_quality_score(audio_path: str) -> Dict:
     """
-    Calculate audio quality metrics
+    Calculate audio quality metrics (volume, noise, clipping) from the shared acoustic features
     """
     try:
-        # In production, analyze actual audio file
-        # For now, return simulated quality metrics
+        import librosa
+        from app.services.acoustic_features import acoustic_feature_extractor, load_audio
+
+        native_rate = librosa.get_samplerate(audio_path)
+        audio, sr = load_audio(audio_path, sr=16000)
+        features = acoustic_feature_extractor.extract(audio, sr)
+
+        level = features.rms_dbfs
+        if features.clipping_ratio > 0.001 or level > -10:
+            volume_level = "too_loud"
+        elif level < -35:
+            volume_level = "too_quiet"
+        else:
+            volume_level = "optimal"
+
+        if features.snr_db >= 25:
+            background_noise = "minimal"
+        elif features.snr_db >= 15:
+            background_noise = "moderate"
+        else:
+            background_noise = "high"
+
+        clarity_score = float(
+            min(max(features.snr_db / 30, 0.0), 1.0) * (1 - min(features.clipping_ratio * 100, 1.0))
+        )
+        if clarity_score >= 0.8 and volume_level == "optimal":
+            quality_rating = "excellent"
+        elif clarity_score >= 0.6:
+            quality_rating = "good"
+        elif clarity_score >= 0.4:
+            quality_rating = "fair"
+        else:
+            quality_rating = "poor"
+
+        duration = features.duration
+        bit_rate = os.path.getsize(audio_path) * 8 / duration / 1000 if duration > 0 else 0.0
         return {
-            "volume_level": "optimal",
-            "background_noise": "minimal",
-            "clarity_score": 0.92,
-            "sample_rate": "44.1kHz",
-            "bit_rate": "128kbps",
-            "duration": 5.2,
-            "quality_rating": "excellent"
+            "volume_level": volume_level,
+            "background_noise": background_noise,
+            "clarity_score": round(clarity_score, 3),
+            "sample_rate": f"{native_rate / 1000:g}kHz",
+            "bit_rate": f"{bit_rate:.0f}kbps",
+            "duration": round(duration, 2),
+            "quality_rating": quality_rating,
+            "snr_db": round(features.snr_db, 1),
+            "rms_dbfs": round(level, 1),
+            "peak_dbfs": round(features.peak_dbfs, 1),
+            "clipping_ratio": round(features.clipping_ratio, 5)
         }
         
     except Exception as e:
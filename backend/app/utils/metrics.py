@@ -0,0 +1,145 @@
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Latência das rotas HTTP (label = template da rota, não o path cru)
+REQUEST_LATENCY = Histogram(
+    "bilingui_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+REQUESTS_IN_PROGRESS = Gauge(
+    "bilingui_http_requests_in_progress",
+    "HTTP requests currently being served"
+)
+
+# Etapas do pipeline de áudio (upload, decode, whisper, fluency, scoring...)
+PIPELINE_STAGE_LATENCY = Histogram(
+    "bilingui_pipeline_stage_duration_seconds",
+    "Latency of each processing stage",
+    ["pipeline", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+MODEL_LOAD_SECONDS = Gauge(
+    "bilingui_model_load_seconds",
+    "Time spent loading each AI model",
+    ["model"]
+)
+
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "bilingui_executor_queue_depth",
+    "Work items waiting or running in background executors",
+    ["executor"]
+)
+
+CACHE_REQUESTS = Counter(
+    "bilingui_cache_requests_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"]
+)
+
+WHISPER_CASCADE_PASSES = Counter(
+    "bilingui_whisper_cascade_passes_total",
+    "Whisper cascade passes by model tier and outcome",
+    ["tier", "outcome"]
+)
+
+AUDIO_PROBE_RESULTS = Counter(
+    "bilingui_audio_probe_results_total",
+    "Upload probe outcomes (ok, flagged or the rejection code)",
+    ["result"]
+)
+
+CHAT_LOG_ROWS = Counter(
+    "bilingui_chat_log_rows_total",
+    "Chat log rows by outcome (flushed, dead_lettered, replayed, quarantined, dropped)",
+    ["outcome"]
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "bilingui_db_pool_connections",
+    "Database connection pool usage",
+    ["state"]
+)
+
+@contextmanager
+def track_stage(stage: str, pipeline: str = "audio"):
+    """Medir a duração de uma etapa do pipeline (também vira um span do trace)"""
+    start = time.perf_counter()
+    try:
+        with span(stage, pipeline=pipeline):
+            yield
+    finally:
+        PIPELINE_STAGE_LATENCY.labels(pipeline=pipeline, stage=stage).observe(time.perf_counter() - start)
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+def register_queue_depth(executor: str, depth: Callable[[], float]):
+    EXECUTOR_QUEUE_DEPTH.labels(executor=executor).set_function(depth)
+
+def register_db_pool(engine):
+    """Expor uso do pool (QueuePool expõe size/checkedout/overflow)"""
+    pool = engine.pool
+    for state, getter in {
+        "size": "size",
+        "checked_out": "checkedout",
+        "checked_in": "checkedin",
+        "overflow": "overflow"
+    }.items():
+        if hasattr(pool, getter):
+            DB_POOL_CONNECTIONS.labels(state=state).set_function(getattr(pool, getter))
+
+class PrometheusMiddleware:
+    """Middleware ASGI que mede a latência por rota"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            REQUEST_LATENCY.labels(
+                method=scope["method"],
+                route=_route_label(scope),
+                status=str(status_code)
+            ).observe(time.perf_counter() - start)
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    if scope["path"].startswith("/static/"):
+        return "/static"
+    return "unmatched"
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,195 @@
+
+import asyncio
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+class ProfileSession:
+    """
+    Amostragem estatística de stacks de todas as threads via sys._current_frames
+    Roda numa thread própria; nada fica ativo fora de uma sessão
+    """
+
+    def __init__(self, interval: float = 0.005, max_seconds: float = 60.0):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = self.started_at + self.max_seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.stacks[_collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+        self.elapsed = time.monotonic() - self.started_at
+
+    def collapsed(self) -> str:
+        """Formato "collapsed stacks" (flamegraph.pl, speedscope, inferno)"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def summary(self, top: int = 20) -> Dict:
+        return {
+            "samples": self.samples,
+            "duration_seconds": round(self.elapsed, 3),
+            "interval_ms": self.interval * 1000,
+            "top_stacks": [
+                {"stack": stack.split(";"), "samples": count}
+                for stack, count in self.stacks.most_common(top)
+            ]
+        }
+
+def _collapse(thread_name: str, frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    frames.append(thread_name.replace(" ", "_"))
+    return ";".join(reversed(frames))
+
+class SamplingProfiler:
+    """Uma sessão de profiling por worker, limitada no tempo"""
+
+    def __init__(self, max_seconds: float = 60.0, output_dir: str = "./data/profiles",
+                 max_profiles: int = 100):
+        self.max_seconds = max_seconds
+        self.output_dir = output_dir
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    async def profile(self, seconds: float, interval_ms: float = 5.0) -> ProfileSession:
+        """Amostrar o worker por `seconds` segundos"""
+        session = self.begin(interval_ms, min(seconds, self.max_seconds))
+        try:
+            await asyncio.sleep(min(seconds, self.max_seconds))
+        finally:
+            await asyncio.to_thread(self.end, session)
+        return session
+
+    def begin(self, interval_ms: float, max_seconds: float) -> ProfileSession:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profiling session is already running on this worker")
+        session = ProfileSession(interval=max(interval_ms, 1.0) / 1000, max_seconds=max_seconds)
+        session.start()
+        return session
+
+    def end(self, session: ProfileSession):
+        try:
+            session.stop()
+        finally:
+            self._lock.release()
+
+    def save(self, session: ProfileSession, profile_id: Optional[str] = None) -> str:
+        """Gravar as stacks em disco (I/O bloqueante: chamar fora do event loop); retorna o id do perfil"""
+        profile_id = profile_id or uuid.uuid4().hex
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(self.profile_path(profile_id), "w", encoding="utf-8") as handle:
+            handle.write(session.collapsed())
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        """Manter só os max_profiles perfis mais recentes"""
+        if self.max_profiles <= 0:
+            return
+        profiles = []
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".folded"):
+                    try:
+                        profiles.append((entry.stat().st_mtime, entry.path))
+                    except FileNotFoundError:
+                        continue
+        profiles.sort(reverse=True)
+        for _, path in profiles[self.max_profiles:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def profile_path(self, profile_id: str) -> str:
+        return os.path.join(self.output_dir, f"{profile_id}.folded")
+
+class RequestProfilerMiddleware:
+    """
+    Perfil de uma única requisição marcada com o header X-Profile-Request
+    O valor precisa bater com PROFILER_REQUEST_TOKEN; sem token configurado o modo fica desligado
+    """
+
+    HEADER = b"x-profile-request"
+
+    def __init__(self, app, profiler: "SamplingProfiler", token: str = ""):
+        self.app = app
+        self.profiler = profiler
+        self.token = token.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.token:
+            await self.app(scope, receive, send)
+            return
+
+        requested = dict(scope.get("headers") or []).get(self.HEADER)
+        if requested is None or not hmac.compare_digest(requested, self.token):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            session = self.profiler.begin(interval_ms=1.0, max_seconds=self.profiler.max_seconds)
+        except ProfilerBusyError:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await asyncio.to_thread(self.profiler.end, session)
+            await asyncio.to_thread(self.profiler.save, session, profile_id)
+            logger.info(f"🔬 Request profile {profile_id} ({session.samples} samples) for {scope['path']}")
+
+# Global instance
+sampling_profiler = SamplingProfiler(
+    max_seconds=settings.PROFILER_MAX_SECONDS,
+    output_dir=settings.PROFILER_OUTPUT_DIR,
+    max_profiles=settings.PROFILER_MAX_PROFILES
+)
@@ -0,0 +1,42 @@
+
+import dataclasses
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _default(obj: Any) -> Any:
+    """Tipos que o orjson não serializa nativamente"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+class FastJSONResponse(JSONResponse):
+    """
+    Resposta JSON via orjson (NumPy, datetime, Enum e dataclasses nativos)
+    Retornar esta classe direto na rota também evita o jsonable_encoder do FastAPI
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -17,7 +17,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire, "sub": data.get("sub")})
+    # JWT exige "sub" como string (python-jose rejeita inteiros na validação)
+    to_encode.update({"exp": expire, "sub": str(data.get("sub"))})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -34,9 +35,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     try:
         payload = verify_token(token)
-        user_id: int = payload.get("sub")
-        if user_id is None:
+        subject = payload.get("sub")
+        if subject is None:
             raise credentials_exception
+        user_id: int = int(subject) if str(subject).isdigit() else subject
         return {"user_id": user_id}
     except JWTError:
         raise credentials_exception
+
+
+async def get_current_admin(current_user: dict = Depends(get_current_user)):
+    from app.database import SessionLocal
+    from app.models.user import User
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).get(current_user["user_id"])
+    finally:
+        db.close()
+    if not user or user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return {"user_id": user.id, "role": user.role}
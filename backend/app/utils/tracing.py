@@ -0,0 +1,261 @@
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+@dataclass
+class Trace:
+    """Spans de uma requisição (ou de uma tarefa sem requisição)"""
+    trace_id: str
+    spans: List[Span] = field(default_factory=list)
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+class SpanExporter:
+    """
+    Exporta traces no formato OTLP/JSON (ExportTraceServiceRequest)
+    Escrita em thread de background para não bloquear o event loop
+    """
+
+    def __init__(self, path: str = "", endpoint: str = "", service_name: str = "bilingui-backend"):
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._queue: "queue.SimpleQueue[Trace]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, trace: Trace):
+        if not (self.path or self.endpoint):
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+        self._queue.put(trace)
+
+    def _run(self):
+        while True:
+            payload = json.dumps(self.to_otlp(self._queue.get()))
+            try:
+                if self.path:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as handle:
+                        handle.write(payload + "\n")
+                if self.endpoint:
+                    request = urllib.request.Request(
+                        self.endpoint, data=payload.encode("utf-8"),
+                        headers={"Content-Type": "application/json"}
+                    )
+                    urllib.request.urlopen(request, timeout=2).close()
+            except Exception as e:
+                logger.warning(f"Trace export failed: {e}")
+
+    def to_otlp(self, trace: Trace) -> Dict:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.utils.tracing"},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_span_id or "",
+                            "name": span.name,
+                            "kind": 2 if span.parent_span_id is None else 1,
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                            "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+                        }
+                        for span in trace.spans
+                    ]
+                }]
+            }]
+        }
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+exporter = SpanExporter(
+    path=settings.TRACING_EXPORT_PATH,
+    endpoint=settings.TRACING_OTLP_ENDPOINT
+)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Abrir um span filho do span atual (ou raiz de um novo trace)"""
+    if not settings.TRACING_ENABLED:
+        yield None
+        return
+
+    trace = _current_trace.get()
+    trace_token = None
+    if trace is None:
+        trace = Trace(trace_id=secrets.token_hex(16))
+        trace_token = _current_trace.set(trace)
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=attributes
+    )
+    span_token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        trace.spans.append(current)
+        _current_span.reset(span_token)
+        if trace_token is not None:
+            _current_trace.reset(trace_token)
+            exporter.export(trace)
+
+def traced(name: Optional[str] = None):
+    """Decorator que envolve a função (sync ou async) em um span"""
+    def decorator(fn: Callable):
+        span_name = name or fn.__qualname__
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_TIMING_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+class TracingMiddleware:
+    """
+    Span raiz por requisição + header Server-Timing com as etapas mais lentas
+    Aceita traceparent (W3C) para continuar um trace externo
+    """
+
+    def __init__(self, app, max_stages: int = 5):
+        self.app = app
+        self.max_stages = max_stages
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        match = _TRACEPARENT.match(headers.get(b"traceparent", b"").decode("latin-1"))
+        trace = Trace(trace_id=match.group(1) if match else secrets.token_hex(16))
+        remote_parent = Span("remote", trace.trace_id, match.group(2), None, 0) if match else None
+
+        trace_token = _current_trace.set(trace)
+        parent_token = _current_span.set(remote_parent)
+        root_token = None
+        try:
+            root = Span(
+                name=f"{scope['method']} {scope['path']}",
+                trace_id=trace.trace_id,
+                span_id=secrets.token_hex(8),
+                parent_span_id=remote_parent.span_id if remote_parent else None,
+                start_ns=time.time_ns(),
+                attributes={"http.method": scope["method"], "http.target": scope["path"]}
+            )
+            root_token = _current_span.set(root)
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.status_code", message["status"])
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"server-timing", self._server_timing(trace, root).encode("latin-1"))
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            except BaseException as e:
+                root.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                route = scope.get("route")
+                if route is not None and hasattr(route, "path"):
+                    root.name = f"{scope['method']} {route.path}"
+                    root.set_attribute("http.route", route.path)
+                root.end_ns = time.time_ns()
+                trace.spans.append(root)
+                exporter.export(trace)
+        finally:
+            if root_token is not None:
+                _current_span.reset(root_token)
+            _current_span.reset(parent_token)
+            _current_trace.reset(trace_token)
+
+    def _server_timing(self, trace: Trace, root: Span) -> str:
+        """Somar a duração por nome de span e listar as etapas mais lentas"""
+        totals: Dict[str, float] = {}
+        for finished in trace.spans:
+            if finished is not root:
+                totals[finished.name] = totals.get(finished.name, 0.0) + finished.duration_ms
+
+        stages = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:self.max_stages]
+        entries = [
+            f'{_TIMING_NAME.sub("_", stage_name)};dur={duration:.1f}'
+            for stage_name, duration in stages
+        ]
+        entries.append(f"total;dur={(time.time_ns() - root.start_ns) / 1e6:.1f}")
+        return ", ".join(entries)
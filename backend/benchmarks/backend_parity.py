@@ -0,0 +1,155 @@
+"""
+Paridade e custo dos backends de inferência (torch fp32 x int8 x onnx)
+
+Uso (a partir de backend/benchmarks):
+
+    python backend_parity.py                                  # grammar + sentence_transformer
+    python backend_parity.py --models whisper --audio fala.wav
+    python backend_parity.py --backends int8 --iterations 50 --output parity.json
+
+Cada backend roda em um processo próprio (spawn) para medir o RSS de pico sem
+interferência dos outros modelos. Sai com código 1 se algum backend sair da tolerância.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic import TEXT_WORDS, target_text, transcription_of
+
+MODELS = {
+    "grammar": "textattack/roberta-base-CoLA",
+    "sentence_transformer": "all-MiniLM-L6-v2",
+    "whisper": "base",
+}
+
+# Tolerâncias de paridade com o PyTorch fp32 (também usadas por test_backend_parity.py)
+DEFAULT_TOLERANCE = 0.05
+DEFAULT_MIN_COSINE = 0.99
+
+def _sentences():
+    sentences = []
+    for words in TEXT_WORDS.values():
+        target = target_text(words)
+        sentences.extend([target, transcription_of(target)])
+    return sentences
+
+def _load(model: str, backend: str, cache_dir: str):
+    from app.services import inference_backends
+
+    if model == "grammar":
+        return inference_backends.load_text_classifier(MODELS[model], backend, cache_dir=cache_dir)
+    if model == "sentence_transformer":
+        return inference_backends.load_sentence_encoder(MODELS[model], backend, cache_dir=cache_dir)
+    return inference_backends.load_whisper(MODELS[model], backend)
+
+def _infer(model: str, instance, inputs):
+    if model == "grammar":
+        return [[entry["score"] for entry in instance(text)[0]] for text in inputs]
+    if model == "sentence_transformer":
+        return np.asarray(instance.encode(inputs)).tolist()
+    return instance.transcribe(inputs, language="en", temperature=0.0)["text"].strip()
+
+def _worker(model: str, backend: str, cache_dir: str, inputs, iterations: int, queue):
+    """Roda no processo filho: carga, aquecimento, medição e RSS de pico"""
+    try:
+        started = time.perf_counter()
+        instance = _load(model, backend, cache_dir)
+        load_seconds = time.perf_counter() - started
+
+        outputs = _infer(model, instance, inputs)
+        latencies = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            _infer(model, instance, inputs)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        queue.put({
+            "backend": getattr(instance, "backend", backend),
+            "outputs": outputs,
+            "load_seconds": round(load_seconds, 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            # ru_maxrss em KiB no Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+def run_isolated(model: str, backend: str, cache_dir: str, inputs, iterations: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_worker, args=(model, backend, cache_dir, inputs, iterations, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def compare(model: str, reference, candidate, tolerance: float, min_cosine: float) -> dict:
+    if model == "grammar":
+        difference = float(np.max(np.abs(np.asarray(reference) - np.asarray(candidate))))
+        return {"max_probability_diff": round(difference, 4), "ok": difference <= tolerance}
+    if model == "sentence_transformer":
+        a, b = np.asarray(reference), np.asarray(candidate)
+        cosines = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+        return {"min_cosine": round(float(cosines.min()), 4), "ok": bool(cosines.min() >= min_cosine)}
+    return {"transcript": candidate, "ok": candidate.lower() == reference.lower()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity, latency and RSS of the inference backends")
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=["grammar", "sentence_transformer"])
+    parser.add_argument("--backends", nargs="+", choices=["int8", "onnx"], default=["int8", "onnx"])
+    parser.add_argument("--audio", default=None, help="WAV para comparar transcrições do Whisper")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="diferença máxima de probabilidade (grammar)")
+    parser.add_argument("--min-cosine", type=float, default=DEFAULT_MIN_COSINE, help="cosseno mínimo com o fp32 (embeddings)")
+    parser.add_argument("--cache-dir", default="./.onnx")
+    parser.add_argument("--output", default=None, help="arquivo JSON com o relatório")
+    args = parser.parse_args()
+
+    if "whisper" in args.models and not args.audio:
+        parser.error("--models whisper requires --audio")
+
+    report = {}
+    failed = False
+    for model in args.models:
+        inputs = args.audio if model == "whisper" else _sentences()
+        reference = run_isolated(model, "torch", args.cache_dir, inputs, args.iterations)
+        if "error" in reference:
+            print(f"{model:22s} torch  ERROR {reference['error']}")
+            failed = True
+            continue
+        rows = {"torch": {key: value for key, value in reference.items() if key != "outputs"}}
+        print(f"{model:22s} {'torch':6s} p50={reference['p50_ms']:8.2f}ms p95={reference['p95_ms']:8.2f}ms "
+              f"rss={reference['peak_rss_mb']:7.1f}MB")
+
+        for backend in args.backends:
+            result = run_isolated(model, backend, args.cache_dir, inputs, args.iterations)
+            if "error" in result:
+                print(f"{model:22s} {backend:6s} ERROR {result['error']}")
+                rows[backend] = {"error": result["error"]}
+                failed = True
+                continue
+            parity = compare(model, reference["outputs"], result["outputs"], args.tolerance, args.min_cosine)
+            failed |= not parity["ok"]
+            rows[backend] = {**{key: value for key, value in result.items() if key != "outputs"}, **parity}
+            details = ", ".join(f"{key}={value}" for key, value in parity.items() if key != "ok")
+            print(f"{model:22s} {backend:6s} p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms "
+                  f"rss={result['peak_rss_mb']:7.1f}MB parity={'ok' if parity['ok'] else 'FAIL'} ({details})")
+        report[model] = rows
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
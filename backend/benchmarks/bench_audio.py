@@ -0,0 +1,51 @@
+import pytest
+
+SIZES = ["short", "medium", "long"]
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_librosa_load(benchmark, audio_files, size):
+    librosa = pytest.importorskip("librosa")
+    benchmark.group = "decode"
+
+    audio, sr = benchmark(librosa.load, audio_files[size], sr=16000)
+
+    assert sr == 16000 and len(audio) > 0
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_analyze_fluency(benchmark, real_models, audio_16k, size):
+    benchmark.group = "fluency"
+
+    score = benchmark(real_models._analyze_fluency, audio_16k[size], 16000)
+
+    assert 0.0 <= score <= 1.0
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_vad_trim(benchmark, audio_16k, size):
+    from app.services.voice_activity import VoiceActivityDetector
+
+    benchmark.group = "vad"
+    vad = benchmark(VoiceActivityDetector().trim, audio_16k[size], 16000)
+
+    assert vad.has_speech and vad.trimmed_duration <= vad.original_duration
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_acoustic_features(benchmark, audio_16k, size):
+    from app.services.acoustic_features import acoustic_feature_extractor
+
+    benchmark.group = "features"
+    features = benchmark(acoustic_feature_extractor.extract, audio_16k[size], 16000)
+
+    assert features.speech_seconds > 0 and 0.0 <= features.fluency_score() <= 1.0
+
+@pytest.mark.parametrize("size", ["short", "medium"])
+def bench_native_template_dtw(benchmark, audio_16k, size):
+    from app.services.acoustic_features import acoustic_feature_extractor
+    from app.services.native_templates import banded_dtw, template_features
+
+    benchmark.group = "native_dtw"
+    student = template_features(acoustic_feature_extractor.extract(audio_16k[size], 16000))
+    native = template_features(acoustic_feature_extractor.extract(audio_16k["short"], 16000))
+
+    distance, path = benchmark(banded_dtw, student, native)
+
+    assert distance >= 0 and len(path) >= len(student)
@@ -0,0 +1,46 @@
+import pytest
+
+from app.utils import helpers
+
+SIZES = ["short", "medium", "long"]
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_analyze_pronunciation(benchmark, real_models, text_pairs, size):
+    benchmark.group = "pronunciation"
+
+    score = benchmark(real_models._analyze_pronunciation, *text_pairs[size])
+
+    assert 0.0 <= score <= 1.0
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_detect_speech_errors(benchmark, real_models, text_pairs, size):
+    benchmark.group = "speech_errors"
+
+    errors = benchmark(real_models._detect_speech_errors, *text_pairs[size])
+
+    assert isinstance(errors, list)
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_normalize_audio_text(benchmark, text_pairs, size):
+    benchmark.group = "normalize_text"
+
+    normalized = benchmark(helpers.normalize_audio_text, text_pairs[size][0])
+
+    assert normalized == normalized.lower()
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_calculate_similarity_score(benchmark, text_pairs, size):
+    benchmark.group = "similarity"
+
+    similarity = benchmark(helpers.calculate_similarity_score, *text_pairs[size])
+
+    assert 0.0 <= similarity <= 1.0
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_generate_pronunciation_score(benchmark, text_pairs, size):
+    benchmark.group = "pronunciation_score"
+    transcription, target = text_pairs[size]
+
+    scores = benchmark(helpers.generate_pronunciation_score, transcription, target, {"clarity_score": 0.85})
+
+    assert scores["overall_score"] >= 0
@@ -0,0 +1,37 @@
+import pytest
+
+from synthetic import (
+    CLIP_SECONDS, SAMPLE_RATE, TEXT_WORDS, synthetic_speech, target_text, transcription_of
+)
+
+@pytest.fixture(scope="session")
+def audio_files(tmp_path_factory):
+    """WAVs 16-bit/44.1 kHz (como chegam do app) para short/medium/long"""
+    soundfile = pytest.importorskip("soundfile")
+    directory = tmp_path_factory.mktemp("audio")
+    paths = {}
+    for size, seconds in CLIP_SECONDS.items():
+        path = directory / f"{size}.wav"
+        soundfile.write(str(path), synthetic_speech(seconds), SAMPLE_RATE, subtype="PCM_16")
+        paths[size] = str(path)
+    return paths
+
+@pytest.fixture(scope="session")
+def audio_16k():
+    """Sinais já em 16 kHz mono float32 (saída de librosa.load(sr=16000))"""
+    return {size: synthetic_speech(seconds, sr=16000) for size, seconds in CLIP_SECONDS.items()}
+
+@pytest.fixture(scope="session")
+def text_pairs():
+    """(transcrição, alvo) por tamanho"""
+    pairs = {}
+    for size, words in TEXT_WORDS.items():
+        target = target_text(words)
+        pairs[size] = (transcription_of(target), target)
+    return pairs
+
+@pytest.fixture(scope="session")
+def real_models():
+    """RealAIModels sem carregar pesos: só os métodos de análise são medidos"""
+    module = pytest.importorskip("app.services.real_ai_models")
+    return module.RealAIModels()
@@ -0,0 +1,2 @@
+from .runner import LoadTestConfig, run_load_test, format_report
+from .stubs import StubConfig, StubCost
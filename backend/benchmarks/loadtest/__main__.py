@@ -0,0 +1,60 @@
+"""
+Uso (a partir de backend/benchmarks):
+
+    python -m loadtest --profile mixed --users 50 --duration 30 --output results.json
+    python -m loadtest --profile audio_heavy --speech-latency-ms 800 --speech-cpu-ms 120
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from loadtest.runner import LoadTestConfig, format_report, run_load_test
+from loadtest.scenarios import PROFILES
+from loadtest.stubs import StubConfig, StubCost
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process HTTP load test with model stubs")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="mixed")
+    parser.add_argument("--users", type=int, default=20, help="usuários virtuais concorrentes")
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos de carga")
+    parser.add_argument("--max-requests", type=int, default=None)
+    parser.add_argument("--think-time-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None, help="padrão: SQLite temporário")
+    parser.add_argument("--output", default=None, help="arquivo JSON com o relatório")
+    for component, (latency, cpu) in {
+        "speech": (250, 40), "text": (20, 5), "orchestrator": (150, 10), "llm": (400, 0), "embedding": (0, 2)
+    }.items():
+        parser.add_argument(f"--{component}-latency-ms", type=float, default=latency)
+        parser.add_argument(f"--{component}-cpu-ms", type=float, default=cpu)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    stub_config = StubConfig(**{
+        component: StubCost(
+            latency_ms=getattr(args, f"{component}_latency_ms"),
+            cpu_ms=getattr(args, f"{component}_cpu_ms"),
+            seed=args.seed + index
+        )
+        for index, component in enumerate(("speech", "text", "orchestrator", "llm", "embedding"))
+    })
+    config = LoadTestConfig(
+        profile=args.profile,
+        users=args.users,
+        duration=args.duration,
+        max_requests=args.max_requests,
+        think_time_ms=args.think_time_ms,
+        seed=args.seed,
+        database_url=args.database_url,
+        output=os.path.abspath(args.output) if args.output else None
+    )
+    report = asyncio.run(run_load_test(config, stub_config))
+    print(format_report(report))
+
+if __name__ == "__main__":
+    main()
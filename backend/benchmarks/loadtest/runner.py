@@ -0,0 +1,243 @@
+"""
+Harness de carga: sobe app.main:app no próprio processo (ASGI, sem rede)
+com os modelos trocados por stubs e mede throughput, percentis e erros por rota
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+logger = logging.getLogger("loadtest")
+
+@dataclass
+class LoadTestConfig:
+    profile: str = "mixed"
+    users: int = 20
+    duration: float = 30.0
+    max_requests: Optional[int] = None
+    think_time_ms: float = 0.0
+    seed: int = 42
+    lessons: int = 20
+    database_url: Optional[str] = None
+    output: Optional[str] = None
+
+@dataclass
+class RouteStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    status_codes: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+
+class Recorder:
+    def __init__(self, client, max_requests: Optional[int] = None):
+        self.client = client
+        self.max_requests = max_requests
+        self.routes: Dict[str, RouteStats] = defaultdict(RouteStats)
+        self.total = 0
+        self.exceptions: Dict[str, int] = defaultdict(int)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.max_requests is not None and self.total >= self.max_requests
+
+    async def request(self, label: str, method: str, url: str,
+                      expected: Sequence[int] = (200, 201), **kwargs):
+        self.total += 1
+        stats = self.routes[label]
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception as e:
+            stats.latencies.append(time.perf_counter() - started)
+            stats.errors += 1
+            self.exceptions[f"{label}: {type(e).__name__}"] += 1
+            return None
+
+        stats.latencies.append(time.perf_counter() - started)
+        stats.status_codes[response.status_code] += 1
+        if response.status_code not in expected:
+            stats.errors += 1
+        return response
+
+    def report(self, elapsed: float) -> Dict:
+        routes = {}
+        for label, stats in sorted(self.routes.items()):
+            latencies = np.asarray(stats.latencies) * 1000
+            routes[label] = {
+                "requests": len(latencies),
+                "throughput_rps": round(len(latencies) / elapsed, 2),
+                "error_rate": round(stats.errors / len(latencies), 4) if len(latencies) else 0.0,
+                "status_codes": dict(stats.status_codes),
+                "latency_ms": _percentiles(latencies)
+            }
+
+        all_latencies = np.concatenate([np.asarray(s.latencies) for s in self.routes.values()]) * 1000 \
+            if self.routes else np.zeros(0)
+        errors = sum(stats.errors for stats in self.routes.values())
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": int(all_latencies.size),
+            "throughput_rps": round(all_latencies.size / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(errors / all_latencies.size, 4) if all_latencies.size else 0.0,
+            "latency_ms": _percentiles(all_latencies),
+            "routes": routes,
+            "exceptions": dict(self.exceptions)
+        }
+
+def _percentiles(latencies_ms: np.ndarray) -> Dict:
+    if not latencies_ms.size:
+        return {}
+    p50, p90, p95, p99 = np.percentile(latencies_ms, [50, 90, 95, 99])
+    return {
+        "mean": round(float(latencies_ms.mean()), 2),
+        "p50": round(float(p50), 2),
+        "p90": round(float(p90), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "max": round(float(latencies_ms.max()), 2)
+    }
+
+def prepare_environment(config: LoadTestConfig) -> str:
+    """
+    Diretório de trabalho descartável (static/, banco, índices) e variáveis de ambiente
+    Precisa rodar antes de qualquer import de `app`
+    """
+    workdir = tempfile.mkdtemp(prefix="bilingui-loadtest-")
+    os.makedirs(os.path.join(workdir, "static", "uploads"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "static", "audio"), exist_ok=True)
+    os.chdir(workdir)
+
+    os.environ["DATABASE_URL"] = config.database_url or f"sqlite:///{workdir}/loadtest.db"
+    os.environ.setdefault("VECTOR_INDEX_DIR", os.path.join(workdir, "vector_index"))
+    os.environ.setdefault("LLM_BACKEND", "simulated")
+
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    return workdir
+
+def seed_database(lessons: int) -> List[int]:
+    from app.database import Base, SessionLocal, engine
+    from app.models import user, lesson, progress, chat_log, audio_submission, id_sequence  # noqa: F401
+    from app.models.lesson import Lesson
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        levels = ["beginner", "intermediate", "advanced"]
+        rows = [
+            Lesson(
+                language="en",
+                level=levels[i % len(levels)],
+                title=f"Lesson {i + 1}",
+                type=["reading", "speaking", "chat"][i % 3],
+                content=f"Practice dialogue number {i + 1}. " * 20
+            )
+            for i in range(lessons)
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [row.id for row in rows]
+    finally:
+        db.close()
+
+def mount_optional_routers(app) -> set:
+    """Rotas que o app ainda não expõe: monta se possível, senão desliga o cenário"""
+    disabled = set()
+    if not any(getattr(route, "path", "").startswith("/reports") for route in app.routes):
+        try:
+            from app.api import reports
+            app.include_router(reports.router, prefix="/reports", tags=["Reports"])
+        except ImportError as e:
+            logger.warning(f"Report download disabled (reports router unavailable: {e})")
+            disabled.add("download_report")
+    return disabled
+
+async def run_load_test(config: LoadTestConfig, stub_config=None) -> Dict:
+    import httpx
+
+    from .scenarios import PROFILES, SCENARIOS, VirtualUser, pick_scenario
+    from .stubs import StubConfig, install_stubs
+
+    prepare_environment(config)
+
+    from app.main import app
+
+    # O app configura logging INFO por requisição; durante a carga só avisos e erros
+    logging.getLogger().setLevel(logging.WARNING)
+
+    install_stubs(stub_config or StubConfig())
+    lesson_ids = seed_database(config.lessons)
+    disabled = mount_optional_routers(app)
+    profile = PROFILES[config.profile]
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            # Cadastro fora da medição
+            users = []
+            for i in range(config.users):
+                user = VirtualUser(
+                    email=f"user{i}@loadtest.local",
+                    password="loadtest",
+                    rng=random.Random(config.seed + i),
+                    lesson_ids=lesson_ids
+                )
+                response = await client.post("/auth/register", json={
+                    "email": user.email, "password": user.password, "name": f"User {i}"
+                })
+                response.raise_for_status()
+                user.token = response.json()["access_token"]
+                user.user_id = int((await client.get("/auth/me", headers=user.headers)).json()["id"])
+                users.append(user)
+
+            recorder = Recorder(client, config.max_requests)
+            deadline = time.perf_counter() + config.duration
+
+            async def virtual_user(user: VirtualUser):
+                while time.perf_counter() < deadline and not recorder.exhausted:
+                    name = pick_scenario(profile, user.rng, disabled)
+                    await SCENARIOS[name](user, recorder.request)
+                    if config.think_time_ms:
+                        await asyncio.sleep(config.think_time_ms / 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(virtual_user(user) for user in users))
+            elapsed = time.perf_counter() - started
+
+    report = {
+        "config": {**config.__dict__, "disabled_scenarios": sorted(disabled)},
+        **recorder.report(elapsed)
+    }
+    if config.output:
+        with open(config.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return report
+
+def format_report(report: Dict) -> str:
+    lines = [
+        f"{report['requests']} requests in {report['elapsed_seconds']}s "
+        f"({report['throughput_rps']} req/s, error rate {report['error_rate']:.2%})",
+        "",
+        f"{'route':48} {'reqs':>6} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    ]
+    for label, route in report["routes"].items():
+        latency = route["latency_ms"]
+        lines.append(
+            f"{label:48} {route['requests']:>6} {route['throughput_rps']:>8} "
+            f"{route['error_rate'] * 100:>6.1f} {latency.get('p50', 0):>8} {latency.get('p95', 0):>8} "
+            f"{latency.get('p99', 0):>8} {latency.get('max', 0):>8}"
+        )
+    if report["exceptions"]:
+        lines += ["", "exceptions:"] + [f"  {k}: {v}" for k, v in report["exceptions"].items()]
+    return "\n".join(lines)
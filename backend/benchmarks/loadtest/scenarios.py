@@ -0,0 +1,130 @@
+"""
+Cenários de tráfego: cada um faz uma ou mais requisições de um usuário virtual
+"""
+
+import io
+import random
+import wave
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from synthetic import synthetic_speech, target_text
+
+@dataclass
+class VirtualUser:
+    email: str
+    password: str
+    user_id: int = 0
+    token: str = ""
+    rng: random.Random = field(default_factory=random.Random)
+    lesson_ids: List[int] = field(default_factory=list)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+def wav_bytes(seconds: float, sr: int = 16000) -> bytes:
+    """WAV PCM16 mono gerado em memória (sem depender de soundfile)"""
+    samples = np.clip(synthetic_speech(seconds, sr=sr), -1, 1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(sr)
+        handle.writeframes((samples * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+AUDIO_CLIP = wav_bytes(3.0)
+PHRASES = [target_text(words, seed=seed) for seed, words in enumerate((5, 8, 12, 20))]
+QUESTIONS = [
+    "How do I use the present perfect?",
+    "What is the difference between make and do?",
+    "Can you correct my sentence: she go to school yesterday?",
+    "How do I pronounce the word thought?",
+    "Give me three phrases to order food at a restaurant."
+]
+
+async def login(user: VirtualUser, request):
+    response = await request("POST /auth/login", "POST", "/auth/login",
+                             json={"email": user.email, "password": user.password})
+    if response is not None and response.status_code == 200:
+        user.token = response.json()["access_token"]
+
+async def browse_lessons(user: VirtualUser, request):
+    await request("GET /lessons/", "GET", "/lessons/")
+    if user.lesson_ids:
+        lesson_id = user.rng.choice(user.lesson_ids)
+        await request("GET /lessons/{id}", "GET", f"/lessons/{lesson_id}")
+
+async def submit_audio(user: VirtualUser, request):
+    await request(
+        "POST /audio/submit", "POST", "/audio/submit",
+        params={"target_phrase": user.rng.choice(PHRASES), "user_id": str(user.user_id)},
+        files={"file": ("clip.wav", AUDIO_CLIP, "audio/wav")}
+    )
+
+async def speech_analysis(user: VirtualUser, request):
+    await request(
+        "POST /production/speech-analysis/advanced", "POST", "/production/speech-analysis/advanced",
+        headers=user.headers,
+        data={"target_text": user.rng.choice(PHRASES), "user_level": "intermediate"},
+        files={"audio_file": ("clip.wav", AUDIO_CLIP, "audio/wav")}
+    )
+
+async def chat(user: VirtualUser, request):
+    payload = {"message": user.rng.choice(QUESTIONS)}
+    if user.lesson_ids and user.rng.random() < 0.7:
+        payload["lesson_id"] = user.rng.choice(user.lesson_ids)
+    await request("POST /chat/", "POST", "/chat/", headers=user.headers, json=payload)
+
+async def write_progress(user: VirtualUser, request):
+    if not user.lesson_ids:
+        return
+    lesson_id = user.rng.choice(user.lesson_ids)
+    update = {
+        "percent_complete": round(user.rng.uniform(0, 100), 1),
+        "accuracy_score": round(user.rng.uniform(0.5, 1), 3),
+        "time_spent_minutes": user.rng.randint(1, 30)
+    }
+    response = await request("PUT /progress/user/progress/{id}", "PUT",
+                             f"/progress/user/progress/{lesson_id}",
+                             headers=user.headers, json=update, expected=(200, 404))
+    if response is not None and response.status_code == 404:
+        await request("POST /progress/user/progress", "POST", "/progress/user/progress",
+                      headers=user.headers,
+                      json={"lesson_id": lesson_id, "user_id": user.user_id, "percent_complete": 0.0})
+
+async def download_report(user: VirtualUser, request):
+    await request("GET /reports/weekly-report/{id}", "GET",
+                  f"/reports/weekly-report/{user.user_id}", params={"token": user.token})
+
+Scenario = Callable[..., Awaitable[None]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    "login": login,
+    "browse_lessons": browse_lessons,
+    "submit_audio": submit_audio,
+    "speech_analysis": speech_analysis,
+    "chat": chat,
+    "write_progress": write_progress,
+    "download_report": download_report
+}
+
+# Pesos relativos de cada cenário por perfil de tráfego
+PROFILES: Dict[str, Dict[str, float]] = {
+    "mixed": {
+        "login": 5, "browse_lessons": 30, "submit_audio": 15, "speech_analysis": 5,
+        "chat": 25, "write_progress": 15, "download_report": 5
+    },
+    "audio_heavy": {"login": 2, "browse_lessons": 10, "submit_audio": 50, "speech_analysis": 30,
+                    "write_progress": 8},
+    "chat_heavy": {"login": 2, "browse_lessons": 10, "chat": 80, "write_progress": 8},
+    "browse": {"login": 10, "browse_lessons": 80, "write_progress": 10}
+}
+
+def pick_scenario(profile: Dict[str, float], rng: random.Random,
+                  disabled: Optional[set] = None) -> str:
+    names = [name for name in profile if not disabled or name not in disabled]
+    return rng.choices(names, weights=[profile[name] for name in names])[0]
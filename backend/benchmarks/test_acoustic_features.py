@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from synthetic import synthetic_speech
+
+SR = 16000
+
+@pytest.fixture(scope="module")
+def extractor():
+    pytest.importorskip("librosa")
+    from app.services.acoustic_features import acoustic_feature_extractor
+    return acoustic_feature_extractor
+
+def with_pause(seconds: float, start: float, length: float) -> np.ndarray:
+    """Fala sintética com um silêncio (ruído de fundo) de `length` segundos a partir de `start`"""
+    audio = synthetic_speech(seconds, sr=SR).copy()
+    gap = slice(int(start * SR), int((start + length) * SR))
+    audio[gap] = 0.005 * np.random.default_rng(1).standard_normal(gap.stop - gap.start)
+    return audio
+
+def test_fluency_short_drill_with_one_long_pause(extractor):
+    """Clipe de drill (6 s) com uma pausa de 2 s: penalidade de uma pausa, não de 10 por minuto"""
+    features = extractor.extract(with_pause(6.0, 2.0, 2.0), SR)
+    assert sum(1 for start, end in features.pauses if end - start > 1.0) == 1
+    assert features.fluency_score() > 0.5
+
+def test_fluency_short_drill_without_pauses(extractor):
+    features = extractor.extract(synthetic_speech(6.0, sr=SR), SR)
+    assert features.fluency_score() > 0.9
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from backend_parity import (
+    DEFAULT_MIN_COSINE, DEFAULT_TOLERANCE, MODELS, _infer, _load, _sentences, compare
+)
+
+# Whisper só com fala real: BACKEND_PARITY_AUDIO=fala.wav (transcrever sinal sintético não diz nada)
+AUDIO = os.environ.get("BACKEND_PARITY_AUDIO")
+CASES = [
+    (model, backend)
+    for model in (["grammar", "sentence_transformer"] + (["whisper"] if AUDIO else []))
+    for backend in ("int8", "onnx")
+    if not (model == "whisper" and backend == "onnx")
+]
+
+def _load_or_skip(model: str, backend: str, cache_dir: str):
+    try:
+        return _load(model, backend, cache_dir)
+    except (ImportError, OSError) as e:
+        # Sem as dependências de ML ou sem acesso aos pesos (download/cache)
+        pytest.skip(f"{model} ({backend}) unavailable: {e}")
+
+@pytest.fixture(scope="module")
+def cache_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("onnx"))
+
+@pytest.fixture(scope="module")
+def reference_outputs(cache_dir):
+    """Saídas do PyTorch fp32 por modelo, calculadas uma vez"""
+    pytest.importorskip("torch")
+    outputs = {}
+
+    def get(model: str, inputs):
+        if model not in outputs:
+            outputs[model] = _infer(model, _load_or_skip(model, "torch", cache_dir), inputs)
+        return outputs[model]
+    return get
+
+@pytest.mark.parametrize("model,backend", CASES)
+def test_backend_parity(model, backend, cache_dir, reference_outputs):
+    """int8/onnx não podem se afastar do fp32 além das tolerâncias do backend_parity.py"""
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    inputs = AUDIO if model == "whisper" else _sentences()
+    reference = reference_outputs(model, inputs)
+
+    instance = _load_or_skip(model, backend, cache_dir)
+    assert getattr(instance, "backend", backend) == backend, f"{MODELS[model]} fell back to {instance.backend}"
+    parity = compare(model, reference, _infer(model, instance, inputs), DEFAULT_TOLERANCE, DEFAULT_MIN_COSINE)
+    assert parity["ok"], f"{MODELS[model]} {backend} outside tolerance: {parity}"
@@ -1,6 +1,8 @@
-from app.database import Base, engine
-from app.models import user, lesson, progress, chat_log, audio_submission
+from app.database import Base, engine, upgrade_schema
+from app.models import user, lesson, progress, chat_log, audio_submission, id_sequence
 
 print("🛠️ Criando todas as tabelas...")
 Base.metadata.create_all(bind=engine)
+print("🛠️ Aplicando migrações...")
+upgrade_schema()
 print("✅ Pronto!")